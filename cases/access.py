@@ -0,0 +1,98 @@
+"""
+Case access index.
+
+Keeps, per user, the set of case ids they are assigned to in the shared
+cache (versioned per user, see ``users.cache``). Access checks for
+case-scoped pages and documents become a set lookup, and list views can
+filter with ``pk__in=accessible_case_ids(user)`` instead of joining
+through CaseAssignment.
+
+The index is maintained by the CaseAssignment signals in ``cases.signals``:
+new assignments are added to the cached set in place, removals and
+reassignments drop the old user's set so it is rebuilt on next use.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from users.cache import bump_version, get_version, invalidate_users, versioned_key
+from users.roles import has_role
+
+from .models import CaseAssignment
+
+CASE_ACCESS_NAMESPACE = 'case-access'
+CASE_ACCESS_CACHE_TIMEOUT = getattr(settings, 'CASE_ACCESS_CACHE_TIMEOUT', 60 * 60)
+
+# Attribute used to remember the set on a User instance for the request
+_ACCESS_CACHE_ATTR = '_accessible_case_ids'
+
+
+def _cache_key(user_id, version):
+    return versioned_key(CASE_ACCESS_NAMESPACE, user_id, version)
+
+
+def accessible_case_ids(user):
+    """
+    Returns a frozenset with the ids of every case the user is assigned to.
+    Admins can see every case; use ``can_access_case`` for access checks.
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+
+    try:
+        return getattr(user, _ACCESS_CACHE_ATTR)
+    except AttributeError:
+        pass
+
+    key = _cache_key(user.pk, get_version(CASE_ACCESS_NAMESPACE, user.pk))
+    case_ids = cache.get(key)
+    if case_ids is None:
+        case_ids = frozenset(
+            CaseAssignment.objects.filter(user_id=user.pk).values_list('case_id', flat=True)
+        )
+        cache.set(key, case_ids, CASE_ACCESS_CACHE_TIMEOUT)
+
+    setattr(user, _ACCESS_CACHE_ATTR, case_ids)
+    return case_ids
+
+
+def can_access_case(user, case_id):
+    """True if the user is an admin or is assigned to the case."""
+    if has_role(user, 'Admin'):
+        return True
+    return int(case_id) in accessible_case_ids(user)
+
+
+def colleague_ids(user):
+    """Ids of the user and of everyone assigned to one of the user's cases."""
+    ids = set(
+        CaseAssignment.objects.filter(case_id__in=accessible_case_ids(user)).values_list('user_id', flat=True)
+    )
+    ids.add(user.pk)
+    return ids
+
+
+def _copy_forward(user_id, case_id):
+    old_version = get_version(CASE_ACCESS_NAMESPACE, user_id)
+    case_ids = cache.get(_cache_key(user_id, old_version))
+    new_version = bump_version(CASE_ACCESS_NAMESPACE, user_id)
+    # Only carry the set over if nobody else changed it in the meantime;
+    # otherwise leave it to be rebuilt from the database.
+    if case_ids is not None and new_version == old_version + 1:
+        cache.set(_cache_key(user_id, new_version), case_ids | {case_id}, CASE_ACCESS_CACHE_TIMEOUT)
+
+
+def grant_case_access(user_id, case_id):
+    """Adds a case to the user's cached set after a new assignment."""
+    if transaction.get_connection().in_atomic_block:
+        # Not visible to other connections yet: drop the set for now and
+        # add the case once the assignment is committed.
+        invalidate_users(CASE_ACCESS_NAMESPACE, [user_id])
+        transaction.on_commit(lambda: _copy_forward(user_id, case_id))
+    else:
+        _copy_forward(user_id, case_id)
+
+
+def revoke_case_access(*user_ids):
+    """Drops the cached sets of users who lost an assignment."""
+    invalidate_users(CASE_ACCESS_NAMESPACE, user_ids)
@@ -4,7 +4,7 @@ from django.contrib import admin
 from .models import (
     Case, CaseAssignment, Document, DocumentLog,
     CaseWorkflow, CaseStage, Template, 
-    SignatureRequest, CaseStageLog, Meeting, DocumentDueDate
+    SignatureRequest, CaseStageLog, Meeting, MeetingOverride, DocumentDueDate
 )
 
 # Register your models here.
@@ -18,4 +18,5 @@ admin.site.register(Template)
 admin.site.register(SignatureRequest)
 admin.site.register(CaseStageLog)
 admin.site.register(Meeting)
+admin.site.register(MeetingOverride)
 admin.site.register(DocumentDueDate)
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Registry of the HTML contract templates shipped under ``templates/cases/``
+(``*_contract.html`` and the Spanish ``*_contract_es.html``).
+
+The directory is scanned once per process, on first use: each file's label,
+language, placeholders and content are kept in memory, so the views that
+list or serve contracts only do dictionary lookups. With auto-reload on
+(``CONTRACT_TEMPLATES_AUTO_RELOAD``, default ``DEBUG``) the directory is
+listed again on each access, and only new or modified files are read.
+"""
+import os
+import re
+import threading
+
+from django.conf import settings
+
+from .placeholders import extract_placeholders
+
+CONTRACT_FILE_RE = re.compile(r'_contract(_es)?\.html$', re.IGNORECASE)
+CAMEL_CASE_RE = re.compile(r'([a-z])([A-Z])')
+AND_RE = re.compile(r'([a-z])(and)')
+
+
+def contract_label(file_name):
+    """'vehicle_PurchaseandSale_contract.html' -> 'Vehicle Purchase And Sale'."""
+    label = CONTRACT_FILE_RE.sub('', file_name).replace('_', ' ')
+    # Insert spaces into camelCase words and before a run-on "and"
+    label = CAMEL_CASE_RE.sub(r'\1 \2', label)
+    label = AND_RE.sub(r'\1 \2', label)
+    return label.title()
+
+
+class ContractFile:
+    """One contract template file and what was read from it."""
+
+    def __init__(self, path, mtime, content):
+        self.path = path
+        self.file_name = os.path.basename(path)
+        self.label = contract_label(self.file_name)
+        self.language = 'es' if CONTRACT_FILE_RE.search(self.file_name).group(1) else 'en'
+        self.mtime = mtime
+        self.content = content
+        self.placeholders = extract_placeholders(content)
+
+    @classmethod
+    def load(cls, path):
+        mtime = os.stat(path).st_mtime_ns
+        with open(path, 'r', encoding='utf-8') as fh:
+            return cls(path, mtime, fh.read())
+
+
+class ContractRegistry:
+    """The contract templates of ``directory``, by file name."""
+
+    def __init__(self, directory, auto_reload=None):
+        self.directory = directory
+        if auto_reload is None:
+            auto_reload = getattr(settings, 'CONTRACT_TEMPLATES_AUTO_RELOAD', settings.DEBUG)
+        self.auto_reload = auto_reload
+        self.lock = threading.Lock()
+        self.files = None
+
+    def _scan(self, previous):
+        files = {}
+        if os.path.isdir(self.directory):
+            for file_name in sorted(os.listdir(self.directory)):
+                if not CONTRACT_FILE_RE.search(file_name):
+                    continue
+                path = os.path.join(self.directory, file_name)
+                try:
+                    known = previous.get(file_name)
+                    if known is None or os.stat(path).st_mtime_ns != known.mtime:
+                        known = ContractFile.load(path)
+                    files[file_name] = known
+                except (OSError, UnicodeDecodeError):
+                    continue  # unreadable: leave it out, as if it weren't there
+        self.files = files
+
+    def _current(self):
+        if self.files is None or self.auto_reload:
+            with self.lock:
+                if self.files is None:
+                    self._scan({})
+                elif self.auto_reload:
+                    # Rescanning reuses every file whose mtime is unchanged
+                    self._scan(self.files)
+        return self.files
+
+    def get(self, file_name):
+        """The ContractFile called ``file_name``, or None."""
+        return self._current().get(file_name)
+
+    def all(self):
+        return list(self._current().values())
+
+    def file_names(self):
+        return list(self._current())
+
+    def choices(self):
+        """(file name, label) pairs for select boxes."""
+        return [(entry.file_name, entry.label) for entry in self._current().values()]
+
+    def reload(self):
+        with self.lock:
+            self._scan({})
+
+
+contract_templates = ContractRegistry(os.path.join(settings.BASE_DIR, 'templates', 'cases'))
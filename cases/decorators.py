@@ -1,7 +1,8 @@
 from functools import wraps
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
-from .models import Case, CaseAssignment
+from .models import Case
+from .access import can_access_case
 
 def user_is_assigned_to_case(view_func):
     """
@@ -17,19 +18,39 @@ def user_is_assigned_to_case(view_func):
             # This is a safety check in case we forgot to add the pk
             messages.error(request, "Error: Case ID not found.")
             return redirect('/') 
-            
-        case = get_object_or_404(Case, pk=case_pk)
 
         # --- The Security Check ---
-        is_admin = request.user.roles.filter(name='Admin').exists()
-        is_assigned = CaseAssignment.objects.filter(case=case, user=request.user).exists()
-
-        if is_admin or is_assigned:
+        # Uses the cached case access index, so no query in the common case
+        if can_access_case(request.user, case_pk):
             # If they are an admin OR assigned, run the original view
             return view_func(request, *args, **kwargs)
         else:
+            # Still 404 for cases that don't exist at all
+            get_object_or_404(Case, pk=case_pk)
             # Otherwise, forbid access
             messages.error(request, "You do not have permission to view that case.")
             return redirect('/') # Redirect to homepage
             
-    return _wrapped_view
\ No newline at end of file
+    return _wrapped_view
+
+
+def load_case(select_related=(), prefetch_related=()):
+    """
+    Decorator for case-scoped views. Runs the same access check as
+    user_is_assigned_to_case, then fetches the case exactly once using the
+    view's declared select_related/prefetch_related plan and passes it to
+    the view as the `case` keyword argument.
+
+        @load_case(select_related=('workflow',), prefetch_related=('documents',))
+        def my_view(request, case_pk, case): ...
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        @user_is_assigned_to_case
+        def _wrapped_view(request, *args, **kwargs):
+            case_pk = kwargs.get('pk') or kwargs.get('case_pk')
+            queryset = Case.objects.select_related(*select_related).prefetch_related(*prefetch_related)
+            kwargs['case'] = get_object_or_404(queryset, pk=case_pk)
+            return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
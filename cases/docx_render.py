@@ -0,0 +1,226 @@
+"""
+Fills ``{{key}}`` placeholders in .docx templates at the XML level.
+
+A .docx is a zip of XML parts. Instead of building the python-docx object
+model and searching every run of every paragraph for every key, each text
+part (the body, headers and footers) is scanned once:
+
+* one regex pass collects the ``<w:t>`` text nodes of the part;
+* their text is joined per paragraph and searched with a single compiled
+  placeholder pattern, so a placeholder Word has split across several runs
+  (``{{client_`` + ``name}}``) is still found;
+* the part is cut into static byte segments and placeholder slots.
+
+The value goes into the run where the placeholder starts (keeping that
+run's formatting) and the rest of the placeholder is removed from the
+following runs. Everything else, including every other zip entry, is
+copied through unchanged.
+
+``compile_docx`` does the scanning once; ``CompiledDocx.render`` only joins
+segments and values, so a compiled template can be reused for many
+documents. ``CompiledDocx.dump``/``load`` store one as a JSON manifest
+followed by its raw bytes (no pickle: the file is data, never code).
+"""
+import json
+import re
+import zipfile
+from bisect import bisect_right
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+# Parts that hold document text
+TEXT_PART_RE = re.compile(r'^word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$')
+
+# A text node (group 1: opening tag, group 2: text) or the end of a paragraph
+TOKEN_RE = re.compile(rb'(<w:t(?:\s[^>]*?)?(?<!/)>)([^<]*)</w:t>|</w:p>')
+PLACEHOLDER_RE = re.compile(rb'\{\{(\w+)\}\}')
+
+PRESERVE = b' xml:space="preserve"'
+PARAGRAPH_BREAK = b'\x00'  # joins paragraphs; never part of a placeholder
+
+# Version of the CompiledDocx.dump layout
+DUMP_FORMAT = 1
+
+# Characters XML 1.0 does not allow
+INVALID_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class Slot:
+    """Where a placeholder's value goes."""
+    __slots__ = ('key', 'raw')
+
+    def __init__(self, key, raw):
+        self.key = key
+        self.raw = raw  # the placeholder text, kept when there is no value
+
+    def __repr__(self):
+        return f'Slot({self.key!r})'
+
+
+def xml_value(value):
+    """A value as run text: escaped, with line breaks and tabs as Word elements."""
+    text = INVALID_XML_RE.sub('', '' if value is None else str(value))
+    text = escape(text).replace('\r\n', '\n')
+    return (
+        text.replace('\n', f'</w:t><w:br/><w:t{PRESERVE.decode()}>')
+        .replace('\t', f'</w:t><w:tab/><w:t{PRESERVE.decode()}>')
+        .encode('utf-8')
+    )
+
+
+def compile_part(xml):
+    """
+    Splits an XML part into a list of bytes segments and Slots. Returns None
+    if the part has no placeholders.
+    """
+    text, node_starts, nodes = [], [], []  # joined text, its offsets, (text start, text end, tag)
+    position = 0
+    for match in TOKEN_RE.finditer(xml):
+        if match.group(1) is None:
+            text.append(PARAGRAPH_BREAK)
+            position += 1
+            continue
+        node_starts.append(position)
+        nodes.append((match.start(2), match.end(2), match.span(1)))
+        text.append(match.group(2))
+        position += len(match.group(2))
+
+    joined = b''.join(text)
+    edits = []  # (start, end, replacement) in part offsets
+    preserved = set()
+    for match in PLACEHOLDER_RE.finditer(joined):
+        first = bisect_right(node_starts, match.start()) - 1
+        last = bisect_right(node_starts, match.end() - 1) - 1
+        for index in range(first, last + 1):
+            node_text_start, node_text_end, (tag_start, tag_end) = nodes[index]
+            start = node_text_start + max(match.start() - node_starts[index], 0)
+            end = node_text_start + min(match.end() - node_starts[index], node_text_end - node_text_start)
+            if index == first:
+                if index not in preserved and b'xml:space=' not in xml[tag_start:tag_end]:
+                    # Values may start or end with spaces
+                    preserved.add(index)
+                    edits.append((tag_end - 1, tag_end - 1, PRESERVE))
+                edits.append((start, end, Slot(match.group(1).decode(), match.group(0))))
+            else:
+                edits.append((start, end, b''))
+    if not edits:
+        return None
+
+    segments, position = [], 0
+    for start, end, replacement in sorted(edits, key=lambda edit: (edit[0], edit[1])):
+        segments.append(xml[position:start])
+        segments.append(replacement)
+        position = end
+    segments.append(xml[position:])
+    return [segment for segment in segments if not isinstance(segment, bytes) or segment]
+
+
+def _copy_info(info):
+    # writestr() fills in sizes and offsets, so compiled entries get a copy
+    copy = zipfile.ZipInfo(info.filename, info.date_time)
+    copy.compress_type = info.compress_type
+    copy.create_system = info.create_system
+    copy.external_attr = info.external_attr
+    copy.comment = info.comment
+    return copy
+
+
+class CompiledDocx:
+    """A .docx template split into static entries and compiled text parts."""
+
+    def __init__(self, entries):
+        # [(ZipInfo, bytes or segment list)]
+        self.entries = entries
+
+    def dump(self, fileobj):
+        """Writes the entries as one line of JSON, then their bytes."""
+        blobs, manifest = [], []
+        for info, payload in self.entries:
+            segments = payload if isinstance(payload, list) else [payload]
+            parts = []
+            for segment in segments:
+                if isinstance(segment, Slot):
+                    parts.append(['slot', segment.key, len(segment.raw)])
+                    blobs.append(segment.raw)
+                else:
+                    parts.append(['bytes', len(segment)])
+                    blobs.append(segment)
+            manifest.append({
+                'name': info.filename, 'date_time': info.date_time, 'compress_type': info.compress_type,
+                'create_system': info.create_system, 'external_attr': info.external_attr,
+                'comment': info.comment.hex(), 'compiled': isinstance(payload, list), 'parts': parts,
+            })
+        fileobj.write(json.dumps({'format': DUMP_FORMAT, 'entries': manifest}).encode() + b'\n')
+        for blob in blobs:
+            fileobj.write(blob)
+
+    @classmethod
+    def load(cls, fileobj):
+        """Reads what ``dump`` wrote. Raises ValueError for anything else."""
+        try:
+            manifest = json.loads(fileobj.readline())
+            if manifest.get('format') != DUMP_FORMAT:
+                raise ValueError('unknown compiled template format')
+            entries = []
+            for entry in manifest['entries']:
+                info = zipfile.ZipInfo(entry['name'], tuple(entry['date_time']))
+                info.compress_type = entry['compress_type']
+                info.create_system = entry['create_system']
+                info.external_attr = entry['external_attr']
+                info.comment = bytes.fromhex(entry['comment'])
+                segments = []
+                for part in entry['parts']:
+                    size = part[-1]
+                    data = fileobj.read(size)
+                    if len(data) != size:
+                        raise ValueError('truncated compiled template')
+                    segments.append(Slot(part[1], data) if part[0] == 'slot' else data)
+                entries.append((info, segments if entry['compiled'] else segments[0]))
+        except (KeyError, IndexError, TypeError, AttributeError) as e:
+            raise ValueError(f'malformed compiled template: {e}') from e
+        return cls(entries)
+
+    @property
+    def placeholders(self):
+        return {
+            segment.key
+            for _, payload in self.entries if isinstance(payload, list)
+            for segment in payload if isinstance(segment, Slot)
+        }
+
+    def render_part(self, segments, values):
+        return b''.join(
+            segment if isinstance(segment, bytes) else values.get(segment.key, segment.raw)
+            for segment in segments
+        )
+
+    def render(self, context, fileobj=None):
+        """
+        Writes the filled-in .docx to ``fileobj`` (or returns its bytes).
+        Placeholders without a value in ``context`` are left as they are.
+        """
+        values = {key: xml_value(value) for key, value in context.items()}
+        target = fileobj if fileobj is not None else BytesIO()
+        with zipfile.ZipFile(target, 'w') as archive:
+            for info, payload in self.entries:
+                if isinstance(payload, list):
+                    payload = self.render_part(payload, values)
+                archive.writestr(_copy_info(info), payload)
+        return target.getvalue() if fileobj is None else None
+
+
+def compile_docx(fileobj):
+    """Reads a .docx (path or file object) into a CompiledDocx."""
+    entries = []
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            data = archive.read(info)
+            if TEXT_PART_RE.match(info.filename):
+                data = compile_part(data) or data
+            entries.append((info, data))
+    return CompiledDocx(entries)
+
+
+def render_docx(fileobj, context):
+    """Returns the bytes of the .docx template ``fileobj`` filled with ``context``."""
+    return compile_docx(fileobj).render(context)
@@ -0,0 +1,206 @@
+"""
+Calendar events for a user within a date window.
+
+FullCalendar asks for the visible range only (``start``/``end`` query
+params), so every query here is bounded by that window and served by the
+indexes on ``Meeting.scheduled_time`` and ``DocumentDueDate.due_date``.
+Meeting participants come from a single prefetch, and recurring meetings
+are expanded into their occurrences inside the window only (see
+``cases.recurrence``).
+
+Each user also has a calendar version (see ``users.cache``), bumped by the
+signals in ``cases.signals`` whenever something on their calendar changes.
+It doubles as the ETag of the events feed, and the serialized feed is
+cached per (user, version, filters, window).
+"""
+import hashlib
+import json
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from search.models import SearchDocument
+from search.query import matching_ids
+from users.cache import get_version, invalidate_users, versioned_key
+
+from .access import accessible_case_ids
+from .models import DocumentDueDate, Meeting
+from .recurrence import attach_overrides, occurrences, window_filter
+
+# Meetings that started up to this long before the window are still
+# fetched so one that runs into the window is shown. Longer meetings
+# only appear in windows that contain their start.
+MEETING_LOOKBACK = timedelta(hours=24)
+
+# Used when a client sends no (or an unreadable) window
+DEFAULT_WINDOW = timedelta(days=42)
+MAX_WINDOW = timedelta(days=400)
+
+CALENDAR_NAMESPACE = 'calendar'
+CALENDAR_CACHE_TIMEOUT = getattr(settings, 'CALENDAR_CACHE_TIMEOUT', 60 * 15)
+
+# Query params that narrow the events feed
+FILTER_PARAMS = {
+    'search_query': 'q',  # Search by title
+    'case_id': 'case_id',  # Filter by case
+    'meeting_type': 'type',  # Filter by type
+    'scope': 'scope',  # Filter by participants (mine only)
+}
+
+
+def _parse_bound(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value[:10])
+        if day is None:
+            return None
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_window(params):
+    """Returns the (start, end) datetimes requested in ``params``, clamped."""
+    try:
+        start = _parse_bound(params.get('start'))
+        end = _parse_bound(params.get('end'))
+    except ValueError:
+        start = end = None
+
+    if start is None:
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        start = today - timedelta(days=7)
+    if end is None or end <= start:
+        end = start + DEFAULT_WINDOW
+    return start, min(end, start + MAX_WINDOW)
+
+
+def _display_name(user):
+    name = f"{user.first_name or ''} {user.last_name or ''}".strip()
+    return name or user.username
+
+
+def meeting_events(user, start, end, search_query='', case_id='', meeting_type='', scope=''):
+    """FullCalendar events for the user's meetings overlapping [start, end)."""
+    meetings = (
+        Meeting.objects
+        .filter(window_filter(start, end, MEETING_LOOKBACK), participants=user)
+        .select_related('case', 'organizer')
+        .prefetch_related(Prefetch(
+            'participants', queryset=User.objects.only('id', 'username', 'first_name', 'last_name'),
+        ))
+        .order_by('scheduled_time')
+    )
+
+    # --- APPLY FILTERS ---
+    if case_id:
+        meetings = meetings.filter(case_id=case_id)
+    if meeting_type:
+        meetings = meetings.filter(meeting_type=meeting_type)
+    if search_query:
+        # Searches title, description, and the case
+        meetings = meetings.filter(
+            Q(pk__in=matching_ids(search_query, SearchDocument.Kind.MEETING)) |
+            Q(case__in=matching_ids(search_query, SearchDocument.Kind.CASE))
+        )
+    if scope == 'mine':
+        # Only meetings organized by the current user
+        meetings = meetings.filter(organizer=user)
+
+    events = []
+    for meeting in attach_overrides(list(meetings)):
+        participants = ', '.join(_display_name(p) for p in meeting.participants.all())
+        organizer_name = _display_name(meeting.organizer) if meeting.organizer else ''
+
+        for occurrence in occurrences(meeting, start, end):
+            events.append({
+                'id': occurrence.key,
+                'title': f"📞 {occurrence.title}",
+                'start': occurrence.start.isoformat(),
+                'end': occurrence.end.isoformat(),
+                'type': 'meeting',
+                'backgroundColor': '#c4a24c',  # Your owl gold color
+                'borderColor': '#c4a24c',
+                'extendedProps': {
+                    'meetingId': meeting.id,
+                    'caseTitle': meeting.case.case_title,
+                    'caseId': meeting.case_id,
+                    'meetingType': meeting.get_meeting_type_display(),
+                    'description': meeting.description or 'No description provided',
+                    'duration': occurrence.duration_minutes,
+                    'organizer': organizer_name,
+                    'participants': participants,
+                    'scheduledTime': timezone.localtime(occurrence.start).strftime('%B %d, %Y at %I:%M %p'),
+                    'recurring': occurrence.is_recurring,
+                }
+            })
+    return events
+
+
+def due_date_events(user, start, end):
+    """FullCalendar events for document deadlines on the user's cases in [start, end)."""
+    documents = (
+        DocumentDueDate.objects
+        .filter(case_id__in=accessible_case_ids(user), due_date__gte=start, due_date__lt=end)
+        .values('id', 'document_name', 'due_date', 'is_completed', 'case__case_title')
+        .order_by('due_date')
+    )
+
+    events = []
+    for doc in documents:
+        color = '#ff6b6b' if not doc['is_completed'] else '#51cf66'
+        events.append({
+            'id': f'document-{doc["id"]}',
+            'title': f"📄 {doc['document_name']}",
+            'start': doc['due_date'].isoformat(),
+            'type': 'document',
+            'backgroundColor': color,
+            'borderColor': color,
+            'extendedProps': {
+                'caseTitle': doc['case__case_title'],
+            }
+        })
+    return events
+
+
+# --- Versioned feed cache ---
+
+def invalidate_calendars(user_ids):
+    """Moves these users to a new calendar version (new ETag, cold cache)."""
+    invalidate_users(CALENDAR_NAMESPACE, user_ids)
+
+
+def _feed_request(params):
+    start, end = parse_window(params)
+    filters = {name: params.get(param, '') for name, param in FILTER_PARAMS.items()}
+    digest = hashlib.sha1(
+        json.dumps([start.isoformat(), end.isoformat(), filters], sort_keys=True).encode()
+    ).hexdigest()[:16]
+    return start, end, filters, digest
+
+
+def calendar_etag(user, params):
+    """ETag of the user's events feed for these params (no database access)."""
+    digest = _feed_request(params)[3]
+    return f'{get_version(CALENDAR_NAMESPACE, user.pk)}-{digest}'
+
+
+def calendar_events_json(user, params):
+    """The serialized events feed, from the cache when nothing has changed."""
+    start, end, filters, digest = _feed_request(params)
+    key = versioned_key(CALENDAR_NAMESPACE, user.pk, get_version(CALENDAR_NAMESPACE, user.pk), digest)
+    payload = cache.get(key)
+    if payload is None:
+        events = meeting_events(user, start, end, **filters) + due_date_events(user, start, end)
+        payload = json.dumps(events, cls=DjangoJSONEncoder)
+        cache.set(key, payload, CALENDAR_CACHE_TIMEOUT)
+    return payload
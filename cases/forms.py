@@ -1,9 +1,15 @@
+from datetime import timedelta
+
 from django import forms
 from django.contrib.auth.models import User
 from .models import (
     Case, Document, CaseWorkflow, CaseStage, Template, Meeting, Case, ConsultationRequest
 )
 from users.models import Role   # From the 'users' app
+from users.roles import has_role
+from .access import accessible_case_ids, colleague_ids
+from .availability import SERIES_HORIZON, find_series_conflicts
+from .recurrence import iter_starts, parse_rule
 
 class CaseCreateForm(forms.ModelForm):
 
@@ -68,17 +74,91 @@ class TemplateUploadForm(forms.ModelForm):
 class MeetingForm(forms.ModelForm):
     class Meta:
         model = Meeting
-        fields = ['case', 'title', 'meeting_type', 'scheduled_time', 'duration_minutes', 'description', 'participants']
+        fields = ['case', 'title', 'meeting_type', 'scheduled_time', 'duration_minutes', 'recurrence_rule', 'description', 'participants']
         widgets = {
             'case': forms.Select(attrs={'class': 'form-control'}),
             'title': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Client Check-in'}),
             'meeting_type': forms.Select(attrs={'class': 'form-control'}),
             'scheduled_time': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'text'}),
             'duration_minutes': forms.NumberInput(attrs={'class': 'form-control', 'min': '15', 'step': '15'}),
+            'recurrence_rule': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., FREQ=WEEKLY;BYDAY=MO'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'participants': forms.CheckboxSelectMultiple(),
         }
 
+    ignore_conflicts = forms.BooleanField(
+        required=False,
+        label="Schedule anyway",
+        help_text="Keep this time even though some participants are already booked. "
+                  f"Repeating meetings are checked for their first {SERIES_HORIZON.days} days.",
+    )
+
+    conflicts = None
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Non-admins can only invite (and see the schedules of) people they
+        # share a case with
+        self.user = user
+        self.restricted = user is not None and not has_role(user, 'Admin')
+        if self.restricted:
+            self.fields['participants'].queryset = self.fields['participants'].queryset.filter(
+                pk__in=colleague_ids(user),
+            )
+
+    @property
+    def selected_participants(self):
+        """Participant ids (as strings) to tick when the form is redisplayed."""
+        return [str(value) for value in self['participants'].value() or []]
+
+    def clean_recurrence_rule(self):
+        rule = self.cleaned_data.get('recurrence_rule', '').strip()
+        if not rule:
+            return ''
+        try:
+            return str(parse_rule(rule))
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get('scheduled_time')
+        duration = cleaned_data.get('duration_minutes')
+        participants = cleaned_data.get('participants')
+        if not (start and duration and participants) or cleaned_data.get('ignore_conflicts'):
+            return cleaned_data
+
+        # Every occurrence of a series counts, as far as SERIES_HORIZON
+        length = timedelta(minutes=duration)
+        if cleaned_data.get('recurrence_rule'):
+            starts = iter_starts(parse_rule(cleaned_data['recurrence_rule']), start, before=start + SERIES_HORIZON)
+        else:
+            starts = [start]
+        conflicts = find_series_conflicts([user.pk for user in participants],
+                                          [(slot, slot + length) for slot in starts],
+                                          exclude_meeting_id=self.instance.pk)
+        self.conflicts = conflicts
+        if conflicts:
+            names = {user.pk: user.get_full_name() or user.username for user in participants}
+            visible = accessible_case_ids(self.user) if self.restricted else None
+
+            def title(meeting):
+                if visible is None or meeting.case_id in visible:
+                    return meeting.title
+                return "another case"
+
+            details = [
+                f"{names[user_id]} ({', '.join(title(meeting) for meeting in meetings)})"
+                for user_id, meetings in conflicts.items()
+            ]
+            raise forms.ValidationError(
+                "Scheduling conflict: %(details)s already booked at this time. "
+                "Pick another time or tick \"Schedule anyway\".",
+                params={'details': '; '.join(details)},
+                code='conflict',
+            )
+        return cleaned_data
+
 class ConsultationScheduleForm(forms.Form):
     MEETING_TYPES = (
         ('Online Video', 'Online Video (Zoom/Teams)'),
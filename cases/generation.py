@@ -0,0 +1,187 @@
+"""
+Document generation from templates, for one case or many at once.
+
+``generate_batch`` fills one ``Template`` (.docx) or ``ContractTemplate``
+(HTML, rendered to PDF) for a list of cases:
+
+1. the contexts of all cases come from two queries (cases, and their
+   assignments with users and roles);
+2. the documents are rendered one after the other or, from the
+   ``generate_documents`` command, in a ``ProcessPoolExecutor`` -- each
+   worker receives the compiled template once, when it starts, and then
+   only (case id, context) pairs; it writes each document to a spooled
+   temporary file and saves it to storage itself, returning only the
+   stored name, so no document passes through memory more than once and
+   workers never touch the database;
+3. the ``Document`` and ``DocumentLog`` rows are written with
+   ``bulk_create``.
+
+Failures are per case: one bad case doesn't stop the others.
+"""
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.base import File
+from django.db import connection, connections, transaction
+from django.db.models import Prefetch
+
+from .models import Case, CaseAssignment, ContractTemplate, Document, DocumentLog
+from .placeholders import HTML_PLACEHOLDER_RE, case_document_context
+from .template_cache import compiled_templates
+from .utils import generate_document_from_template, get_renderer, spooled_file
+
+# Above this many cases the work is spread over processes
+PARALLEL_THRESHOLD = 4
+
+
+def fill_html_placeholders(content, context):
+    """Replaces ``{{key}}`` in HTML template content with escaped values."""
+    def value(match):
+        key = match.group(1)
+        return html.escape(str(context[key] or '')) if key in context else match.group(0)
+    return HTML_PLACEHOLDER_RE.sub(value, content or '')
+
+
+def docx_file_name(template):
+    return f"Generated_{template.name.replace(' ', '_')}.docx"
+
+
+# --- Worker side (no database access) ---
+
+_worker_template = None
+
+
+def _init_worker(kind, payload):
+    global _worker_template
+    import django
+    from django.apps import apps
+    if not apps.ready:  # spawned rather than forked
+        django.setup()
+    if kind == 'contract':
+        get_renderer().warm_up()
+    _worker_template = (kind, payload)
+
+
+def _store(fileobj, name):
+    """Saves a generated file where Document.file_upload would; returns its stored name."""
+    field = Document._meta.get_field('file_upload')
+    return field.storage.save(field.generate_filename(None, name), File(fileobj, name=name),
+                              max_length=field.max_length)
+
+
+def _render(job):
+    """Renders and stores one case's document: returns (case_id, stored name, error)."""
+    case_id, context = job
+    kind, payload = _worker_template
+    try:
+        if kind == 'docx':
+            compiled, name = payload
+            with spooled_file() as output:
+                compiled.render(context, output)
+                return case_id, _store(output, name), None
+        content, name = payload
+        output, file_name = generate_document_from_template(
+            fill_html_placeholders(content, context), name, context_data=context,
+        )
+        with output:
+            return case_id, _store(output, file_name), None
+    except Exception as e:
+        return case_id, None, str(e) or e.__class__.__name__
+
+
+def _render_all(kind, payload, jobs, workers):
+    global _worker_template
+    if workers is None:
+        workers = min(os.cpu_count() or 1, 8)
+    if workers <= 1 or len(jobs) < PARALLEL_THRESHOLD:
+        _worker_template = (kind, payload)
+        return [_render(job) for job in jobs]
+
+    # Forked workers must not inherit open database connections (the ones
+    # inside a transaction are left alone; the workers never use them)
+    for conn in connections.all(initialized_only=True):
+        if not conn.in_atomic_block:
+            conn.close()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(kind, payload)) as pool:
+        return list(pool.map(_render, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+
+# --- Batch generation ---
+
+class BatchResult:
+    """Outcome of generating the document for one case."""
+
+    def __init__(self, case_id, case_title, document=None, error=None):
+        self.case_id = case_id
+        self.case_title = case_title
+        self.document = document
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.document is not None
+
+
+def build_contexts(case_ids):
+    """``{case_id: (case, context)}`` for the existing cases among ``case_ids``."""
+    cases = Case.objects.filter(pk__in=case_ids).prefetch_related(Prefetch(
+        'assignments',
+        queryset=CaseAssignment.objects.select_related('user').prefetch_related('user__roles').order_by('pk'),
+    ))
+    return {case.pk: (case, case_document_context(case, case.assignments.all())) for case in cases}
+
+
+def generate_batch(template, case_ids, user, workers=1):
+    """
+    Generates ``template`` (a Template or ContractTemplate) for each case and
+    saves the documents. Returns a BatchResult per requested case, in order.
+
+    ``workers`` > 1 (or None: one per CPU, at most 8) renders in worker
+    processes. Only the management command does that: forking a threaded
+    web server process while another thread holds a lock (such as
+    ``compiled_templates.lock``) can deadlock the children.
+    """
+    case_ids = list(dict.fromkeys(int(pk) for pk in case_ids))
+    contexts = build_contexts(case_ids)
+
+    if isinstance(template, ContractTemplate):
+        kind, payload = 'contract', (template.content, template.name)
+    else:
+        kind, payload = 'docx', (compiled_templates.get(template), docx_file_name(template))
+
+    jobs = [(pk, contexts[pk][1]) for pk in case_ids if pk in contexts]
+    rendered = {case_id: (stored, error) for case_id, stored, error in _render_all(kind, payload, jobs, workers)}
+
+    results, documents = [], []
+    for pk in case_ids:
+        if pk not in contexts:
+            results.append(BatchResult(pk, '', error="Case not found."))
+            continue
+        case = contexts[pk][0]
+        stored, error = rendered[pk]
+        if error:
+            results.append(BatchResult(pk, case.case_title, error=error))
+            continue
+        document = Document(
+            case=case, title=f"Generated: {template.name}", uploaded_by=user, file_upload=stored,
+        )
+        documents.append(document)
+        results.append(BatchResult(pk, case.case_title, document=document))
+
+    try:
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Document.objects.bulk_create(documents)
+            else:
+                for document in documents:  # the logs need the new ids
+                    document.save()
+            DocumentLog.objects.bulk_create([
+                DocumentLog(document=document, user=user, action="Generated", details="Batch generation")
+                for document in documents
+            ])
+    except Exception:
+        for document in documents:  # don't leave files without rows
+            document.file_upload.storage.delete(document.file_upload.name)
+        raise
+    return results
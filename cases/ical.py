@@ -0,0 +1,240 @@
+"""
+iCalendar (RFC 5545) subscription feed.
+
+Calendar apps poll the feed every few minutes, so it is built in layers:
+
+* the whole feed is cached under the user's calendar version (the one
+  ``cases.events`` bumps on every change), which is also its ETag, so an
+  unchanged calendar costs no event queries at all;
+* when it does change, each VEVENT block is taken from a per-event snippet
+  cache keyed by everything the block shows (id, ``updated_at``, case
+  title, organizer), so only the events that actually changed are
+  rendered again.
+"""
+import hashlib
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from users.cache import get_version, versioned_key
+
+from .access import accessible_case_ids
+from .events import CALENDAR_NAMESPACE
+from .models import DocumentDueDate, Meeting
+from .recurrence import attach_overrides, window_filter
+
+PRODID = '-//Owlery//Case Calendar//EN'
+UID_DOMAIN = 'owlery'
+
+# Range of events published in the feed, relative to today
+FEED_PAST = timedelta(days=90)
+FEED_FUTURE = timedelta(days=365)
+
+SNIPPET_CACHE_TIMEOUT = 60 * 60 * 24
+FEED_CACHE_TIMEOUT = 60 * 60
+
+
+def _escape(text):
+    return (
+        (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Splits a content line into 75-octet pieces (RFC 5545 section 3.1)."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts, current = [], b''
+    for char in line:
+        piece = char.encode('utf-8')
+        if len(current) + len(piece) > (75 if not parts else 74):
+            parts.append(current.decode('utf-8'))
+            current = b''
+        current += piece
+    parts.append(current.decode('utf-8'))
+    return '\r\n '.join(parts)
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _lines(*lines):
+    return ''.join(_fold(line) + '\r\n' for line in lines)
+
+
+def _display_name(user):
+    return (user.get_full_name() or user.username) if user else ''
+
+
+# --- Per-event snippets ---
+
+def _local(value):
+    """A local wall-clock time with its TZID, as recurring events need (DST)."""
+    return f"TZID={settings.TIME_ZONE}:{timezone.localtime(value):%Y%m%dT%H%M%S}"
+
+
+def _meeting_lines(meeting, start, duration_minutes, title):
+    end = start + timedelta(minutes=duration_minutes)
+    lines = [
+        f'UID:meeting-{meeting.pk}@{UID_DOMAIN}',
+        f'DTSTAMP:{_utc(meeting.updated_at)}',
+        f'LAST-MODIFIED:{_utc(meeting.updated_at)}',
+    ]
+    if meeting.recurrence_rule:
+        lines += [f'DTSTART;{_local(start)}', f'DTEND;{_local(end)}']
+    else:
+        lines += [f'DTSTART:{_utc(start)}', f'DTEND:{_utc(end)}']
+    lines += [
+        f'SUMMARY:{_escape(title)}',
+        f'DESCRIPTION:{_escape(meeting.description)}',
+        f'CATEGORIES:{_escape(meeting.get_meeting_type_display())}',
+        f'X-OWLERY-CASE:{_escape(meeting.case.case_title)}',
+    ]
+    if meeting.organizer and meeting.organizer.email:
+        name = _display_name(meeting.organizer).replace('"', '')
+        lines.append(f'ORGANIZER;CN="{name}":mailto:{meeting.organizer.email}')
+    return lines
+
+
+def _meeting_snippet(meeting):
+    """
+    The meeting's VEVENT. A recurring meeting is one VEVENT with its RRULE,
+    cancelled occurrences as EXDATEs, plus one VEVENT (with RECURRENCE-ID)
+    per changed occurrence.
+    """
+    lines = ['BEGIN:VEVENT'] + _meeting_lines(meeting, meeting.scheduled_time, meeting.duration_minutes, meeting.title)
+    if not meeting.recurrence_rule:
+        return _lines(*lines, 'END:VEVENT')
+
+    overrides = getattr(meeting, '_overrides', None)
+    if overrides is None:
+        overrides = list(meeting.overrides.all())
+    lines.append(f'RRULE:{meeting.recurrence_rule}')
+    lines += [f'EXDATE;{_local(o.original_start)}' for o in overrides if o.is_cancelled]
+    lines.append('END:VEVENT')
+    for override in overrides:
+        if override.is_cancelled:
+            continue
+        lines += ['BEGIN:VEVENT'] + _meeting_lines(
+            meeting, override.scheduled_time or override.original_start,
+            override.duration_minutes or meeting.duration_minutes, override.title or meeting.title,
+        )
+        lines += [f'RECURRENCE-ID;{_local(override.original_start)}', 'END:VEVENT']
+    return _lines(*lines)
+
+
+def _due_date_snippet(due):
+    day = timezone.localtime(due.due_date).date()
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:due-{due.pk}@{UID_DOMAIN}',
+        f'DTSTAMP:{_utc(due.updated_at)}',
+        f'LAST-MODIFIED:{_utc(due.updated_at)}',
+        f'DTSTART;VALUE=DATE:{day:%Y%m%d}',
+        f'DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}',
+        f'SUMMARY:{_escape("Due: " + due.document_name)}',
+        f'DESCRIPTION:{_escape(due.description)}',
+        f'X-OWLERY-CASE:{_escape(due.case.case_title)}',
+        f'STATUS:{"CANCELLED" if due.is_completed else "CONFIRMED"}',
+        'END:VEVENT',
+    ]
+    return _lines(*lines)
+
+
+def _snippet_key(kind, pk, *parts):
+    digest = hashlib.sha1('\x1f'.join(map(str, parts)).encode()).hexdigest()[:16]
+    return f'ics:{kind}:{pk}:{digest}'
+
+
+def _render_events(items):
+    """
+    items: (cache key, object, render function). Returns the VEVENT blocks,
+    rendering (and caching) only the ones not cached yet.
+    """
+    keys = [key for key, _, _ in items]
+    cached = cache.get_many(keys)
+    missing = {}
+    blocks = []
+    for key, obj, render in items:
+        block = cached.get(key)
+        if block is None:
+            block = missing[key] = render(obj)
+        blocks.append(block)
+    if missing:
+        cache.set_many(missing, SNIPPET_CACHE_TIMEOUT)
+    return blocks
+
+
+# --- Feed ---
+
+def _feed_window():
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - FEED_PAST, today + FEED_FUTURE
+
+
+def _feed_key(user):
+    version = get_version(CALENDAR_NAMESPACE, user.pk)
+    day = timezone.localdate().isoformat()  # the window moves daily
+    return versioned_key(CALENDAR_NAMESPACE, user.pk, version, 'ics', day), f'{version}-{day}'
+
+
+def feed_etag(user):
+    """ETag of the user's feed; no database access."""
+    return _feed_key(user)[1]
+
+
+def feed_last_modified(user):
+    """When the current feed was built, if it is still cached."""
+    cached = cache.get(_feed_key(user)[0])
+    return cached[1] if cached else None
+
+
+def build_feed(user):
+    """
+    Returns ``(feed text, built at)`` for the user, building the feed only
+    when their calendar changed.
+    """
+    key = _feed_key(user)[0]
+    cached = cache.get(key)
+    if cached:
+        return cached
+
+    start, end = _feed_window()
+    meetings = attach_overrides(list(
+        Meeting.objects
+        .filter(window_filter(start, end, timedelta(0)), participants=user)
+        .select_related('case', 'organizer')
+        .order_by('scheduled_time')
+    ))
+    due_dates = (
+        DocumentDueDate.objects
+        .filter(case_id__in=accessible_case_ids(user), due_date__gte=start, due_date__lt=end)
+        .select_related('case')
+        .order_by('due_date')
+    )
+
+    items = [
+        (_snippet_key('meeting', m.pk, m.updated_at.isoformat(), m.case.case_title,
+                      _display_name(m.organizer), m.organizer.email if m.organizer else ''),
+         m, _meeting_snippet)
+        for m in meetings
+    ]
+    items += [
+        (_snippet_key('due', d.pk, d.updated_at.isoformat(), d.case.case_title), d, _due_date_snippet)
+        for d in due_dates
+    ]
+
+    feed = (
+        _lines('BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN',
+               'METHOD:PUBLISH', 'X-WR-CALNAME:Owlery', 'REFRESH-INTERVAL;VALUE=DURATION:PT15M')
+        + ''.join(_render_events(items))
+        + _lines('END:VCALENDAR')
+    )
+    built = (feed, timezone.now().replace(microsecond=0))
+    cache.set(key, built, FEED_CACHE_TIMEOUT)
+    return built
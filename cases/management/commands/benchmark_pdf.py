@@ -0,0 +1,58 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cases.models import ContractTemplate
+from cases.utils import HTML, PdfRenderer
+
+SAMPLE_CONTENT = (
+    "<h1>Engagement Agreement</h1>"
+    + "<p>This agreement is made between <strong>the client</strong> and the firm. "
+      "The firm will represent the client in the matter described below.</p>" * 40
+)
+
+
+class Command(BaseCommand):
+    help = "Compares per-document PDF rendering time with a fresh renderer each time and a warm, reused one."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=20, help="Documents rendered per run.")
+        parser.add_argument('--template', type=int, help="ContractTemplate ID to render (default: a sample contract).")
+
+    def handle(self, *args, **options):
+        if HTML is None:
+            raise CommandError("WeasyPrint is not available.")
+        content = SAMPLE_CONTENT
+        if options['template']:
+            try:
+                content = ContractTemplate.objects.get(pk=options['template']).content
+            except ContractTemplate.DoesNotExist as e:
+                raise CommandError(str(e))
+        count = options['documents']
+
+        def cold():
+            renderer = PdfRenderer()  # what every call used to pay for
+            renderer.write_pdf(renderer.render_html(content))
+
+        warm_renderer = PdfRenderer()
+        warm_renderer.warm_up()
+
+        def warm():
+            warm_renderer.write_pdf(warm_renderer.render_html(content))
+
+        results = {}
+        for label, render in (('cold', cold), ('warm', warm)):
+            timings = []
+            for _ in range(count):
+                start = time.perf_counter()
+                render()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[label] = statistics.median(timings)
+            self.stdout.write(
+                f"{label}: median {results[label]:.1f} ms, mean {statistics.mean(timings):.1f} ms "
+                f"over {count} document(s)"
+            )
+
+        if results['warm']:
+            self.stdout.write(self.style.SUCCESS(f"Warm renderer is {results['cold'] / results['warm']:.2f}x faster per document."))
@@ -0,0 +1,46 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from cases.generation import generate_batch
+from cases.models import Case, ContractTemplate, Template
+
+
+class Command(BaseCommand):
+    help = "Generates a document from one template for many cases, rendering them in parallel."
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--template', type=int, help="ID of a .docx Template.")
+        source.add_argument('--contract-template', type=int, help="ID of a ContractTemplate (rendered to PDF).")
+        cases = parser.add_mutually_exclusive_group(required=True)
+        cases.add_argument('--cases', type=int, nargs='+', help="Case IDs.")
+        cases.add_argument('--all-active', action='store_true', help="Every case that is not archived.")
+        parser.add_argument('--user', required=True, help="Username recorded as the documents' uploader.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Worker processes (default: one per CPU, at most 8; 1 renders inline).")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+            if options['template']:
+                template = Template.objects.get(pk=options['template'])
+            else:
+                template = ContractTemplate.objects.get(pk=options['contract_template'])
+        except (User.DoesNotExist, Template.DoesNotExist, ContractTemplate.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        if options['all_active']:
+            case_ids = list(Case.objects.filter(is_archived=False).order_by('pk').values_list('pk', flat=True))
+        else:
+            case_ids = options['cases']
+
+        # None (the default) lets generate_batch pick one process per CPU
+        results = generate_batch(template, case_ids, user, workers=options['workers'])
+        for result in results:
+            if result.ok:
+                self.stdout.write(f"OK      #{result.case_id} {result.case_title}")
+            else:
+                self.stdout.write(self.style.ERROR(f"FAILED  #{result.case_id} {result.case_title}: {result.error}"))
+
+        succeeded = sum(1 for result in results if result.ok)
+        self.stdout.write(self.style.SUCCESS(f"Generated {succeeded} of {len(results)} document(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from cases.stats import rebuild_dashboard_stats
+
+
+class Command(BaseCommand):
+    help = "Recomputes the case dashboard counters (DashboardStat) from the case table."
+
+    def handle(self, *args, **options):
+        rows = rebuild_dashboard_stats()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt dashboard statistics ({rows} counters)."))
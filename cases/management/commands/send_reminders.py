@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from cases.reminders import HORIZON, POLL_INTERVAL, ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = "Emails reminders for upcoming meetings and document deadlines (runs until stopped)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Send the reminders that are due now and exit (e.g. from cron).")
+        parser.add_argument('--poll-interval', type=int, default=POLL_INTERVAL,
+                            help="Seconds between checks for new or changed meetings and deadlines.")
+        parser.add_argument('--horizon-hours', type=int, default=int(HORIZON.total_seconds() // 3600),
+                            help="How far ahead reminders are kept in memory.")
+
+    def handle(self, *args, **options):
+        scheduler = ReminderScheduler(
+            horizon=timedelta(hours=options['horizon_hours']), poll_interval=options['poll_interval'],
+        )
+        if options['once']:
+            sent = scheduler.run_once()
+            self.stdout.write(self.style.SUCCESS(f"Sent {sent} reminder email(s)."))
+            return
+
+        self.stdout.write(f"Watching meetings and deadlines (checking every {options['poll_interval']}s)...")
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0013_dashboardstat'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['date_filed', 'id'], name='case_date_filed_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['is_archived', 'date_filed', 'id'], name='case_active_date_filed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['case_title', 'id'], name='case_title_id_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0014_case_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentduedate',
+            name='due_date',
+            field=models.DateTimeField(db_index=True, help_text='When the document is due'),
+        ),
+        migrations.AlterField(
+            model_name='meeting',
+            name='scheduled_time',
+            field=models.DateTimeField(db_index=True, help_text='When the meeting is scheduled'),
+        ),
+    ]
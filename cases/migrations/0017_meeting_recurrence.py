@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0016_calendarfeedtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meeting',
+            name='recurrence_end',
+            field=models.DateTimeField(blank=True, editable=False, help_text='End of the last occurrence (empty if the series never ends); set on save', null=True),
+        ),
+        migrations.AddField(
+            model_name='meeting',
+            name='recurrence_rule',
+            field=models.CharField(blank=True, help_text="Repeat rule, e.g. 'FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10'. Leave empty for a one-off meeting.", max_length=255),
+        ),
+        migrations.CreateModel(
+            name='MeetingOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_start', models.DateTimeField()),
+                ('is_cancelled', models.BooleanField(default=False)),
+                ('scheduled_time', models.DateTimeField(blank=True, null=True)),
+                ('duration_minutes', models.IntegerField(blank=True, null=True)),
+                ('title', models.CharField(blank=True, max_length=200)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('meeting', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='overrides', to='cases.meeting')),
+            ],
+            options={
+                'unique_together': {('meeting', 'original_start')},
+            },
+        ),
+    ]
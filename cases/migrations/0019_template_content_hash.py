@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0018_reminders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:28
+
+import re
+
+from django.db import migrations, models
+
+PLACEHOLDER_RE = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+
+def extract_placeholders(apps, schema_editor):
+    ContractTemplate = apps.get_model('cases', 'ContractTemplate')
+    templates = list(ContractTemplate.objects.only('pk', 'content'))
+    for template in templates:
+        template.placeholders = sorted(set(PLACEHOLDER_RE.findall(template.content or '')))
+    ContractTemplate.objects.bulk_update(templates, ['placeholders'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0019_template_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contracttemplate',
+            name='placeholders',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(extract_placeholders, migrations.RunPython.noop),
+    ]
@@ -39,6 +39,24 @@ class Case(models.Model):
     current_stage = models.ForeignKey(CaseStage, on_delete=models.SET_NULL, null=True, blank=True, related_name='current_cases')
     notes = models.TextField(blank=True, null=True)
 
+    class Meta:
+        # Keyset pagination keys for the case lists (see cases/pagination.py)
+        indexes = [
+            models.Index(fields=['date_filed', 'id'], name='case_date_filed_id_idx'),
+            models.Index(fields=['is_archived', 'date_filed', 'id'], name='case_active_date_filed_idx'),
+            models.Index(fields=['case_title', 'id'], name='case_title_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the dashboard-relevant state as loaded (see cases.stats)
+        if 'is_archived' in field_names and 'current_stage_id' in field_names:
+            instance._loaded_stats_state = (instance.is_archived, instance.current_stage_id)
+        # ...and the text calendar events show or are searched by
+        if {'case_title', 'description', 'notes'} <= set(field_names):
+            instance._loaded_calendar_text = (instance.case_title, instance.description, instance.notes)
+        return instance
 
     def __str__(self):
         return self.case_title
@@ -56,6 +74,13 @@ class CaseAssignment(models.Model):
         # Prevents a user from being assigned to the same case twice
         unique_together = ('case', 'user')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the user as loaded, so signals can spot a reassignment
+        instance._loaded_user_id = instance.__dict__.get('user_id')
+        return instance
+
     def __str__(self):
         return f"{self.user.username} assigned to {self.case.case_title}"
 
@@ -120,6 +145,17 @@ class Template(models.Model):
         blank=True
     )
 
+    # SHA-256 of template_file, set on save; keys the compiled template cache
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the file as loaded, so signals can spot a new upload
+        if 'template_file' in field_names:
+            instance._loaded_file = (instance.template_file.name, instance.__dict__.get('content_hash'))
+        return instance
+
     def __str__(self):
         return self.name
     
@@ -153,7 +189,15 @@ class SignatureRequest(models.Model):
     # Timestamps
     requested_at = models.DateTimeField(auto_now_add=True)
     signed_at = models.DateTimeField(null=True, blank=True)
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the status as loaded, so signals can spot a change
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+        return instance
+
     def __str__(self):
         return f"Request for {self.signer.username} to sign {self.document.title} ({self.status})"
     
@@ -194,28 +238,76 @@ class Meeting(models.Model):
     case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='meetings')
     title = models.CharField(max_length=200, help_text="e.g., 'Client Check-in'")
     meeting_type = models.CharField(max_length=20, choices=MEETING_TYPES)
-    scheduled_time = models.DateTimeField(help_text="When the meeting is scheduled")
+    scheduled_time = models.DateTimeField(db_index=True, help_text="When the meeting is scheduled")
     duration_minutes = models.IntegerField(default=60, help_text="How long the meeting lasts in minutes")
     description = models.TextField(blank=True, help_text="Additional details about the meeting")
     
     # Participants
     organizer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='organized_meetings')
     participants = models.ManyToManyField(User, related_name='meetings_involved')
+
+    # Recurrence (see cases.recurrence); scheduled_time is the first occurrence
+    recurrence_rule = models.CharField(
+        max_length=255, blank=True,
+        help_text="Repeat rule, e.g. 'FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10'. Leave empty for a one-off meeting."
+    )
+    recurrence_end = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text="End of the last occurrence (empty if the series never ends); set on save"
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return f"{self.title} - {self.scheduled_time}"
 
 
+class MeetingOverride(models.Model):
+    """
+    Cancels or changes one occurrence of a recurring meeting, identified by
+    the start time it would have had.
+    """
+    meeting = models.ForeignKey(Meeting, on_delete=models.CASCADE, related_name='overrides')
+    original_start = models.DateTimeField()
+    is_cancelled = models.BooleanField(default=False)
+
+    # Changes to this occurrence; empty means "as in the series"
+    scheduled_time = models.DateTimeField(null=True, blank=True)
+    duration_minutes = models.IntegerField(null=True, blank=True)
+    title = models.CharField(max_length=200, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        unique_together = ('meeting', 'original_start')
+
+    def __str__(self):
+        action = "cancelled" if self.is_cancelled else "moved"
+        return f"{self.meeting.title} on {self.original_start} ({action})"
+
+
+class CalendarFeedToken(models.Model):
+    """
+    Secret token that identifies a user to the iCalendar subscription feed
+    (/cases/api/calendar.ics/?token=...), which calendar apps fetch without
+    a session. Created on first visit to the calendar page.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='calendar_feed_token')
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Calendar feed for {self.user.username}"
+
+
 class DocumentDueDate(models.Model):
     """
     Represents a document deadline
     """
     case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='document_deadlines')
     document_name = models.CharField(max_length=200, help_text="e.g., 'Discovery Documents'")
-    due_date = models.DateTimeField(help_text="When the document is due")
+    due_date = models.DateTimeField(db_index=True, help_text="When the document is due")
     description = models.TextField(blank=True)
     assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_documents')
     
@@ -223,10 +315,33 @@ class DocumentDueDate(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return f"{self.document_name} - Due: {self.due_date}"
+
+
+class ReminderLog(models.Model):
+    """
+    One reminder email sent to a user about a meeting occurrence or a
+    document deadline (see cases.reminders). Keeps reminders from being
+    sent twice, e.g. after the scheduler restarts.
+    """
+    class Kind(models.TextChoices):
+        MEETING = 'meeting', 'Meeting'
+        DUE_DATE = 'due_date', 'Document deadline'
+
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    object_id = models.PositiveIntegerField()
+    event_start = models.DateTimeField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reminders_sent')
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('kind', 'object_id', 'event_start', 'user')
+
+    def __str__(self):
+        return f"{self.get_kind_display()} reminder to {self.user.username} ({self.event_start})"
     
 
 class ContractTemplate(models.Model):
@@ -264,6 +379,9 @@ class ContractTemplate(models.Model):
         default=False,
         help_text="Designates whether this template is available to all users."
     )
+
+    # The {{KEY}} placeholders in `content`, extracted on save (see cases/placeholders.py)
+    placeholders = models.JSONField(default=list, blank=True, editable=False)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -294,4 +412,29 @@ class ConsultationRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Consultation: {self.name} - {self.status}"
\ No newline at end of file
+        return f"Consultation: {self.name} - {self.status}"
+
+# --- Dashboard Statistics Model ---
+class DashboardStat(models.Model):
+    """
+    Pre-aggregated counters behind case_dashboard_view, kept current by the
+    signals in cases/signals.py. Rows with user=None hold the firm-wide
+    numbers; the others hold the numbers for cases a user is assigned to.
+    Rebuild from scratch with `python manage.py rebuild_dashboard_stats`.
+    """
+    class Kind(models.TextChoices):
+        STAGE = 'stage', 'Active cases in stage'
+        PENDING_SIGNATURES = 'signatures', 'Pending signature requests'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='dashboard_stats')
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    # Only used for STAGE rows; None means the case has no stage yet ('New')
+    stage = models.ForeignKey(CaseStage, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'kind'])]
+
+    def __str__(self):
+        scope = self.user.username if self.user else 'Firm'
+        return f"{scope}: {self.get_kind_display()} ({self.stage or 'New'}) = {self.count}"
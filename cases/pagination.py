@@ -0,0 +1,160 @@
+"""
+Keyset (cursor) pagination for case listings.
+
+Pages are addressed by an opaque cursor holding the sort key of the row
+they start after, so fetching page 500 costs the same as fetching page 1:
+an index range scan for ``page_size + 1`` rows, with no OFFSET and no
+COUNT over the whole table. Every sort ends with ``id`` so the key is
+unique and no row is skipped or repeated between pages.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import QueryDict
+
+# Sort options offered to users: name -> ordering (a single direction each)
+CASE_SORTS = {
+    'newest': ('-date_filed', '-id'),
+    'oldest': ('date_filed', 'id'),
+    'title': ('case_title', 'id'),
+    'title_desc': ('-case_title', '-id'),
+}
+DEFAULT_CASE_SORT = 'newest'
+CASE_SORT_LABELS = {
+    'newest': 'Newest first',
+    'oldest': 'Oldest first',
+    'title': 'Title (A-Z)',
+    'title_desc': 'Title (Z-A)',
+}
+
+PAGE_SIZES = (10, 25, 50, 100)
+DEFAULT_PAGE_SIZE = 25
+
+
+class KeysetPage:
+    """One page of results plus the cursors/query strings to move around."""
+
+    def __init__(self, object_list, sort, page_size, next_cursor, prev_cursor, params):
+        self.object_list = object_list
+        self.sort = sort
+        self.page_size = page_size
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.next_query = self._query(params, next_cursor)
+        self.prev_query = self._query(params, prev_cursor)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def _query(self, params, cursor):
+        if cursor is None:
+            return None
+        query = params.copy() if params is not None else QueryDict(mutable=True)
+        query['cursor'] = cursor
+        return query.urlencode()
+
+
+def encode_cursor(sort, values, reverse=False):
+    payload = {'s': sort, 'v': values, 'r': reverse}
+    raw = json.dumps(payload, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns the cursor payload, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get('v'), list):
+        return None
+    return payload
+
+
+def _field_values(obj, ordering):
+    return [getattr(obj, field.lstrip('-')) for field in ordering]
+
+
+def _after(model, ordering, values):
+    """Q for the rows that come strictly after ``values`` in ``ordering``."""
+    fields = [field.lstrip('-') for field in ordering]
+    descending = ordering[0].startswith('-')
+    lookup = 'lt' if descending else 'gt'
+    values = [model._meta.get_field(field).to_python(value) for field, value in zip(fields, values)]
+
+    condition = Q()
+    for i, field in enumerate(fields):
+        tie = Q(**dict(zip(fields[:i], values[:i])))
+        condition |= tie & Q(**{f'{field}__{lookup}': values[i]})
+    return condition
+
+
+def _reverse(ordering):
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+
+def _page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return size if size in PAGE_SIZES else DEFAULT_PAGE_SIZE
+
+
+def paginate_cases(queryset, params):
+    """
+    Returns a KeysetPage of ``queryset`` according to the ``sort``,
+    ``page_size`` and ``cursor`` values in ``params`` (usually request.GET).
+    """
+    sort = params.get('sort') if params.get('sort') in CASE_SORTS else DEFAULT_CASE_SORT
+    ordering = CASE_SORTS[sort]
+    page_size = _page_size(params.get('page_size'))
+
+    cursor = decode_cursor(params.get('cursor'))
+    if cursor is not None and (cursor.get('s') != sort or len(cursor['v']) != len(ordering)):
+        cursor = None  # left over from another sort order
+    backwards = bool(cursor and cursor.get('r'))
+
+    qs = queryset
+    if cursor is not None:
+        try:
+            qs = qs.filter(_after(queryset.model, _reverse(ordering) if backwards else ordering, cursor['v']))
+        except ValidationError:
+            # Values that don't fit the fields (hand-edited cursor): start over
+            cursor, backwards, qs = None, False, queryset
+    qs = qs.order_by(*(_reverse(ordering) if backwards else ordering))
+
+    rows = list(qs[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    # Coming from a cursor, there is always a page on the side we came from
+    has_next = has_more if not backwards else True
+    has_previous = cursor is not None and (has_more if backwards else True)
+
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(sort, _field_values(rows[-1], ordering))
+    if rows and has_previous:
+        prev_cursor = encode_cursor(sort, _field_values(rows[0], ordering), reverse=True)
+
+    return KeysetPage(rows, sort, page_size, next_cursor, prev_cursor, params)
@@ -0,0 +1,457 @@
+"""
+Analysis of uploaded PDFs for the "smart template" editor.
+
+A PDF is analysed once per content: it is stored in ``PDF_ANALYSIS_DIR``
+(private to the app, see ``utils.private_directory``) under its SHA-256,
+with the detected form fields and page sizes (keyed by the detector version
+as well) and the page images rendered so far. Each upload gets a random
+upload id that points at that content and records who uploaded it, so
+uploading the same court form again -- by anyone -- reuses the analysis and
+the images instead of redoing them.
+
+The analysis response only carries the metadata; page images are rendered
+on request, one page at a time, in the resolution and format the browser
+asks for, and kept with the PDF so every later request for the same image is
+a plain file read. Uploads and PDFs unused for ``PDF_ANALYSIS_TTL`` are
+removed when new uploads arrive.
+
+Field detection is CPU-bound, so longer documents are split across a
+process pool (``PDF_ANALYSIS_WORKERS`` processes); the pool is started on
+first use and shared by every request the process serves, the workers read
+the stored PDF from disk and only page metadata travels back.
+"""
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz
+from django.conf import settings
+from django.db import connections
+
+from .utils import private_directory, private_path
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_DIR = getattr(settings, 'PDF_ANALYSIS_DIR', private_path('pdf-uploads'))
+ANALYSIS_TTL = getattr(settings, 'PDF_ANALYSIS_TTL', 24 * 60 * 60)  # seconds
+
+# Page images: PDF points are 1/72 inch, so 72 dpi is the 1:1 scale the
+# field coordinates were measured at
+DEFAULT_DPI = 72
+MIN_DPI, MAX_DPI = 36, 300
+IMAGE_FORMATS = {
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp',
+}
+JPEG_QUALITY = 85
+
+# Pages are analysed in a process pool from this many pages up; the pool
+# size defaults to one process per CPU, at most 4
+PARALLEL_PAGES = 4
+ANALYSIS_WORKERS = getattr(settings, 'PDF_ANALYSIS_WORKERS', None) or min(os.cpu_count() or 1, 4)
+
+UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Field detection settings
+MARGIN_X_PCT = 0.10
+CHECKBOX_CHARS = ("☐", "☑", "☒")
+GRID_CELL = 64  # points; about a line of form text wide and tall
+# Word boxes run from the font's ascender to its descender; the letters
+# themselves fill roughly the band between these fractions of the height
+# (cap height to baseline), which is what counts as text inside a region
+INK_TOP, INK_BOTTOM = 0.25, 0.78
+
+
+class UploadNotFound(Exception):
+    pass
+
+
+class StorageUnavailable(Exception):
+    """ANALYSIS_DIR can't be used safely (see ``utils.private_directory``)."""
+
+
+# --- Field detection ---
+
+class GridIndex:
+    """Rects bucketed into square cells, for overlap queries without a full scan."""
+
+    def __init__(self, cell=GRID_CELL):
+        self.cell = cell
+        self.cells = defaultdict(list)
+
+    def _keys(self, rect):
+        cell = self.cell
+        for gx in range(math.floor(rect.x0 / cell), math.floor(rect.x1 / cell) + 1):
+            for gy in range(math.floor(rect.y0 / cell), math.floor(rect.y1 / cell) + 1):
+                yield gx, gy
+
+    def insert(self, rect, item):
+        for key in self._keys(rect):
+            self.cells[key].append((rect, item))
+
+    def query(self, rect):
+        """(rect, item) pairs intersecting ``rect``, each once, ordered by ``item[0]``."""
+        found = {}
+        for key in self._keys(rect):
+            for other, item in self.cells.get(key, ()):
+                if id(item) not in found and other.intersects(rect):
+                    found[id(item)] = (other, item)
+        return sorted(found.values(), key=lambda entry: entry[1][0])
+
+
+def detect_fields(page):
+    """Form fields on a page, with positions as percentages of the page size."""
+    page_w = page.rect.width
+    page_h = page.rect.height
+    fields = []
+
+    # The page text is extracted once; every text lookup below is an index query
+    textpage = page.get_textpage()
+    words = GridIndex()
+    for order, (x0, y0, x1, y1, text, *_) in enumerate(
+            page.get_text("words", textpage=textpage, sort=True)):
+        height = y1 - y0
+        words.insert(fitz.Rect(x0, y0 + height * INK_TOP, x1, y0 + height * INK_BOTTOM), (order, text))
+    taken = GridIndex()
+
+    def text_in(clip):
+        """The words whose letters overlap ``clip``, in reading order."""
+        return ' '.join(text for _, (_, text) in words.query(clip))
+
+    def is_valid_field(rect):
+        # Margin Check
+        if rect.x0 < (page_w * MARGIN_X_PCT): return False
+        if rect.x1 > (page_w * (1 - MARGIN_X_PCT)): return False
+
+        # Text Overlap Check
+        check_rect = fitz.Rect(rect.x0, rect.y0 - 2, rect.x1, rect.y0)
+        return not text_in(check_rect).strip()
+
+    def add_field(rect, f_type):
+        if taken.query(rect): return
+
+        # Label Guessing
+        search_rect = fitz.Rect(rect.x0 - 150, rect.y0 - 10, rect.x0, rect.y1 + 5)
+        text_nearby = text_in(search_rect).strip()
+        label = text_nearby.replace(':', '').replace('\n', ' ').strip()
+
+        field = {
+            'left': (rect.x0 / page_w) * 100,
+            'top': (rect.y0 / page_h) * 100,
+            'width': (rect.width / page_w) * 100,
+            'height': (rect.height / page_h) * 100,
+            'type': f_type,
+            'label': label,
+        }
+        taken.insert(rect, (len(fields), field))
+        fields.append(field)
+
+    # A. Detect Drawings
+    for shape in page.get_drawings():
+        rect = shape['rect']
+
+        # TEXT INPUTS (Horizontal Lines)
+        if rect.width > 25 and rect.height < 5:
+            # Box sits ON the line
+            input_rect = fitz.Rect(rect.x0, rect.y0 - 12, rect.x1, rect.y0)
+            if is_valid_field(input_rect):
+                add_field(input_rect, 'text')
+
+        # CHECKBOXES (Squares)
+        elif 8 < rect.width < 25 and 8 < rect.height < 25:
+            ratio = rect.width / rect.height
+            if 0.8 < ratio < 1.2:
+                if is_valid_field(rect):
+                    add_field(rect, 'checkbox')
+
+    # B. Legacy "___"
+    for rect in page.search_for("___", textpage=textpage):
+        add_field(rect, 'text')
+
+    # C. Checkbox Characters
+    for char in CHECKBOX_CHARS:
+        for rect in page.search_for(char, textpage=textpage):
+            add_field(rect, 'checkbox')
+
+    return fields
+
+
+def page_analysis(page):
+    return {
+        'number': page.number + 1,
+        'width': page.rect.width,
+        'height': page.rect.height,
+        'fields': detect_fields(page),
+    }
+
+
+# --- Worker side ---
+
+_worker_doc = None  # (path, document) of the PDF the worker last read
+
+
+def _analyze_pages(path, numbers):
+    global _worker_doc
+    # Stored PDFs never change, so the other slices of the same document
+    # don't open it again
+    if _worker_doc is None or _worker_doc[0] != path:
+        if _worker_doc is not None:
+            _worker_doc[1].close()
+        _worker_doc = (path, fitz.open(path))
+    doc = _worker_doc[1]
+    return [page_analysis(doc[number]) for number in numbers]
+
+
+# --- Analysis ---
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _analysis_pool():
+    """The process pool, started on first use and kept for the life of the process."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Forked workers must not inherit open database connections
+            for conn in connections.all(initialized_only=True):
+                if not conn.in_atomic_block:
+                    conn.close()
+            _pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS)
+        return _pool
+
+
+def _discard_pool(pool):
+    """Drops a pool whose workers died, so the next analysis starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def analyze_pdf(path, workers=None):
+    """
+    ``[{'number', 'width', 'height', 'fields'}]`` for each page of the PDF at
+    ``path``. Documents of PARALLEL_PAGES pages or more are split into slices
+    for up to ``workers`` (default ANALYSIS_WORKERS) processes of the shared
+    pool, each opening the file itself and returning only the page metadata.
+    """
+    with fitz.open(path) as doc:
+        page_count = doc.page_count
+        workers = min(workers or ANALYSIS_WORKERS, page_count)
+        if workers <= 1 or page_count < PARALLEL_PAGES:
+            return [page_analysis(page) for page in doc]
+
+    # Interleaved slices even out pages of different complexity; each worker
+    # gets a few so one slow page doesn't hold up the rest
+    step = min(workers * 2, page_count)
+    slices = [range(start, page_count, step) for start in range(step)]
+    pool = _analysis_pool()
+    try:
+        results = list(pool.map(_analyze_pages, [path] * step, slices))
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    pages = [page for result in results for page in result]
+    return sorted(pages, key=lambda page: page['number'])
+
+
+# --- Stored PDFs, by content ---
+
+_detector_version = None
+
+
+def detector_version():
+    """Changes whenever the same PDF could be analysed differently."""
+    global _detector_version
+    if _detector_version is None:
+        with open(__file__, 'rb') as f:
+            source = f.read()
+        _detector_version = hashlib.sha256(fitz.VersionBind.encode() + b'\x1f' + source).hexdigest()[:16]
+    return _detector_version
+
+
+def _analysis_dir():
+    # Upload ownership is read back from here: nobody else may write to it
+    try:
+        return private_directory(ANALYSIS_DIR)
+    except OSError as e:
+        logger.error("Refusing to use %s for PDF uploads", ANALYSIS_DIR, exc_info=True)
+        raise StorageUnavailable(str(e)) from e
+
+
+def _content_dir(digest):
+    if not SHA256_RE.match(digest or ''):
+        raise UploadNotFound(digest)
+    return os.path.join(_analysis_dir(), digest)
+
+
+def _write_atomic(path, data):
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(temp, path)
+
+
+def _cached(pdf_data, name, build):
+    """
+    The bytes of ``name`` stored with ``pdf_data``, made by ``build(source
+    path)`` on the first request. Returns (digest, bytes).
+    """
+    digest = hashlib.sha256(pdf_data).hexdigest()
+    directory = _content_dir(digest)
+    os.makedirs(directory, exist_ok=True)
+    os.utime(directory)  # in use again: keep it past the next expiry
+    source = os.path.join(directory, 'source.pdf')
+    path = os.path.join(directory, name)
+    try:
+        with open(path, 'rb') as f:
+            return digest, f.read()
+    except FileNotFoundError:
+        pass
+    new = not os.path.exists(source)
+    try:
+        if new:
+            _write_atomic(source, pdf_data)
+        data = build(source)
+    except BaseException:
+        if new:
+            shutil.rmtree(directory, ignore_errors=True)  # not a PDF we can read
+        raise
+    _write_atomic(path, data)
+    return digest, data
+
+
+def cached_analysis(pdf_data):
+    """analyze_pdf for PDF bytes, cached by content and detector version. Returns (digest, pages)."""
+    digest, pages = _cached(
+        pdf_data, f'analysis-{detector_version()}.json',
+        lambda source: json.dumps(analyze_pdf(source)).encode(),
+    )
+    return digest, json.loads(pages)
+
+
+def _html(source):
+    with fitz.open(source) as doc:
+        return ''.join(page.get_text("html") for page in doc).encode()
+
+
+def cached_pdf_html(pdf_data):
+    """The text of a PDF as PyMuPDF's HTML, page after page, cached by content."""
+    _, html = _cached(pdf_data, f'text-{fitz.VersionBind}.html', _html)
+    return html.decode()
+
+
+# --- Stored uploads ---
+
+def _upload_dir(upload_id):
+    if not UPLOAD_ID_RE.match(upload_id or ''):
+        raise UploadNotFound(upload_id)
+    return os.path.join(_analysis_dir(), upload_id)
+
+
+def remove_expired(now=None):
+    """Deletes uploads and stored PDFs unused for ANALYSIS_TTL."""
+    cutoff = (now or time.time()) - ANALYSIS_TTL
+    for entry in os.scandir(_analysis_dir()):
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+
+def store_upload(user, pdf_data):
+    """Analyses a PDF (or reuses its analysis) for later page requests. Returns (upload_id, pages)."""
+    remove_expired()
+    digest, pages = cached_analysis(pdf_data)
+
+    upload_id = uuid.uuid4().hex
+    directory = _upload_dir(upload_id)
+    os.makedirs(directory)
+    _write_atomic(os.path.join(directory, 'analysis.json'), json.dumps({
+        'user_id': user.pk,
+        'sha256': digest,
+        'pages': [{'width': page['width'], 'height': page['height']} for page in pages],
+    }).encode())
+    return upload_id, pages
+
+
+def load_upload(upload_id, user):
+    """The stored analysis of ``upload_id``, if ``user`` uploaded it."""
+    try:
+        with open(os.path.join(_upload_dir(upload_id), 'analysis.json'), 'rb') as f:
+            analysis = json.load(f)
+    except FileNotFoundError:
+        raise UploadNotFound(upload_id)
+    if analysis['user_id'] != user.pk:
+        raise UploadNotFound(upload_id)
+    return analysis
+
+
+def page_image(upload_id, user, number, dpi=DEFAULT_DPI, image_format='png'):
+    """
+    Path of the image of page ``number`` (1-based), rendering it on the first
+    request. Raises UploadNotFound for unknown uploads or pages.
+    """
+    analysis = load_upload(upload_id, user)
+    if not 1 <= number <= len(analysis['pages']):
+        raise UploadNotFound(upload_id)
+    dpi = min(max(int(dpi), MIN_DPI), MAX_DPI)
+    if image_format not in IMAGE_FORMATS:
+        image_format = 'png'
+
+    # Images are kept with the PDF, shared by every upload of it
+    directory = _content_dir(analysis['sha256'])
+    path = os.path.join(directory, f'page-{number}-{dpi}.{image_format}')
+    if not os.path.exists(path):
+        source = os.path.join(directory, 'source.pdf')
+        if not os.path.exists(source):  # expired under the upload
+            raise UploadNotFound(upload_id)
+        with fitz.open(source) as doc:
+            pix = doc[number - 1].get_pixmap(dpi=dpi)
+        if image_format == 'png':
+            data = pix.tobytes('png')
+        elif image_format == 'jpeg':
+            data = pix.tobytes('jpeg', jpg_quality=JPEG_QUALITY)
+        else:
+            data = pix.pil_tobytes(format='WEBP', quality=JPEG_QUALITY)
+        _write_atomic(path, data)
+    return path
+
+
+# Page images in editor HTML: <img data-pdf-page="3" src="...">
+PAGE_IMG_RE = re.compile(r'<img\b[^>]*\bdata-pdf-page="(\d+)"[^>]*>')
+SRC_RE = re.compile(r'\bsrc="[^"]*"')
+
+
+def embed_page_images(content, upload_id, user):
+    """
+    Replaces the page image URLs in template HTML with inline PNGs, so a
+    saved template keeps working after the upload expires.
+    """
+    images = {}
+
+    def embed(match):
+        number = int(match.group(1))
+        if number not in images:
+            with open(page_image(upload_id, user, number), 'rb') as f:
+                images[number] = 'data:image/png;base64,' + base64.b64encode(f.read()).decode('ascii')
+        return SRC_RE.sub(lambda _: f'src="{images[number]}"', match.group(0), count=1)
+
+    return PAGE_IMG_RE.sub(embed, content or '')
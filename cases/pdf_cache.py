@@ -0,0 +1,153 @@
+"""
+Disk cache of rendered contract PDFs.
+
+A PDF is stored under the SHA-256 of everything that determines its bytes:
+the template content, the context data and a renderer version (the
+WeasyPrint version, the shared stylesheet and the wrapper template source).
+Editing a template therefore never serves a stale file, and unchanged
+templates are downloaded straight from the cache.
+
+Files are written to a temporary name in the cache directory and moved into
+place with ``os.replace``, so concurrent gunicorn workers never see a
+partial file (two workers rendering the same key simply both replace it).
+The directory must be private to the app (``utils.private_directory``),
+since its files are sent to users as they are; if it isn't, PDFs are
+rendered without the cache.
+Reading a file touches its mtime; when the directory grows past
+``max_bytes`` the least recently used files are removed.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.template.loader import get_template
+
+from . import utils
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = getattr(settings, 'CONTRACT_PDF_CACHE_DIR', utils.private_path('contract-pdfs'))
+MAX_BYTES = getattr(settings, 'CONTRACT_PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+
+_renderer_version = None
+
+
+def renderer_version():
+    """Changes whenever the same template could render to different bytes."""
+    global _renderer_version
+    if _renderer_version is None:
+        import weasyprint
+        wrapper = get_template(utils.WRAPPER_TEMPLATE).template.source
+        _renderer_version = hashlib.sha256('\x1f'.join(
+            (weasyprint.__version__, utils.DOCUMENT_STYLESHEET, wrapper)
+        ).encode()).hexdigest()
+    return _renderer_version
+
+
+def cache_key(content, context_data=None):
+    payload = json.dumps([renderer_version(), content or '', context_data or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PdfCache:
+    """Content-addressed PDF files in ``directory``, LRU-evicted past ``max_bytes``."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.pdf')
+
+    def _directory_ok(self):
+        # Files are served as they are: nobody else may write here
+        try:
+            utils.private_directory(self.directory)
+        except OSError:
+            logger.warning("Not caching contract PDFs in %s", self.directory, exc_info=True)
+            return False
+        return True
+
+    def open(self, key):
+        """The cached file opened for reading, or None on a miss."""
+        if not self._directory_ok():
+            return None
+        path = self.path(key)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # recently used
+        except FileNotFoundError:
+            pass  # evicted meanwhile; the open handle still reads it
+        return f
+
+    def put(self, key, fileobj):
+        """Stores the rest of ``fileobj`` under ``key`` (unless the directory is unsafe)."""
+        if not self._directory_ok():
+            return
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(fileobj, f)
+            os.replace(temp, path)
+        except BaseException:
+            try:
+                os.remove(temp)
+            except FileNotFoundError:
+                pass
+            raise
+        self.evict()
+
+    def _files(self):
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            for file in os.scandir(entry.path):
+                if file.name.endswith('.pdf'):
+                    try:
+                        stat = file.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, file.path
+
+    def evict(self):
+        """Removes the least recently used files until the cache fits in ``max_bytes``."""
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+contract_pdfs = PdfCache()
+
+
+def cached_contract_pdf(content, template_name, context_data=None):
+    """
+    Like ``utils.generate_document_from_template``, but returns the PDF from
+    the cache when the same content and context were rendered before.
+    Returns (file object, file name).
+    """
+    if utils.HTML is None:
+        return utils.generate_document_from_template(content, template_name, context_data)
+
+    key = cache_key(content, context_data)
+    cached = contract_pdfs.open(key)
+    if cached is None:
+        cached, _ = utils.generate_document_from_template(content, template_name, context_data)
+        contract_pdfs.put(key, cached)
+        cached.seek(0)
+    return cached, utils.document_file_name(template_name, 'pdf')
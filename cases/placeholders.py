@@ -0,0 +1,86 @@
+"""
+Placeholders of generated documents: which ``{{KEY}}`` fields a template has
+and what they resolve to for a case.
+
+The keys of a ``ContractTemplate`` are extracted when it is saved
+(``ContractTemplate.placeholders``) and those of the HTML contract files when
+the registry reads them, so pages never scan template HTML to find them.
+"""
+import re
+
+from django.utils import timezone
+
+from users.roles import has_role
+
+HTML_PLACEHOLDER_RE = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+# Role-like placeholders found in contracts, filled with the client (best-effort)
+CLIENT_ALIASES = ('LESSOR', 'LESSEE', 'SELLER', 'BUYERS')
+
+
+def extract_placeholders(content):
+    """Sorted, distinct placeholder keys in HTML template content."""
+    return sorted(set(HTML_PLACEHOLDER_RE.findall(content or '')))
+
+
+def _client_and_attorney(assignments):
+    client = next((a.user for a in assignments if has_role(a.user, 'Client')), None)
+    attorney = next((a.user for a in assignments if has_role(a.user, 'Attorney')), None)
+    return client, attorney
+
+
+def case_document_context(case, assignments):
+    """Placeholder values for a case, given its assignments (with users and roles)."""
+    context = {}
+    client, attorney = _client_and_attorney(assignments)
+    if client:
+        context['client_name'] = client.get_full_name()
+        context['client_email'] = client.email
+    if attorney:
+        context['attorney_name'] = attorney.get_full_name()
+    context['case_title'] = case.case_title
+    context['case_description'] = case.description
+    return context
+
+
+def case_placeholder_map(case, assignments, now=None):
+    """The upper-case contract placeholders (CLIENT_NAME, DAY, SELLER...) for a case."""
+    placeholder_map = {}
+    client, attorney = _client_and_attorney(assignments)
+    if client:
+        placeholder_map.update({
+            'CLIENT': client.get_full_name(),
+            'CLIENT_NAME': client.get_full_name(),
+            'CLIENT_EMAIL': client.email or '',
+        })
+    if attorney:
+        placeholder_map.update({
+            'ATTORNEY': attorney.get_full_name(),
+            'ATTORNEY_NAME': attorney.get_full_name(),
+        })
+    placeholder_map.update({
+        'CASE_TITLE': case.case_title or '',
+        'CASE_DESCRIPTION': case.description or '',
+    })
+
+    now = now or timezone.now()
+    placeholder_map.update({
+        'DAY': str(now.day),
+        'MONTH': now.strftime('%B'),
+        'YEAR': str(now.year),
+        'TIME': now.strftime('%H:%M'),
+    })
+    if client:
+        for alias in CLIENT_ALIASES:
+            placeholder_map.setdefault(alias, client.get_full_name())
+    return placeholder_map
+
+
+def resolve_placeholders(keys, case, assignments):
+    """``[{'key': ..., 'value': ...}]`` for ``keys``; ``value`` is None when unknown."""
+    values = {**case_document_context(case, assignments), **case_placeholder_map(case, assignments)}
+    resolved = []
+    for key in keys:
+        value = values.get(key, values.get(key.upper()))
+        resolved.append({'key': key, 'value': value})
+    return resolved
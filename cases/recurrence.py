@@ -0,0 +1,270 @@
+"""
+Recurring meetings.
+
+A recurring meeting is a single ``Meeting`` row whose ``recurrence_rule``
+holds an iCalendar RRULE (the subset below) and whose ``scheduled_time`` is
+the first occurrence. Occurrences are never stored: they are expanded on
+demand, and only inside the window being looked at, so a weekly check-in
+that runs for years costs the same as one that runs for a month. Single
+occurrences can be cancelled or moved with ``MeetingOverride`` rows.
+
+Supported rule parts: ``FREQ`` (DAILY, WEEKLY, MONTHLY), ``INTERVAL``,
+``BYDAY`` (weekly rules), ``COUNT`` and ``UNTIL``. Occurrences keep the
+local wall-clock time of the first one across DST changes.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import MeetingOverride
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+# Upper bound on COUNT, so expanding a whole series stays cheap
+MAX_COUNT = 1000
+
+
+class Rule:
+    """A parsed recurrence rule."""
+
+    def __init__(self, freq, interval=1, byday=(), count=None, until=None):
+        self.freq = freq
+        self.interval = interval
+        self.byday = tuple(sorted(set(byday)))  # weekday numbers, Monday = 0
+        self.count = count
+        self.until = until  # aware datetime
+
+    def __str__(self):
+        parts = [f'FREQ={self.freq}']
+        if self.interval != 1:
+            parts.append(f'INTERVAL={self.interval}')
+        if self.byday:
+            parts.append('BYDAY=' + ','.join(WEEKDAYS[day] for day in self.byday))
+        if self.count:
+            parts.append(f'COUNT={self.count}')
+        if self.until:
+            parts.append(f"UNTIL={self.until.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}")
+        return ';'.join(parts)
+
+
+def _parse_until(value):
+    if len(value) == 8:
+        # A date: the series runs through the end of that (local) day
+        day = datetime.strptime(value, '%Y%m%d').date()
+        return timezone.make_aware(datetime.combine(day, time.max))
+    if value.endswith('Z'):
+        return datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=dt_timezone.utc)
+    return timezone.make_aware(datetime.strptime(value, '%Y%m%dT%H%M%S'))
+
+
+def parse_rule(text):
+    """Parses an RRULE string (with or without the ``RRULE:`` prefix). Raises ValueError."""
+    text = (text or '').strip()
+    if text.upper().startswith('RRULE:'):
+        text = text[6:]
+    parts = {}
+    for part in filter(None, text.upper().split(';')):
+        name, sep, value = part.partition('=')
+        if not sep or not value:
+            raise ValueError(f"Invalid rule part '{part}'.")
+        parts[name.strip()] = value.strip()
+
+    freq = parts.pop('FREQ', None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}.")
+    try:
+        interval = int(parts.pop('INTERVAL', 1))
+        count = int(parts.pop('COUNT')) if 'COUNT' in parts else None
+        until = _parse_until(parts.pop('UNTIL')) if 'UNTIL' in parts else None
+    except ValueError:
+        raise ValueError("INTERVAL, COUNT and UNTIL must be numbers/dates.")
+    if interval < 1 or (count is not None and not 1 <= count <= MAX_COUNT):
+        raise ValueError(f"INTERVAL must be positive and COUNT between 1 and {MAX_COUNT}.")
+    if count and until:
+        raise ValueError("Use either COUNT or UNTIL, not both.")
+
+    byday = []
+    if 'BYDAY' in parts:
+        if freq != 'WEEKLY':
+            raise ValueError("BYDAY is only supported for weekly rules.")
+        for day in parts.pop('BYDAY').split(','):
+            if day not in WEEKDAYS:
+                raise ValueError(f"Unknown weekday '{day}'.")
+            byday.append(WEEKDAYS.index(day))
+    if parts:
+        raise ValueError(f"Unsupported rule parts: {', '.join(sorted(parts))}.")
+    return Rule(freq, interval, byday, count, until)
+
+
+# --- Expansion ---
+
+def _months_between(a, b):
+    return (b.year - a.year) * 12 + (b.month - a.month)
+
+
+def _first_period(rule, base, after):
+    """Index of a period starting no later than ``after`` (local naive)."""
+    if after is None or after <= base:
+        return 0
+    if rule.freq == 'DAILY':
+        elapsed = (after - base).days
+    elif rule.freq == 'WEEKLY':
+        elapsed = (after - base).days // 7
+    else:
+        elapsed = _months_between(base, after)
+    return max(0, elapsed // rule.interval - 1)
+
+
+def _period(rule, base, index):
+    """Local naive start times in the period ``index``, in order."""
+    if rule.freq == 'DAILY':
+        return [base + timedelta(days=index * rule.interval)]
+    if rule.freq == 'WEEKLY':
+        week = base - timedelta(days=base.weekday()) + timedelta(weeks=index * rule.interval)
+        days = rule.byday or (base.weekday(),)
+        return [week + timedelta(days=day) for day in days]
+    month = base.month - 1 + index * rule.interval
+    try:
+        return [base.replace(year=base.year + month // 12, month=month % 12 + 1)]
+    except ValueError:
+        return []  # e.g. the 31st in a 30-day month: no occurrence (RFC 5545)
+
+
+def iter_starts(rule, dtstart, after=None, before=None):
+    """
+    Yields the occurrence start times of ``rule`` beginning at ``dtstart``
+    (aware), in order. With ``after`` the expansion jumps straight to the
+    period containing it (unless the rule has a COUNT, which must be counted
+    from the start); it stops at ``before``, UNTIL or COUNT.
+    """
+    base = timezone.localtime(dtstart).replace(tzinfo=None)
+    if rule.count or after is None:
+        index = 0
+    else:
+        index = _first_period(rule, base, timezone.localtime(after).replace(tzinfo=None))
+    seen = empty = 0
+    while True:
+        period = _period(rule, base, index)
+        for local in period:
+            if local < base:
+                continue
+            start = timezone.make_aware(local)
+            if (rule.until and start > rule.until) or (before and start >= before):
+                return
+            seen += 1
+            yield start
+            if rule.count and seen >= rule.count:
+                return
+        # A rule whose periods keep coming up empty (e.g. monthly on the
+        # 31st every 12 months from February) must still end somewhere.
+        empty = 0 if period else empty + 1
+        if empty > MAX_COUNT:
+            return
+        index += 1
+
+
+def series_end(meeting):
+    """When the last occurrence of a recurring meeting ends, or None if it never does."""
+    rule = parse_rule(meeting.recurrence_rule)
+    duration = timedelta(minutes=meeting.duration_minutes)
+    if rule.until:
+        return rule.until + duration
+    if rule.count:
+        last = meeting.scheduled_time
+        for last in iter_starts(rule, meeting.scheduled_time):
+            pass
+        return last + duration
+    return None
+
+
+def window_filter(start, end, lookback, prefix=''):
+    """
+    Q for meetings with an occurrence in [start, end): single meetings that
+    start in the window (or up to ``lookback`` before it) and recurring ones
+    whose series spans it. ``prefix`` is the path to Meeting, e.g. 'meeting__'.
+    """
+    def q(**lookups):
+        return Q(**{prefix + name: value for name, value in lookups.items()})
+
+    single = q(recurrence_rule='', scheduled_time__gte=start - lookback, scheduled_time__lt=end)
+    recurring = ~q(recurrence_rule='') & q(scheduled_time__lt=end) & (
+        q(recurrence_end__isnull=True) | q(recurrence_end__gt=start)
+    )
+    return single | recurring
+
+
+class Occurrence:
+    """One occurrence of a meeting (the meeting itself when it doesn't recur)."""
+
+    def __init__(self, meeting, start, duration_minutes, original_start=None, override=None):
+        self.meeting = meeting
+        self.start = start
+        self.duration_minutes = duration_minutes
+        self.end = start + timedelta(minutes=duration_minutes)
+        self.original_start = original_start
+        self.override = override
+
+    @property
+    def title(self):
+        return (self.override and self.override.title) or self.meeting.title
+
+    @property
+    def is_recurring(self):
+        return self.original_start is not None
+
+    @property
+    def key(self):
+        """Unique id of the occurrence, e.g. '12' or '12-20300107T150000Z'."""
+        if self.original_start is None:
+            return str(self.meeting.pk)
+        return f"{self.meeting.pk}-{self.original_start.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}"
+
+
+def attach_overrides(meetings):
+    """Loads the overrides of the recurring meetings in one query."""
+    recurring = {}
+    for meeting in meetings:
+        if meeting.recurrence_rule:
+            recurring.setdefault(meeting.pk, []).append(meeting)
+            meeting._overrides = []
+    if recurring:
+        for override in MeetingOverride.objects.filter(meeting_id__in=recurring):
+            for meeting in recurring[override.meeting_id]:
+                meeting._overrides.append(override)
+    return meetings
+
+
+def occurrences(meeting, start, end):
+    """The occurrences of ``meeting`` overlapping [start, end), in order."""
+    if not meeting.recurrence_rule:
+        occurrence = Occurrence(meeting, meeting.scheduled_time, meeting.duration_minutes)
+        return [occurrence] if occurrence.start < end and occurrence.end > start else []
+
+    overrides = getattr(meeting, '_overrides', None)
+    if overrides is None:
+        overrides = list(meeting.overrides.all())
+    overridden = {override.original_start: override for override in overrides}
+
+    try:
+        rule = parse_rule(meeting.recurrence_rule)
+    except ValueError:
+        rule = parse_rule('FREQ=DAILY;COUNT=1')  # unreadable rule: just the first occurrence
+    duration = timedelta(minutes=meeting.duration_minutes)
+
+    result = []
+    for occurrence_start in iter_starts(rule, meeting.scheduled_time, after=start - duration, before=end):
+        if occurrence_start + duration > start and occurrence_start not in overridden:
+            result.append(Occurrence(meeting, occurrence_start, meeting.duration_minutes, occurrence_start))
+    for override in overrides:
+        if override.is_cancelled:
+            continue
+        occurrence = Occurrence(
+            meeting, override.scheduled_time or override.original_start,
+            override.duration_minutes or meeting.duration_minutes, override.original_start, override,
+        )
+        if occurrence.start < end and occurrence.end > start:
+            result.append(occurrence)
+    result.sort(key=lambda occurrence: occurrence.start)
+    return result
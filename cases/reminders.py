@@ -0,0 +1,316 @@
+"""
+Email reminders for upcoming meetings and document deadlines.
+
+``python manage.py send_reminders`` runs a ``ReminderScheduler``: the
+reminders of the next few days sit in a min-heap keyed by when they fire,
+so the process sleeps until the earliest one is due instead of scanning
+every row each minute. Inserts and edits are picked up by polling
+``updated_at`` (indexed) every ``poll_interval`` seconds, each poll
+overlapping the previous one; entries of changed rows are replaced in place
+(stale heap entries are skipped when popped). Deleted or completed items
+are caught when their reminder fires, since every due reminder is checked
+against the database before it is sent.
+
+Due reminders are sent in one batch per wake-up: one email per recipient
+over a single connection of the configured email backend, recorded in
+``ReminderLog`` so a restart never sends the same reminder twice. A batch
+that fails to send is not logged and goes back on the heap, so it is
+retried on the next wake-up; ``run_forever`` logs errors and keeps going.
+"""
+import heapq
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CaseAssignment, DocumentDueDate, Meeting, MeetingOverride, ReminderLog
+from .recurrence import attach_overrides, occurrences, window_filter
+
+logger = logging.getLogger(__name__)
+
+MEETING_REMINDER_LEAD = timedelta(minutes=getattr(settings, 'MEETING_REMINDER_MINUTES', 30))
+DUE_DATE_REMINDER_LEAD = timedelta(hours=getattr(settings, 'DUE_DATE_REMINDER_HOURS', 24))
+
+# How far ahead reminders are kept in memory; the window slides forward
+HORIZON = timedelta(days=2)
+POLL_INTERVAL = 60  # seconds
+
+Kind = ReminderLog.Kind
+# Roles that get deadline reminders for the cases they are assigned to
+DEADLINE_ROLES = ('Attorney', 'Admin')
+
+
+class Reminder:
+    """A reminder due at ``fire_at`` for the event starting at ``event_start``."""
+
+    def __init__(self, kind, object_id, event_start, fire_at, title):
+        self.kind = kind
+        self.object_id = object_id
+        self.event_start = event_start
+        self.fire_at = fire_at
+        self.title = title
+
+    @property
+    def key(self):
+        return self.kind, self.object_id, self.event_start
+
+
+# --- Building reminders from rows ---
+
+def _meeting_reminders(meetings, start, end):
+    for meeting in attach_overrides(list(meetings)):
+        for occurrence in occurrences(meeting, start, end):
+            if occurrence.start >= start:
+                yield Reminder(Kind.MEETING, meeting.pk, occurrence.start,
+                               occurrence.start - MEETING_REMINDER_LEAD, occurrence.title)
+
+
+def _due_date_reminders(due_dates):
+    for due in due_dates:
+        yield Reminder(Kind.DUE_DATE, due.pk, due.due_date, due.due_date - DUE_DATE_REMINDER_LEAD, due.document_name)
+
+
+def upcoming_reminders(start, end, meeting_filter=Q(), due_date_filter=Q()):
+    """Reminders for the meetings and open deadlines starting in [start, end)."""
+    meetings = Meeting.objects.filter(window_filter(start, end, timedelta(0)), meeting_filter)
+    due_dates = DocumentDueDate.objects.filter(
+        due_date_filter, is_completed=False, due_date__gte=start, due_date__lt=end,
+    )
+    yield from _meeting_reminders(meetings, start, end)
+    yield from _due_date_reminders(due_dates)
+
+
+# --- Scheduler ---
+
+class ReminderScheduler:
+    """Min-heap of pending reminders, kept in sync with the database."""
+
+    def __init__(self, now=timezone.now, sleep=time.sleep, horizon=HORIZON,
+                 poll_interval=POLL_INTERVAL, connection=None):
+        self.now = now
+        self.sleep = sleep
+        self.horizon = horizon
+        self.poll_interval = poll_interval
+        self.connection = connection
+
+        self.heap = []  # (fire_at, key)
+        self.pending = {}  # key -> Reminder; heap entries not in here are stale
+        self.by_object = defaultdict(set)  # (kind, object_id) -> keys
+        self.loaded_from = self.loaded_until = None
+        self.last_change = None
+
+    def __len__(self):
+        return len(self.pending)
+
+    def push(self, reminder):
+        self.pending[reminder.key] = reminder
+        self.by_object[reminder.kind, reminder.object_id].add(reminder.key)
+        heapq.heappush(self.heap, (reminder.fire_at, reminder.key))
+
+    def forget(self, kind, object_id):
+        for key in self.by_object.pop((kind, object_id), ()):
+            self.pending.pop(key, None)
+
+    def _load(self, start, end):
+        for reminder in upcoming_reminders(start, end):
+            self.push(reminder)
+
+    def load(self):
+        """Loads the reminders of events in the next ``horizon``."""
+        now = self.now()
+        self.loaded_from, self.loaded_until = now, now + self.horizon
+        self.last_change = now
+        self._load(self.loaded_from, self.loaded_until)
+
+    def extend(self):
+        """Slides the loaded window forward."""
+        until = self.now() + self.horizon
+        if until - self.loaded_until >= self.horizon / 4:
+            self._load(self.loaded_until, until)
+            self.loaded_until = until
+        if len(self.heap) > 2 * len(self.pending) + 100:
+            # Mostly stale entries: rebuild from the live ones
+            self.heap = [(reminder.fire_at, key) for key, reminder in self.pending.items()]
+            heapq.heapify(self.heap)
+
+    def poll_changes(self):
+        """Reschedules the meetings and deadlines changed since the last poll."""
+        now = self.now()
+        # updated_at is stamped before commit, so a row committed after the
+        # last poll can carry an earlier time: look back a poll interval too
+        # (rescheduling a row twice is harmless)
+        since = self.last_change - timedelta(seconds=self.poll_interval)
+
+        meeting_ids = set(Meeting.objects.filter(updated_at__gte=since).values_list('pk', flat=True))
+        meeting_ids.update(MeetingOverride.objects.filter(updated_at__gte=since).values_list('meeting_id', flat=True))
+        due_ids = set(DocumentDueDate.objects.filter(updated_at__gte=since).values_list('pk', flat=True))
+
+        for pk in meeting_ids:
+            self.forget(Kind.MEETING, pk)
+        for pk in due_ids:
+            self.forget(Kind.DUE_DATE, pk)
+        if meeting_ids or due_ids:
+            for reminder in upcoming_reminders(
+                now, self.loaded_until, Q(pk__in=meeting_ids), Q(pk__in=due_ids),
+            ):
+                self.push(reminder)
+        self.last_change = now
+        return len(meeting_ids) + len(due_ids)
+
+    def pop_due(self):
+        """Removes and returns the reminders that should fire now."""
+        now, due = self.now(), []
+        while self.heap and self.heap[0][0] <= now:
+            fire_at, key = heapq.heappop(self.heap)
+            reminder = self.pending.get(key)
+            if reminder is None or reminder.fire_at != fire_at:
+                continue  # replaced or forgotten
+            del self.pending[key]
+            self.by_object[reminder.kind, reminder.object_id].discard(key)
+            due.append(reminder)
+        return due
+
+    def next_wakeup(self):
+        """Seconds to sleep: until the next reminder, or the next poll."""
+        while self.heap and self.heap[0][1] not in self.pending:
+            heapq.heappop(self.heap)  # drop stale entries from the top
+        delay = self.poll_interval
+        if self.heap:
+            delay = min(delay, (self.heap[0][0] - self.now()).total_seconds())
+        return max(delay, 0)
+
+    def run_once(self):
+        """Picks up changes and sends whatever is due. Returns the emails sent."""
+        if self.loaded_until is None:
+            self.load()
+        else:
+            self.poll_changes()
+            self.extend()
+        due = self.pop_due()
+        try:
+            return send_reminders(due, connection=self.connection)
+        except Exception:
+            for reminder in due:  # unsent and unlogged: try again next time
+                self.push(reminder)
+            raise
+
+    def run_forever(self):
+        while True:
+            # Like a request: drop connections the server timed out or an error broke
+            close_old_connections()
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Sending reminders failed; retrying in %s seconds", self.poll_interval)
+                delay = self.poll_interval
+            else:
+                delay = self.next_wakeup()
+            finally:
+                close_old_connections()
+            self.sleep(delay)
+
+
+# --- Delivery ---
+
+def _still_valid(reminders):
+    """The reminders whose meeting/deadline still exists and still starts then."""
+    by_kind = defaultdict(list)
+    for reminder in reminders:
+        by_kind[reminder.kind].append(reminder)
+
+    current = set()
+    for kind, items in by_kind.items():
+        start = min(r.event_start for r in items)
+        end = max(r.event_start for r in items) + timedelta(seconds=1)
+        ids = {r.object_id for r in items}
+        if kind == Kind.MEETING:
+            fresh = upcoming_reminders(start, end, Q(pk__in=ids), Q(pk__in=()))
+        else:
+            fresh = upcoming_reminders(start, end, Q(pk__in=()), Q(pk__in=ids))
+        current.update(reminder.key for reminder in fresh)
+    return [reminder for reminder in reminders if reminder.key in current]
+
+
+def _recipients(reminders):
+    """{reminder key: [User, ...]} for people with an email address."""
+    meeting_ids = {r.object_id for r in reminders if r.kind == Kind.MEETING}
+    due_ids = {r.object_id for r in reminders if r.kind == Kind.DUE_DATE}
+
+    people = defaultdict(dict)
+    participants = Meeting.participants.through.objects.filter(meeting_id__in=meeting_ids).select_related('user')
+    for row in participants:
+        people[Kind.MEETING, row.meeting_id][row.user_id] = row.user
+
+    due_dates = DocumentDueDate.objects.filter(pk__in=due_ids).select_related('assigned_to')
+    case_ids = {due.case_id for due in due_dates}
+    staff = defaultdict(list)
+    assignments = (
+        CaseAssignment.objects
+        .filter(case_id__in=case_ids, user__roles__name__in=DEADLINE_ROLES)
+        .select_related('user')
+        .distinct()
+    )
+    for assignment in assignments:
+        staff[assignment.case_id].append(assignment.user)
+    for due in due_dates:
+        users = staff[due.case_id] + ([due.assigned_to] if due.assigned_to else [])
+        people[Kind.DUE_DATE, due.pk].update((user.pk, user) for user in users)
+
+    return {
+        reminder.key: [user for user in people[reminder.kind, reminder.object_id].values() if user.email]
+        for reminder in reminders
+    }
+
+
+def _line(reminder):
+    when = timezone.localtime(reminder.event_start).strftime('%B %d, %Y at %I:%M %p')
+    if reminder.kind == Kind.MEETING:
+        return f"Meeting: {reminder.title} - {when}"
+    return f"Deadline: {reminder.title} - due {when}"
+
+
+def send_reminders(reminders, connection=None):
+    """
+    Emails the reminders, one message per recipient over one connection,
+    skipping any already sent. Returns the number of emails sent.
+    """
+    reminders = _still_valid(reminders)
+    if not reminders:
+        return 0
+    recipients = _recipients(reminders)
+
+    sent = set(
+        ReminderLog.objects
+        .filter(object_id__in={r.object_id for r in reminders}, event_start__in={r.event_start for r in reminders})
+        .values_list('kind', 'object_id', 'event_start', 'user_id')
+    )
+    per_user, users, logs = defaultdict(list), {}, []
+    for reminder in sorted(reminders, key=lambda r: r.event_start):
+        for user in recipients[reminder.key]:
+            if (*reminder.key, user.pk) in sent:
+                continue
+            per_user[user.pk].append(reminder)
+            users[user.pk] = user
+            logs.append(ReminderLog(kind=reminder.kind, object_id=reminder.object_id,
+                                    event_start=reminder.event_start, user=user))
+
+    messages = []
+    for user_id, items in per_user.items():
+        subject = f"Reminder: {items[0].title}" if len(items) == 1 else f"Reminder: {len(items)} upcoming items"
+        body = (
+            f"Hello {users[user_id].get_full_name() or users[user_id].username},\n\n"
+            "Coming up:\n\n" + '\n'.join(_line(item) for item in items) +
+            "\n\nBest regards,\nThe Owlery Legal Team"
+        )
+        messages.append(EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [users[user_id].email]))
+
+    if messages:
+        (connection or get_connection()).send_messages(messages)
+        ReminderLog.objects.bulk_create(logs, ignore_conflicts=True)
+    return len(messages)
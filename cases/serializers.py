@@ -13,8 +13,9 @@ class ContractTemplateSerializer(serializers.ModelSerializer):
             'content', 
             'template_file', 
             'is_public', 
+            'placeholders',
             'created_at', 
             'updated_at',
             'created_by_username'
         ]
-        read_only_fields = ('created_at', 'updated_at', 'created_by_username')
\ No newline at end of file
+        read_only_fields = ('placeholders', 'created_at', 'updated_at', 'created_by_username')
\ No newline at end of file
@@ -0,0 +1,219 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import stats
+from .access import grant_case_access, revoke_case_access
+from .events import invalidate_calendars
+from .models import (
+    Case, CaseAssignment, CaseStage, ContractTemplate, DocumentDueDate, Meeting, MeetingOverride, SignatureRequest,
+    Template,
+)
+from .placeholders import extract_placeholders
+from .recurrence import series_end
+from .template_cache import compiled_templates, file_hash
+
+MeetingParticipant = Meeting.participants.through
+
+
+def _deleting_user_id(origin):
+    # When a user is deleted their DashboardStat rows go with them; don't
+    # write new ones for the cascaded assignments and signature requests.
+    return origin.pk if isinstance(origin, User) else None
+
+
+# --- Case access index and dashboard statistics ---
+
+@receiver(post_save, sender=CaseAssignment)
+def update_case_access_on_assignment_save(sender, instance, created, **kwargs):
+    previous_user_id = getattr(instance, '_loaded_user_id', None)
+
+    if created or previous_user_id != instance.user_id:
+        grant_case_access(instance.user_id, instance.case_id)
+        stats.assignment_added(instance.case_id, instance.user_id)
+        invalidate_calendars([instance.user_id])  # the case's due dates
+    if not created and previous_user_id is not None and previous_user_id != instance.user_id:
+        # Reassigned: the previous user loses access to this case
+        revoke_case_access(previous_user_id)
+        stats.assignment_removed(instance.case_id, previous_user_id)
+        invalidate_calendars([previous_user_id])
+
+    instance._loaded_user_id = instance.user_id
+
+@receiver(post_delete, sender=CaseAssignment)
+def update_case_access_on_assignment_delete(sender, instance, origin=None, **kwargs):
+    revoke_case_access(instance.user_id)
+    invalidate_calendars([instance.user_id])
+    if instance.user_id != _deleting_user_id(origin):
+        stats.assignment_removed(instance.case_id, instance.user_id)
+
+
+# --- Dashboard statistics (see cases.stats) ---
+
+@receiver(pre_save, sender=Case)
+def remember_case_stats_state(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance._loaded_stats_state = None
+    elif not hasattr(instance, '_loaded_stats_state'):
+        instance._loaded_stats_state = (
+            Case.objects.filter(pk=instance.pk).values_list('is_archived', 'current_stage_id').first()
+        )
+
+@receiver(post_save, sender=Case)
+def update_stats_on_case_save(sender, instance, **kwargs):
+    new_state = (instance.is_archived, instance.current_stage_id)
+    stats.case_state_changed(instance.pk, instance._loaded_stats_state, new_state)
+    instance._loaded_stats_state = new_state
+
+@receiver(post_delete, sender=Case)
+def update_stats_on_case_delete(sender, instance, **kwargs):
+    # Assignments and signature requests were removed by the cascade already
+    stats.case_state_changed(instance.pk, (instance.is_archived, instance.current_stage_id), None)
+
+@receiver(pre_delete, sender=CaseStage)
+def update_stats_on_stage_delete(sender, instance, **kwargs):
+    stats.stage_deleted(instance.pk)
+
+@receiver(pre_save, sender=SignatureRequest)
+def remember_signature_status(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance._loaded_status = None
+    elif not hasattr(instance, '_loaded_status'):
+        instance._loaded_status = (
+            SignatureRequest.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        )
+
+@receiver(post_save, sender=SignatureRequest)
+def update_stats_on_signature_save(sender, instance, **kwargs):
+    pending = SignatureRequest.Status.PENDING
+    was_pending = instance._loaded_status == pending
+    is_pending = instance.status == pending
+    if was_pending != is_pending:
+        stats.pending_signatures_changed(instance.document_id, 1 if is_pending else -1)
+    instance._loaded_status = instance.status
+
+@receiver(post_delete, sender=SignatureRequest)
+def update_stats_on_signature_delete(sender, instance, origin=None, **kwargs):
+    if instance.status == SignatureRequest.Status.PENDING:
+        stats.pending_signatures_changed(
+            instance.document_id, -1, skip_user_id=_deleting_user_id(origin)
+        )
+
+
+# --- Calendar versions (see cases.events) ---
+
+def _case_assignee_ids(case_id):
+    return CaseAssignment.objects.filter(case_id=case_id).values_list('user_id', flat=True)
+
+def _participant_ids(meeting_filter):
+    return MeetingParticipant.objects.filter(meeting_filter).values_list('user_id', flat=True)
+
+@receiver(pre_save, sender=Meeting)
+def set_meeting_recurrence_end(sender, instance, **kwargs):
+    try:
+        instance.recurrence_end = series_end(instance) if instance.recurrence_rule else None
+    except ValueError:
+        # Unreadable rules are shown as their first occurrence only
+        instance.recurrence_end = instance.scheduled_time + timedelta(minutes=instance.duration_minutes)
+
+@receiver(post_save, sender=MeetingOverride)
+@receiver(post_delete, sender=MeetingOverride)
+def invalidate_calendars_on_override_change(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, (Case, Meeting)):
+        return  # the meeting's own delete handler covers it
+    # The series is published as one iCalendar entry, keyed on updated_at
+    Meeting.objects.filter(pk=instance.meeting_id).update(updated_at=timezone.now())
+    invalidate_calendars(_participant_ids(Q(meeting_id=instance.meeting_id)))
+
+@receiver(post_save, sender=Meeting)
+@receiver(pre_delete, sender=Meeting)
+def invalidate_calendars_on_meeting_change(sender, instance, **kwargs):
+    # A new meeting has no participants yet; adding them is handled below
+    invalidate_calendars(_participant_ids(Q(meeting_id=instance.pk)))
+
+@receiver(m2m_changed, sender=MeetingParticipant)
+def invalidate_calendars_on_participants_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+
+    if action == 'pre_clear':
+        # Remember who was on the meeting(s) before the rows go away
+        if reverse:
+            meeting_ids = MeetingParticipant.objects.filter(user_id=instance.pk).values_list('meeting_id', flat=True)
+            instance._calendar_user_ids = {instance.pk, *_participant_ids(Q(meeting_id__in=list(meeting_ids)))}
+        else:
+            instance._calendar_user_ids = set(_participant_ids(Q(meeting_id=instance.pk)))
+        return
+    if action == 'post_clear':
+        user_ids = getattr(instance, '_calendar_user_ids', set())
+        if reverse:
+            user_ids |= {instance.pk}
+        invalidate_calendars(user_ids)
+        return
+
+    # Everyone on the meeting sees the participant list, so bump them all
+    if reverse:
+        user_ids = {instance.pk, *_participant_ids(Q(meeting_id__in=pk_set or ()))}
+    else:
+        user_ids = {*(pk_set or ()), *_participant_ids(Q(meeting_id=instance.pk))}
+    invalidate_calendars(user_ids)
+
+@receiver(post_save, sender=DocumentDueDate)
+@receiver(post_delete, sender=DocumentDueDate)
+def invalidate_calendars_on_due_date_change(sender, instance, **kwargs):
+    invalidate_calendars(_case_assignee_ids(instance.case_id))
+
+@receiver(post_save, sender=Case)
+def invalidate_calendars_on_case_text_change(sender, instance, created, **kwargs):
+    # Events show the case title, and the calendar search (``q``) matches
+    # meetings by their case's search document: title, description and notes
+    text = (instance.case_title, instance.description, instance.notes)
+    if created or getattr(instance, '_loaded_calendar_text', None) == text:
+        return
+    invalidate_calendars({
+        *_case_assignee_ids(instance.pk),
+        *_participant_ids(Q(meeting__case_id=instance.pk)),
+    })
+    instance._loaded_calendar_text = text
+
+@receiver(post_save, sender=User)
+def invalidate_calendars_on_user_rename(sender, instance, created, update_fields=None, **kwargs):
+    # Events show participant and organizer names
+    if created or (update_fields is not None and not {'username', 'first_name', 'last_name'} & set(update_fields)):
+        return
+    invalidate_calendars(_participant_ids(Q(meeting__participants=instance) | Q(meeting__organizer=instance)))
+
+
+# --- Compiled .docx templates (see cases.template_cache) ---
+
+@receiver(pre_save, sender=Template)
+def update_template_content_hash(sender, instance, **kwargs):
+    field_file = instance.template_file
+    if not field_file:
+        instance.content_hash = ''
+    elif not field_file._committed or (field_file.name, instance.content_hash) != getattr(instance, '_loaded_file', None):
+        instance.content_hash = file_hash(field_file)
+
+@receiver(post_save, sender=Template)
+def discard_replaced_compiled_template(sender, instance, **kwargs):
+    current = (instance.template_file.name, instance.content_hash)
+    loaded = getattr(instance, '_loaded_file', None)
+    if loaded and loaded != current:
+        compiled_templates.discard(*loaded)
+    instance._loaded_file = current
+
+@receiver(post_delete, sender=Template)
+def discard_deleted_compiled_template(sender, instance, **kwargs):
+    compiled_templates.discard(instance.template_file.name, instance.content_hash)
+
+
+# --- Contract template placeholders (see cases.placeholders) ---
+
+@receiver(pre_save, sender=ContractTemplate)
+def extract_contract_template_placeholders(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'content' in update_fields:
+        instance.placeholders = extract_placeholders(instance.content)
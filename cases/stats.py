@@ -0,0 +1,184 @@
+"""
+Dashboard statistics.
+
+``case_dashboard_view`` reads its counters from the ``DashboardStat`` table
+instead of aggregating the case table on every load. Each row is a counter
+for one scope (a user, or ``None`` for the whole firm), one kind and, for
+stage counters, one stage. Readers always sum the rows of a key, so the
+counters only ever need to be moved by a delta and a row created twice by
+two concurrent writers is still counted correctly.
+
+The signals in ``cases.signals`` keep the table current:
+
+* a case counts towards its stage while it is not archived;
+* a pending signature request counts towards its document's case;
+* every assignee of a case (and the firm) sees that case's counts.
+
+Anything that bypasses signals (``QuerySet.update``, raw SQL, fixtures) can
+leave the counters off; ``python manage.py rebuild_dashboard_stats``
+recomputes the whole table from scratch.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Case, CaseAssignment, DashboardStat, Document, SignatureRequest
+
+STAGE = DashboardStat.Kind.STAGE
+PENDING_SIGNATURES = DashboardStat.Kind.PENDING_SIGNATURES
+
+FIRM = None
+
+
+def _bump(user_id, kind, stage_id, delta):
+    if not delta:
+        return
+    updated = DashboardStat.objects.filter(
+        user_id=user_id, kind=kind, stage_id=stage_id
+    ).update(count=F('count') + delta)
+    if not updated:
+        DashboardStat.objects.create(user_id=user_id, kind=kind, stage_id=stage_id, count=delta)
+
+
+def _apply(user_ids, deltas):
+    """Applies ``{(kind, stage_id): delta}`` to each scope in user_ids."""
+    for user_id in user_ids:
+        for (kind, stage_id), delta in deltas.items():
+            _bump(user_id, kind, stage_id, delta)
+
+
+def _assignee_ids(case_id):
+    return list(CaseAssignment.objects.filter(case_id=case_id).values_list('user_id', flat=True))
+
+
+def _stage_deltas(state, sign):
+    """The stage counter a case with this (is_archived, stage_id) state feeds."""
+    if state is None:
+        return {}
+    is_archived, stage_id = state
+    if is_archived:
+        return {}
+    return {(STAGE, stage_id): sign}
+
+
+def _case_deltas(case_id, sign):
+    """Everything a case contributes to an assignee's counters."""
+    state = Case.objects.filter(pk=case_id).values_list('is_archived', 'current_stage_id').first()
+    deltas = _stage_deltas(state, sign)
+    pending = SignatureRequest.objects.filter(
+        document__case_id=case_id, status=SignatureRequest.Status.PENDING
+    ).count()
+    if pending:
+        deltas[(PENDING_SIGNATURES, None)] = sign * pending
+    return deltas
+
+
+# --- Signal entry points ---
+
+def case_state_changed(case_id, old_state, new_state):
+    """A case was created, archived/unarchived or moved to another stage."""
+    if old_state == new_state:
+        return
+    deltas = Counter(_stage_deltas(old_state, -1))
+    deltas.update(_stage_deltas(new_state, 1))
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if deltas:
+        user_ids = [FIRM]
+        if old_state is not None:
+            # A brand new case has no assignees yet
+            user_ids += _assignee_ids(case_id)
+        _apply(user_ids, deltas)
+
+
+def assignment_added(case_id, user_id):
+    _apply([user_id], _case_deltas(case_id, 1))
+
+
+def assignment_removed(case_id, user_id):
+    _apply([user_id], _case_deltas(case_id, -1))
+
+
+def pending_signatures_changed(document_id, delta, skip_user_id=None):
+    """
+    ``delta`` pending signature requests were added to (or removed from) a
+    document. skip_user_id leaves out a user whose rows are being deleted.
+    """
+    case_id = Document.objects.filter(pk=document_id).values_list('case_id', flat=True).first()
+    if case_id is None:
+        return
+    user_ids = [user_id for user_id in _assignee_ids(case_id) if user_id != skip_user_id]
+    _apply([FIRM, *user_ids], {(PENDING_SIGNATURES, None): delta})
+
+
+def stage_deleted(stage_id):
+    """Cases in a deleted stage fall back to no stage ('New'); move their counters too."""
+    for stat in DashboardStat.objects.filter(kind=STAGE, stage_id=stage_id):
+        _bump(stat.user_id, STAGE, None, stat.count)
+
+
+# --- Reading and rebuilding ---
+
+def get_dashboard_stats(user=None):
+    """
+    Returns the dashboard numbers for a user's cases, or for the whole firm
+    when user is None::
+
+        {'stages': [(label, count), ...], 'active_cases': int, 'pending_signatures': int}
+
+    Stages with the same name in different workflows are reported together.
+    """
+    rows = DashboardStat.objects.filter(user=user).select_related('stage')
+
+    stage_counts = defaultdict(int)
+    stage_order = {}
+    pending = 0
+    for row in rows:
+        if row.kind == PENDING_SIGNATURES:
+            pending += row.count
+            continue
+        label = row.stage.name if row.stage else 'New'
+        stage_counts[label] += row.count
+        order = row.stage.order if row.stage else 0
+        stage_order[label] = min(order, stage_order.get(label, order))
+
+    stages = sorted(
+        ((label, count) for label, count in stage_counts.items() if count),
+        key=lambda item: (stage_order[item[0]], item[0]),
+    )
+    return {
+        'stages': stages,
+        'active_cases': sum(count for _, count in stages),
+        'pending_signatures': pending,
+    }
+
+
+def rebuild_dashboard_stats():
+    """Recomputes every counter from the case table. Returns the number of rows written."""
+    with transaction.atomic():
+        counts = _count_everything()
+        stats = [
+            DashboardStat(user_id=user_id, kind=kind, stage_id=stage_id, count=count)
+            for (user_id, kind, stage_id), count in counts.items() if count
+        ]
+        DashboardStat.objects.all().delete()
+        DashboardStat.objects.bulk_create(stats)
+    return len(stats)
+
+
+def _count_everything():
+    counts = Counter()
+
+    active = Case.objects.filter(is_archived=False)
+    for row in active.values('current_stage_id').annotate(n=Count('id')):
+        counts[(FIRM, STAGE, row['current_stage_id'])] += row['n']
+    for row in (CaseAssignment.objects.filter(case__is_archived=False)
+                .values('user_id', 'case__current_stage_id').annotate(n=Count('id'))):
+        counts[(row['user_id'], STAGE, row['case__current_stage_id'])] += row['n']
+
+    pending = SignatureRequest.objects.filter(status=SignatureRequest.Status.PENDING)
+    counts[(FIRM, PENDING_SIGNATURES, None)] += pending.count()
+    for row in (pending.filter(document__case__assignments__isnull=False)
+                .values('document__case__assignments__user_id').annotate(n=Count('id'))):
+        counts[(row['document__case__assignments__user_id'], PENDING_SIGNATURES, None)] += row['n']
+    return counts
@@ -0,0 +1,153 @@
+"""
+Cache of compiled .docx templates (see ``cases.docx_render``).
+
+Generating a document from a ``Template`` only needs its compiled form:
+the static byte segments of each part and the placeholder slots between
+them. Compiled templates are kept in a bounded in-process LRU keyed by
+(file name, content hash); entries pushed out of memory are spilled to a
+directory on disk (itself bounded) and loaded back from there on the next
+use, which is still much cheaper than opening and scanning the .docx.
+The spill directory is private to the app (``utils.private_directory``) and
+holds data only (``CompiledDocx.dump``), never pickles.
+
+``Template.content_hash`` is recomputed whenever a new file is uploaded
+(``cases.signals``), so a changed template never matches an old entry.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .docx_render import CompiledDocx, compile_docx
+from .utils import private_directory, private_path
+
+logger = logging.getLogger(__name__)
+
+MEMORY_ENTRIES = getattr(settings, 'DOCX_TEMPLATE_CACHE_SIZE', 32)
+DISK_ENTRIES = getattr(settings, 'DOCX_TEMPLATE_CACHE_DISK_SIZE', 256)
+SPILL_DIR = getattr(settings, 'DOCX_TEMPLATE_CACHE_DIR', private_path('docx-templates'))
+
+
+def file_hash(field_file):
+    """SHA-256 of a FieldFile's content."""
+    digest = hashlib.sha256()
+    committed = getattr(field_file, '_committed', True)
+    field_file.open('rb')
+    try:
+        for chunk in field_file.chunks():
+            digest.update(chunk)
+    finally:
+        if committed:
+            field_file.close()
+        else:
+            field_file.seek(0)  # a new upload, still to be saved to storage
+    return digest.hexdigest()
+
+
+class CompiledTemplateCache:
+    """LRU of CompiledDocx objects in memory, spilling to ``spill_dir``."""
+
+    def __init__(self, max_entries=MEMORY_ENTRIES, spill_dir=SPILL_DIR, max_spilled=DISK_ENTRIES):
+        self.max_entries = max_entries
+        self.spill_dir = spill_dir
+        self.max_spilled = max_spilled
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _spill_path(self, key):
+        name = hashlib.sha256('\x1f'.join(key).encode()).hexdigest()
+        return os.path.join(self.spill_dir, f'{name}.compiled')
+
+    def _spill_dir_ok(self):
+        try:
+            private_directory(self.spill_dir)
+        except OSError:
+            logger.warning("Not spilling compiled templates to %s", self.spill_dir, exc_info=True)
+            return False
+        return True
+
+    def _spill(self, key, compiled):
+        if not self.spill_dir or not self.max_spilled or not self._spill_dir_ok():
+            return
+        path = self._spill_path(key)
+        temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp, 'wb') as f:
+            compiled.dump(f)
+        os.replace(temp, path)
+
+        files = [os.path.join(self.spill_dir, n) for n in os.listdir(self.spill_dir) if n.endswith('.compiled')]
+        if len(files) > self.max_spilled:
+            files.sort(key=lambda p: os.stat(p).st_mtime)
+            for stale in files[:len(files) - self.max_spilled]:
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+
+    def _unspill(self, key):
+        if not self.spill_dir or not self._spill_dir_ok():
+            return None
+        path = self._spill_path(key)
+        try:
+            with open(path, 'rb') as f:
+                compiled = CompiledDocx.load(f)
+        except (OSError, ValueError):
+            return None  # not spilled (or a leftover from another version)
+        os.utime(path)  # recently used
+        return compiled
+
+    def _store(self, key, compiled):
+        with self.lock:
+            self.entries[key] = compiled
+            self.entries.move_to_end(key)
+            evicted = []
+            while len(self.entries) > self.max_entries:
+                evicted.append(self.entries.popitem(last=False))
+        for evicted_key, evicted_compiled in evicted:
+            self._spill(evicted_key, evicted_compiled)
+
+    def get(self, template):
+        """The compiled form of a Template's file, compiling it on a miss."""
+        if not template.content_hash:
+            # Uploaded before content hashes existed: hash it once
+            template.content_hash = file_hash(template.template_file)
+            type(template).objects.filter(pk=template.pk).update(content_hash=template.content_hash)
+        key = (template.template_file.name, template.content_hash)
+
+        with self.lock:
+            compiled = self.entries.get(key)
+            if compiled is not None:
+                self.entries.move_to_end(key)
+                return compiled
+
+        compiled = self._unspill(key)
+        if compiled is None:
+            with template.template_file.open('rb') as f:
+                compiled = compile_docx(f)
+        self._store(key, compiled)
+        return compiled
+
+    def discard(self, name, content_hash):
+        key = (name, content_hash)
+        with self.lock:
+            self.entries.pop(key, None)
+        if self.spill_dir:
+            try:
+                os.remove(self._spill_path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+compiled_templates = CompiledTemplateCache()
+
+
+def render_template(template, context, fileobj=None):
+    """Writes the .docx generated from ``template`` to ``fileobj`` (or returns its bytes)."""
+    return compiled_templates.get(template).render(context, fileobj)
@@ -1,3 +1,1142 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime, timezone as dt_timezone
+from smtplib import SMTPException
+from unittest import mock, skipIf
 
-# Create your tests here.
+import docx
+import fitz
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.utils import timezone
+
+from users.models import Role
+from .models import (
+    Case, CaseAssignment, CaseStage, CaseWorkflow, ContractTemplate, Document, DocumentDueDate, DocumentLog,
+    Meeting, MeetingOverride, ReminderLog, SignatureRequest, Template,
+)
+from . import generation, ical, pdf_analysis, pdf_cache, template_cache, utils, views
+from .access import accessible_case_ids, can_access_case
+from .availability import BusyIndex, earliest_common_slot
+from .contract_registry import ContractRegistry
+from .docx_render import CompiledDocx, compile_docx, render_docx
+from .events import meeting_events
+from .forms import MeetingForm
+from .generation import generate_batch
+from .ical import build_feed
+from .pdf_analysis import analyze_pdf, detect_fields
+from .recurrence import parse_rule
+from .reminders import ReminderScheduler
+from .stats import get_dashboard_stats, rebuild_dashboard_stats
+from .utils import generate_document_from_template, get_renderer
+
+
+class CaseTestMixin:
+    """Creates an attorney, a client and one case linking them."""
+
+    def setUp(self):
+        cache.clear()
+        self.attorney = User.objects.create_user(username='attorney', password='password123')
+        self.client_user = User.objects.create_user(username='client', password='password123')
+        self.outsider = User.objects.create_user(username='outsider', password='password123')
+        Role.objects.get(name='Attorney').users.add(self.attorney, self.outsider)
+        Role.objects.get(name='Client').users.add(self.client_user)
+
+        self.case = Case.objects.create(case_title='Smith v. Jones')
+        CaseAssignment.objects.create(case=self.case, user=self.attorney)
+        CaseAssignment.objects.create(case=self.case, user=self.client_user)
+
+    def fresh(self, user):
+        # A new instance, like the one loaded for the next request
+        return User.objects.get(pk=user.pk)
+
+
+class TemporaryMediaMixin:
+    """Stores uploaded and generated files under a temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class CaseAccessIndexTest(CaseTestMixin, TestCase):
+
+    def test_accessible_case_ids_are_cached(self):
+        self.assertEqual(accessible_case_ids(self.fresh(self.attorney)), {self.case.pk})
+        attorney = self.fresh(self.attorney)
+        # The role lookup and the case set both come from the cache
+        accessible_case_ids(attorney)
+        self.assertTrue(can_access_case(self.fresh(self.attorney), self.case.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(can_access_case(attorney, self.case.pk))
+            self.assertFalse(can_access_case(attorney, self.case.pk + 1))
+
+    def test_assignment_changes_update_the_index(self):
+        other_case = Case.objects.create(case_title='Doe v. Roe')
+        accessible_case_ids(self.fresh(self.outsider))
+
+        # New assignment
+        assignment = CaseAssignment.objects.create(case=other_case, user=self.outsider)
+        self.assertEqual(accessible_case_ids(self.fresh(self.outsider)), {other_case.pk})
+
+        # Reassignment moves access from one user to the other
+        assignment = CaseAssignment.objects.get(pk=assignment.pk)
+        assignment.user = self.attorney
+        assignment.save()
+        self.assertEqual(accessible_case_ids(self.fresh(self.outsider)), frozenset())
+        self.assertEqual(accessible_case_ids(self.fresh(self.attorney)), {self.case.pk, other_case.pk})
+
+        # Removal
+        assignment.delete()
+        self.assertEqual(accessible_case_ids(self.fresh(self.attorney)), {self.case.pk})
+
+    def test_document_view_checks_case_access(self):
+        doc = Document.objects.create(case=self.case, title='Retainer', file_upload='case_documents/retainer.pdf')
+        url = reverse('cases:document-view', kwargs={'doc_pk': doc.pk})
+
+        self.client.login(username='outsider', password='password123')
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse('users:dashboard'), fetch_redirect_response=False)
+
+        self.client.login(username='client', password='password123')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], doc.file_upload.url)
+        self.assertEqual(doc.logs.filter(action='Viewed').count(), 1)
+
+
+class CaseDetailQueryTest(CaseTestMixin, TestCase):
+
+    def render_detail(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('cases:case-detail', kwargs={'pk': self.case.pk}))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_team_or_documents(self):
+        self.client.login(username='attorney', password='password123')
+        self.render_detail()  # warm the role and access caches
+        baseline = self.render_detail()
+
+        paralegal = Role.objects.get_or_create(name='Paralegal')[0]
+        for i in range(5):
+            user = User.objects.create_user(username=f'member{i}', password='password123')
+            paralegal.users.add(user)
+            CaseAssignment.objects.create(case=self.case, user=user)
+            Document.objects.create(case=self.case, title=f'Doc {i}', uploaded_by=user,
+                                    file_upload=f'case_documents/doc{i}.pdf')
+
+        self.assertEqual(self.render_detail(), baseline)
+
+
+class DashboardStatsTest(CaseTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        workflow = CaseWorkflow.objects.create(name='Litigation')
+        self.intake = CaseStage.objects.create(workflow=workflow, name='Intake', order=1)
+        self.discovery = CaseStage.objects.create(workflow=workflow, name='Discovery', order=2)
+
+    def assertStatsMatchRebuild(self):
+        scopes = [None, *User.objects.order_by('pk')]  # attorney, client, outsider
+        incremental = [get_dashboard_stats(user) for user in scopes]
+        rebuild_dashboard_stats()
+        self.assertEqual(incremental, [get_dashboard_stats(user) for user in scopes])
+        return incremental
+
+    def test_counters_follow_case_changes(self):
+        case = Case.objects.get(pk=self.case.pk)
+        case.current_stage = self.intake
+        case.save()
+        other = Case.objects.create(case_title='Doe v. Roe', current_stage=self.discovery)
+        CaseAssignment.objects.create(case=other, user=self.outsider)
+        doc = Document.objects.create(case=self.case, title='Retainer', file_upload='case_documents/retainer.pdf')
+        request = SignatureRequest.objects.create(document=doc, signer=self.client_user, requested_by=self.attorney)
+
+        firm, attorney, _, outsider = self.assertStatsMatchRebuild()
+        self.assertEqual(firm, {'stages': [('Intake', 1), ('Discovery', 1)], 'active_cases': 2, 'pending_signatures': 1})
+        self.assertEqual(attorney, {'stages': [('Intake', 1)], 'active_cases': 1, 'pending_signatures': 1})
+        self.assertEqual(outsider['pending_signatures'], 0)
+
+        # Stage moves, signing, archiving and reassignment
+        case = Case.objects.get(pk=self.case.pk)
+        case.current_stage = self.discovery
+        case.save()
+        request = SignatureRequest.objects.get(pk=request.pk)
+        request.status = SignatureRequest.Status.SIGNED
+        request.save()
+        other.is_archived = True
+        other.save()
+        assignment = CaseAssignment.objects.get(case=self.case, user=self.attorney)
+        assignment.user = self.outsider
+        assignment.save()
+
+        firm, attorney, _, outsider = self.assertStatsMatchRebuild()
+        self.assertEqual(firm, {'stages': [('Discovery', 1)], 'active_cases': 1, 'pending_signatures': 0})
+        self.assertEqual(attorney['active_cases'], 0)
+        self.assertEqual(outsider['active_cases'], 1)
+
+        # Deleting cases, stages and users
+        SignatureRequest.objects.create(document=doc, signer=self.client_user, requested_by=self.outsider)
+        self.discovery.delete()
+        self.assertEqual(get_dashboard_stats()['stages'], [('New', 1)])
+        self.outsider.delete()
+        self.assertStatsMatchRebuild()
+        Case.objects.get(pk=self.case.pk).delete()
+        firm = self.assertStatsMatchRebuild()[0]
+        self.assertEqual(firm['active_cases'], 0)
+
+    def test_dashboard_reads_counters(self):
+        Case.objects.create(case_title='Doe v. Roe', current_stage=self.intake)
+        self.client.login(username='attorney', password='password123')
+        response = self.client.get(reverse('cases:case-dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['active_case_count'], 1)
+        self.assertEqual(response.context['stage_labels'], '["New"]')
+
+
+class CasePaginationTest(CaseTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(11):
+            case = Case.objects.create(case_title=f'Matter {i:02d}')
+            CaseAssignment.objects.create(case=case, user=self.attorney)
+        self.client.login(username='attorney', password='password123')
+
+    def walk(self, sort):
+        url = reverse('cases:case-list-api')
+        params = {'sort': sort, 'page_size': 10}
+        titles, pages = [], []
+        while True:
+            data = self.client.get(url, params).json()
+            titles += [row['title'] for row in data['results']]
+            pages.append(data)
+            if not data['next']:
+                return titles, pages
+            params['cursor'] = data['next']
+
+    def test_pages_cover_every_case_once(self):
+        titles, pages = self.walk('title')
+        self.assertEqual(titles, sorted(Case.objects.values_list('case_title', flat=True)))
+        self.assertEqual(len(pages), 2)
+        self.assertIsNone(pages[0]['previous'])
+
+        # Going back from the second page returns the first one
+        back = self.client.get(reverse('cases:case-list-api'),
+                               {'sort': 'title', 'page_size': 10, 'cursor': pages[1]['previous']}).json()
+        self.assertEqual([row['title'] for row in back['results']], titles[:10])
+        self.assertIsNone(back['previous'])
+
+        newest, _ = self.walk('newest')
+        self.assertEqual(len(newest), 12)
+        self.assertEqual(len(set(newest)), 12)
+
+    def test_directory_and_dashboard_render_one_page(self):
+        for name in ('cases:case-directory', 'cases:case-dashboard'):
+            response = self.client.get(reverse(name), {'page_size': 10, 'cursor': 'not-a-cursor'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['page']), 10)
+            self.assertTrue(response.context['page'].has_next)
+
+
+class CalendarEventsTest(CaseTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.window = {'start': '2025-03-01T00:00:00Z', 'end': '2025-04-01T00:00:00Z'}
+        self.client.login(username='attorney', password='password123')
+
+    def add_meeting(self, title, when, minutes=60):
+        meeting = Meeting.objects.create(
+            case=self.case, title=title, meeting_type='video', organizer=self.attorney,
+            scheduled_time=datetime.fromisoformat(when).replace(tzinfo=dt_timezone.utc), duration_minutes=minutes,
+        )
+        meeting.participants.add(self.attorney, self.client_user)
+        return meeting
+
+    def fetch(self):
+        response = self.client.get(reverse('cases:calendar-events-api'), self.window)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_only_events_in_the_window_are_returned(self):
+        self.add_meeting('Kickoff', '2025-03-10T15:00:00')
+        self.add_meeting('Overnight deposition', '2025-02-28T22:00:00', minutes=180)
+        self.add_meeting('Last year', '2024-03-10T15:00:00')
+        self.add_meeting('Next month', '2025-04-02T15:00:00')
+        for day in (5, 40):
+            DocumentDueDate.objects.create(case=self.case, document_name=f'Filing {day}',
+                                           due_date=datetime(2025, 3, 1, tzinfo=dt_timezone.utc) + timezone.timedelta(days=day))
+
+        events = self.fetch()
+        self.assertEqual(sorted(event['title'] for event in events),
+                         ['📄 Filing 5', '📞 Kickoff', '📞 Overnight deposition'])
+        kickoff = next(event for event in events if event['title'] == '📞 Kickoff')
+        self.assertEqual(kickoff['extendedProps']['participants'], 'attorney, client')
+
+    def test_query_count_does_not_grow_with_meetings(self):
+        self.add_meeting('Kickoff', '2025-03-10T15:00:00')
+        self.fetch()  # warm the role and access caches
+        for day in range(11, 21):
+            self.add_meeting(f'Check-in {day}', f'2025-03-{day}T15:00:00')
+        with self.assertNumQueries(5):  # session, user, meetings, participants, due dates
+            self.assertEqual(len(self.fetch()), 11)
+        # Served from the cache until something changes
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.fetch()), 11)
+
+    def test_unchanged_feed_is_revalidated_with_etag(self):
+        meeting = self.add_meeting('Kickoff', '2025-03-10T15:00:00')
+        url = reverse('cases:calendar-events-api')
+        response = self.client.get(url, self.window)
+        etag = response['ETag']
+
+        # Nothing changed: 304 without touching the events tables
+        with self.assertNumQueries(2):  # session, user
+            response = self.client.get(url, self.window, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        def rename_case():
+            case = Case.objects.get(pk=self.case.pk)
+            case.case_title = 'Renamed'
+            case.save()
+
+        def describe_case():
+            case = Case.objects.get(pk=self.case.pk)
+            case.description = 'Breach of a supply contract'
+            case.save()
+
+        def move_meeting():
+            moved = Meeting.objects.get(pk=meeting.pk)
+            moved.duration_minutes = 90
+            moved.save()
+
+        # Each kind of change moves the ETag
+        changes = [
+            move_meeting,
+            lambda: meeting.participants.remove(self.client_user),
+            lambda: DocumentDueDate.objects.create(case=self.case, document_name='Brief',
+                                                   due_date=timezone.now()),
+            rename_case,
+            describe_case,
+        ]
+        for change in changes:
+            change()
+            response = self.client.get(url, self.window, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+
+
+class CalendarFeedTest(CaseTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.login(username='attorney', password='password123')
+        self.feed_url = self.client.get(reverse('cases:calendar')).context['ical_subscribe_url']
+        self.client.logout()  # calendar apps have no session
+
+    def add_meeting(self, title, days_ahead):
+        meeting = Meeting.objects.create(
+            case=self.case, title=title, meeting_type='phone', organizer=self.attorney,
+            scheduled_time=timezone.now() + timezone.timedelta(days=days_ahead),
+        )
+        meeting.participants.add(self.attorney)
+        return meeting
+
+    def test_feed_lists_events_and_supports_conditional_requests(self):
+        self.add_meeting('Deposition, day 1', 3)
+        DocumentDueDate.objects.create(case=self.case, document_name='Answer', due_date=timezone.now())
+
+        response = self.client.get(self.feed_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('SUMMARY:Deposition\\, day 1\r\n', body)
+        self.assertIn('SUMMARY:Due: Answer\r\n', body)
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n'))
+
+        self.assertEqual(self.client.get(self.feed_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(self.feed_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        # A new meeting changes the feed; the unchanged one is not re-rendered
+        self.add_meeting('Mediation', 5)
+        with mock.patch.object(ical, '_meeting_snippet', wraps=ical._meeting_snippet) as render:
+            response = self.client.get(self.feed_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('SUMMARY:Mediation', response.content.decode())
+        self.assertEqual(render.call_count, 1)
+
+    def test_unknown_token_is_rejected(self):
+        for token in ('', 'not-a-uuid', '00000000-0000-0000-0000-000000000000'):
+            response = self.client.get(reverse('cases:calendar-ics'), {'token': token})
+            self.assertEqual(response.status_code, 404)
+
+
+class AvailabilityTest(CaseTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Monday 2030-01-07, 09:00 local time
+        self.monday = timezone.make_aware(timezone.datetime(2030, 1, 7, 9, 0))
+
+    def book(self, user, hour, minutes=60, day=0):
+        meeting = Meeting.objects.create(
+            case=self.case, title=f'Busy {hour}', meeting_type='phone', organizer=user,
+            scheduled_time=self.monday + timezone.timedelta(days=day, hours=hour - 9),
+            duration_minutes=minutes,
+        )
+        meeting.participants.add(user)
+        return meeting
+
+    def test_busy_index_merges_and_finds_overlaps(self):
+        t = lambda hour: self.monday.replace(hour=hour)  # noqa: E731
+        index = BusyIndex([(t(13), t(14)), (t(9), t(10)), (t(9), t(11)), (t(11), t(12))])
+        self.assertEqual(list(index), [(t(9), t(12)), (t(13), t(14))])
+        self.assertFalse(index.is_free(t(11), t(13)))
+        self.assertTrue(index.is_free(t(12), t(13)))
+        self.assertEqual(index.blocking(t(12), t(15)), (t(13), t(14)))
+
+    def test_earliest_common_slot_skips_everyones_meetings(self):
+        self.book(self.attorney, 9, minutes=90)
+        self.book(self.client_user, 11)
+        self.book(self.client_user, 12, minutes=300)  # rest of the day
+
+        start, end = earliest_common_slot(
+            [self.attorney.pk, self.client_user.pk], timezone.timedelta(minutes=30), after=self.monday,
+        )
+        self.assertEqual(start, self.monday.replace(hour=10, minute=30))
+        self.assertEqual(end - start, timezone.timedelta(minutes=30))
+
+        # Two hours don't fit before 11:00, so it moves to Tuesday morning
+        start, _ = earliest_common_slot(
+            [self.attorney.pk, self.client_user.pk], timezone.timedelta(hours=2), after=self.monday,
+        )
+        self.assertEqual(start, self.monday + timezone.timedelta(days=1))
+
+    def test_meeting_form_reports_conflicts_unless_ignored(self):
+        existing = self.book(self.client_user, 10)
+        data = {
+            'case': self.case.pk, 'title': 'Strategy', 'meeting_type': 'phone',
+            'scheduled_time': (self.monday + timezone.timedelta(minutes=30)).isoformat(),
+            'duration_minutes': 60, 'participants': [self.attorney.pk, self.client_user.pk],
+        }
+        form = MeetingForm(data)
+        self.assertFalse(form.is_valid())
+        self.assertIn('Busy 10', form.non_field_errors()[0])
+        self.assertEqual(list(form.conflicts), [self.client_user.pk])
+
+        self.assertTrue(MeetingForm({**data, 'ignore_conflicts': 'on'}).is_valid())
+
+        # Moving a meeting doesn't conflict with itself
+        form = MeetingForm({**data, 'title': existing.title, 'participants': [self.client_user.pk],
+                            'scheduled_time': (self.monday + timezone.timedelta(minutes=90)).isoformat()},
+                           instance=existing)
+        self.assertTrue(form.is_valid())
+
+    def test_meeting_form_hides_people_outside_the_organizers_cases(self):
+        other_case = Case.objects.create(case_title='Doe v. Roe')
+        stranger = User.objects.create_user(username='stranger', password='password123')
+        CaseAssignment.objects.create(case=other_case, user=stranger)
+        CaseAssignment.objects.create(case=other_case, user=self.client_user)
+        Meeting.objects.create(
+            case=other_case, title='Settlement talks', meeting_type='phone', organizer=stranger,
+            scheduled_time=self.monday, duration_minutes=60,
+        ).participants.add(stranger, self.client_user)
+
+        self.client.login(username='attorney', password='password123')
+        data = {
+            'case': self.case.pk, 'title': 'Strategy', 'meeting_type': 'phone',
+            'scheduled_time': self.monday.isoformat(), 'duration_minutes': 60,
+        }
+        response = self.client.post(reverse('cases:create-meeting'), {**data, 'participants': [stranger.pk]})
+        self.assertIn('participants', response.context['form'].errors)
+        self.assertNotContains(response, 'Settlement talks')
+
+        # A shared client's clash on another case is reported without its title
+        response = self.client.post(reverse('cases:create-meeting'), {**data, 'participants': [self.client_user.pk]})
+        self.assertContains(response, 'another case')
+        self.assertNotContains(response, 'Settlement talks')
+
+    def test_availability_api(self):
+        self.book(self.attorney, 9)
+        url = reverse('cases:availability-api')
+
+        self.client.login(username='client', password='password123')
+        self.assertEqual(self.client.get(url, {'case_id': self.case.pk}).status_code, 403)
+
+        self.client.login(username='attorney', password='password123')
+        response = self.client.get(url, {'case_id': self.case.pk, 'duration': 45, 'after': self.monday.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(sorted(data['participants']), sorted([self.attorney.pk, self.client_user.pk]))
+        self.assertEqual(data['start'], self.monday.replace(hour=10).isoformat())
+        self.assertEqual(self.client.get(url, {'duration': 45}).status_code, 400)
+
+        # Only people who share a case with the caller
+        self.assertEqual(self.client.get(url, {'participants': [self.client_user.pk]}).status_code, 200)
+        self.assertEqual(self.client.get(url, {'participants': [self.outsider.pk]}).status_code, 403)
+        self.assertEqual(
+            self.client.get(url, {'case_id': self.case.pk, 'participants': [self.outsider.pk]}).status_code, 403,
+        )
+
+
+class RecurringMeetingTest(CaseTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Mondays and Wednesdays at 9:00 from Monday 2030-01-07, with no end
+        self.first = timezone.make_aware(timezone.datetime(2030, 1, 7, 9, 0))
+        self.meeting = Meeting.objects.create(
+            case=self.case, title='Check-in', meeting_type='phone', organizer=self.attorney,
+            scheduled_time=self.first, duration_minutes=30, recurrence_rule='FREQ=WEEKLY;BYDAY=MO,WE',
+        )
+        self.meeting.participants.add(self.attorney, self.client_user)
+
+    def local(self, *args):
+        return timezone.make_aware(timezone.datetime(*args))
+
+    def events(self, start, end):
+        return meeting_events(self.attorney, start, end)
+
+    def test_occurrences_are_expanded_in_the_window_only(self):
+        # Far into the series, across a DST change: still 9:00 local time
+        events = self.events(self.local(2031, 6, 1), self.local(2031, 6, 8))
+        starts = [timezone.localtime(timezone.datetime.fromisoformat(e['start'])) for e in events]
+        self.assertEqual([(s.month, s.day, s.hour) for s in starts], [(6, 2, 9), (6, 4, 9)])
+        self.assertTrue(all(e['extendedProps']['recurring'] for e in events))
+
+        # Cancel one occurrence and move the other
+        MeetingOverride.objects.create(meeting=self.meeting, original_start=self.local(2031, 6, 2, 9), is_cancelled=True)
+        MeetingOverride.objects.create(
+            meeting=self.meeting, original_start=self.local(2031, 6, 4, 9),
+            scheduled_time=self.local(2031, 6, 5, 14), title='Check-in (moved)',
+        )
+        events = self.events(self.local(2031, 6, 1), self.local(2031, 6, 8))
+        self.assertEqual([e['title'] for e in events], ['📞 Check-in (moved)'])
+        self.assertEqual(timezone.datetime.fromisoformat(events[0]['start']), self.local(2031, 6, 5, 14))
+
+        # COUNT ends the series; the end is stored for window queries
+        self.meeting.recurrence_rule = str(parse_rule('freq=weekly;byday=mo,we;count=4'))
+        self.meeting.save()
+        self.assertEqual(self.meeting.recurrence_end, self.local(2030, 1, 16, 9, 30))
+        self.assertEqual(len(self.events(self.first, self.local(2030, 3, 1))), 4)
+        self.assertEqual(self.events(self.local(2030, 1, 17), self.local(2030, 3, 1)), [])
+
+    def test_meeting_form_validates_rule(self):
+        data = {
+            'case': self.case.pk, 'title': 'Weekly', 'meeting_type': 'phone',
+            'scheduled_time': self.local(2030, 1, 8, 9).isoformat(), 'duration_minutes': 30,
+            'participants': [self.attorney.pk], 'recurrence_rule': 'FREQ=HOURLY',
+        }
+        self.assertIn('recurrence_rule', MeetingForm(data).errors)
+        form = MeetingForm({**data, 'recurrence_rule': 'rrule:freq=weekly;interval=2'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['recurrence_rule'], 'FREQ=WEEKLY;INTERVAL=2')
+
+        # Occurrences of existing series count as conflicts
+        form = MeetingForm({**data, 'recurrence_rule': '', 'scheduled_time': self.local(2030, 3, 4, 9, 15).isoformat()})
+        self.assertFalse(form.is_valid())
+        self.assertIn('Check-in', form.non_field_errors()[0])
+
+        # ...and so do later occurrences of a new series: Tuesday is free, Wednesday isn't
+        self.assertTrue(MeetingForm({**data, 'recurrence_rule': 'FREQ=DAILY;COUNT=1'}).is_valid())
+        form = MeetingForm({**data, 'recurrence_rule': 'FREQ=DAILY;COUNT=2'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('Check-in', form.non_field_errors()[0])
+        # Beyond SERIES_HORIZON nothing is checked (the second one is on a Wednesday in May)
+        self.assertTrue(MeetingForm({**data, 'recurrence_rule': 'FREQ=DAILY;INTERVAL=120;COUNT=2'}).is_valid())
+
+    def test_ical_feed_publishes_rule_and_exceptions(self):
+        self.meeting.scheduled_time = timezone.now().replace(microsecond=0)
+        self.meeting.save()
+        first = timezone.localtime(self.meeting.scheduled_time)
+        MeetingOverride.objects.create(meeting=self.meeting, original_start=first + timezone.timedelta(days=7),
+                                       is_cancelled=True)
+        feed = build_feed(self.fresh(self.attorney))[0]
+        self.assertIn('RRULE:FREQ=WEEKLY;BYDAY=MO,WE\r\n', feed)
+        self.assertIn(f'EXDATE;TZID={settings.TIME_ZONE}:{first + timezone.timedelta(days=7):%Y%m%dT%H%M%S}\r\n', feed)
+        self.assertEqual(feed.count('BEGIN:VEVENT'), 1)
+
+        MeetingOverride.objects.create(meeting=self.meeting, original_start=first + timezone.timedelta(days=14),
+                                       title='Moved')
+        feed = build_feed(self.fresh(self.attorney))[0]
+        self.assertIn(f'RECURRENCE-ID;TZID={settings.TIME_ZONE}:', feed)
+        self.assertEqual(feed.count('BEGIN:VEVENT'), 2)
+
+
+class ReminderSchedulerTest(CaseTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.attorney.email = 'attorney@example.com'
+        self.attorney.save()
+        self.client_user.email = 'client@example.com'
+        self.client_user.save()
+        self.clock = timezone.now()
+
+    def scheduler(self):
+        return ReminderScheduler(now=lambda: self.clock)
+
+    def test_reminders_fire_once_in_batches_and_follow_edits(self):
+        meeting = Meeting.objects.create(
+            case=self.case, title='Prep call', meeting_type='phone', organizer=self.attorney,
+            scheduled_time=self.clock + timezone.timedelta(hours=2),
+        )
+        meeting.participants.add(self.attorney, self.client_user)
+        due = DocumentDueDate.objects.create(
+            case=self.case, document_name='Answer', due_date=self.clock + timezone.timedelta(hours=30),
+        )
+        scheduler = self.scheduler()
+
+        self.assertEqual(scheduler.run_once(), 0)
+        self.assertEqual(len(scheduler), 2)
+        # Sleeps until the meeting reminder (30 minutes before), capped by the poll interval
+        self.assertEqual(scheduler.next_wakeup(), 60)
+
+        # The deadline moves forward by four hours: picked up by the next poll
+        due.due_date = self.clock + timezone.timedelta(hours=26)
+        due.save()
+        scheduler.run_once()
+
+        self.clock += timezone.timedelta(hours=1, minutes=31)
+        self.assertEqual(scheduler.run_once(), 2)  # both participants, one connection
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['attorney@example.com', 'client@example.com'])
+        self.assertEqual(mail.outbox[0].subject, 'Reminder: Prep call')
+
+        # Only the attorney gets deadline reminders; a restart doesn't resend
+        self.clock += timezone.timedelta(hours=1)
+        self.assertEqual(scheduler.run_once(), 1)
+        self.assertEqual(mail.outbox[-1].to, ['attorney@example.com'])
+        self.assertIn('Deadline: Answer', mail.outbox[-1].body)
+        self.assertEqual(self.scheduler().run_once(), 0)
+        self.assertEqual(ReminderLog.objects.count(), 3)
+
+    def test_completed_deadlines_are_not_sent(self):
+        due = DocumentDueDate.objects.create(
+            case=self.case, document_name='Brief', due_date=self.clock + timezone.timedelta(hours=25),
+        )
+        scheduler = self.scheduler()
+        scheduler.run_once()
+        DocumentDueDate.objects.filter(pk=due.pk).update(is_completed=True)  # no updated_at bump
+
+        self.clock += timezone.timedelta(hours=2)
+        self.assertEqual(scheduler.run_once(), 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_polls_catch_rows_committed_after_they_were_stamped(self):
+        due = DocumentDueDate.objects.create(
+            case=self.case, document_name='Brief', due_date=self.clock + timezone.timedelta(hours=40),
+        )
+        scheduler = self.scheduler()
+        scheduler.run_once()
+        self.assertEqual(len(scheduler), 1)
+
+        # Saved in a transaction that started before the last poll and committed after it
+        moved_to = self.clock + timezone.timedelta(hours=30)
+        DocumentDueDate.objects.filter(pk=due.pk).update(
+            due_date=moved_to, updated_at=self.clock - timezone.timedelta(seconds=10),
+        )
+        self.clock += timezone.timedelta(seconds=30)
+        self.assertEqual(scheduler.poll_changes(), 1)
+        self.assertEqual([r.event_start for r in scheduler.pending.values()], [moved_to])
+
+    def test_run_forever_survives_a_failed_send_and_retries(self):
+        meeting = Meeting.objects.create(
+            case=self.case, title='Prep call', meeting_type='phone', organizer=self.attorney,
+            scheduled_time=self.clock + timezone.timedelta(minutes=20),
+        )
+        meeting.participants.add(self.attorney)
+
+        class Stop(Exception):
+            pass
+
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 2:
+                raise Stop
+
+        connection = mail.get_connection()
+        send, calls = connection.send_messages, []
+
+        def send_messages(messages):
+            calls.append(messages)
+            if len(calls) == 1:
+                raise SMTPException('Server unavailable')
+            return send(messages)
+
+        scheduler = ReminderScheduler(now=lambda: self.clock, sleep=sleep, connection=connection)
+        # (closing connections would end the test's transaction)
+        with mock.patch.object(connection, 'send_messages', send_messages), \
+                mock.patch('cases.reminders.close_old_connections') as close_old_connections, \
+                self.assertLogs('cases.reminders', 'ERROR'), self.assertRaises(Stop):
+            scheduler.run_forever()
+
+        self.assertEqual(sleeps[0], scheduler.poll_interval)  # backs off after the failure
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(close_old_connections.called)
+        self.assertEqual([m.to for m in mail.outbox], [['attorney@example.com']])
+
+
+def make_docx(title_placeholder='{{case_title}}'):
+    """A small .docx with a placeholder split across runs, a header and a table."""
+    import io
+    import docx
+
+    document = docx.Document()
+    paragraph = document.add_paragraph()
+    paragraph.add_run('Dear {{client_')
+    paragraph.add_run('name}}').bold = True  # Word often splits placeholders like this
+    paragraph.add_run(f', re: {title_placeholder} ({{{{unknown}}}})')
+    document.sections[0].header.paragraphs[0].text = 'Matter: {{case_title}}'
+    document.add_table(rows=1, cols=1).cell(0, 0).text = 'Signed, {{attorney_name}}'
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+class DocxRenderTest(TestCase):
+
+    def test_fills_split_placeholders_in_body_tables_and_headers(self):
+        source = make_docx()
+        self.assertEqual(
+            compile_docx(io.BytesIO(source)).placeholders, {'client_name', 'case_title', 'unknown', 'attorney_name'},
+        )
+        output = render_docx(io.BytesIO(source), {
+            'client_name': 'Ann & Bob', 'case_title': 'Smith v. Jones', 'attorney_name': 'A. Lawyer',
+        })
+
+        result = docx.Document(io.BytesIO(output))
+        self.assertEqual(result.paragraphs[0].text, 'Dear Ann & Bob, re: Smith v. Jones ({{unknown}})')
+        self.assertEqual(result.sections[0].header.paragraphs[0].text, 'Matter: Smith v. Jones')
+        self.assertEqual(result.tables[0].cell(0, 0).text, 'Signed, A. Lawyer')
+
+        # Parts without placeholders are copied byte for byte
+        with zipfile.ZipFile(io.BytesIO(source)) as before, zipfile.ZipFile(io.BytesIO(output)) as after:
+            self.assertEqual(before.namelist(), after.namelist())
+            self.assertEqual(before.read('word/styles.xml'), after.read('word/styles.xml'))
+
+
+class CompiledTemplateCacheTest(TemporaryMediaMixin, CaseTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.spill_dir = os.path.join(self.media_root, 'spill')
+
+    def add_template(self, name, content):
+        return Template.objects.create(name=name, template_file=SimpleUploadedFile(f'{name}.docx', content))
+
+    def test_compiles_once_spills_to_disk_and_follows_file_changes(self):
+        first = self.add_template('Engagement', make_docx())
+        second = self.add_template('Retainer', make_docx('{{client_email}}'))
+        self.assertEqual(len(first.content_hash), 64)
+
+        cache_ = template_cache.CompiledTemplateCache(max_entries=1, spill_dir=self.spill_dir)
+        with mock.patch.object(template_cache, 'compile_docx', wraps=template_cache.compile_docx) as compile_docx:
+            cache_.get(first)
+            cache_.get(first)
+            self.assertEqual(compile_docx.call_count, 1)
+
+            cache_.get(second)  # pushes the first one out to disk...
+            self.assertEqual(len(os.listdir(self.spill_dir)), 1)
+            self.assertIn('case_title', cache_.get(first).placeholders)  # ...and back
+            self.assertEqual(compile_docx.call_count, 2)
+
+            # A new upload gets a new hash, so the old compiled form is not used
+            first.template_file = SimpleUploadedFile('Engagement.docx', make_docx('{{client_email}}'))
+            first.save()
+            self.assertIn('client_email', cache_.get(first).placeholders)
+            self.assertEqual(compile_docx.call_count, 3)
+
+    def test_spilled_templates_are_data_in_a_private_directory(self):
+        compiled = compile_docx(io.BytesIO(make_docx()))
+        dumped = io.BytesIO()
+        compiled.dump(dumped)
+        dumped.seek(0)
+        context = {'case_title': 'Smith v. Jones', 'client_name': 'Ann'}
+        self.assertEqual(CompiledDocx.load(dumped).render(context), compiled.render(context))
+
+        # Garbage or stale files are cache misses, not errors
+        cache_ = template_cache.CompiledTemplateCache(spill_dir=self.spill_dir)
+        key = ('Engagement.docx', 'abc')
+        os.makedirs(self.spill_dir)
+        with open(cache_._spill_path(key), 'wb') as f:
+            f.write(b'\x80\x04garbage')
+        self.assertIsNone(cache_._unspill(key))
+
+        # A directory others can write to is never read from
+        cache_._spill(key, compiled)
+        os.chmod(self.spill_dir, 0o777)
+        with self.assertLogs('cases.template_cache', 'WARNING'):
+            self.assertIsNone(cache_._unspill(key))
+        os.chmod(self.spill_dir, 0o700)
+        self.assertIsNotNone(cache_._unspill(key))
+
+    def test_generate_document_view_fills_template(self):
+        template = self.add_template('Engagement', make_docx())
+        template.is_public = True
+        template.save()
+        self.client.login(username='attorney', password='password123')
+        response = self.client.post(reverse('cases:generate-document', kwargs={'case_pk': self.case.pk}),
+                                    {'template_id': template.pk})
+        self.assertRedirects(response, reverse('cases:case-detail', kwargs={'pk': self.case.pk}),
+                             fetch_redirect_response=False)
+
+        generated = Document.objects.get(case=self.case)
+        with generated.file_upload.open('rb') as f:
+            result = docx.Document(io.BytesIO(f.read()))
+        self.assertIn('re: Smith v. Jones', result.paragraphs[0].text)
+
+
+class BatchGenerationTest(TemporaryMediaMixin, CaseTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.template = Template.objects.create(
+            name='Engagement', is_public=True, template_file=SimpleUploadedFile('Engagement.docx', make_docx()),
+        )
+
+    def document_text(self, document):
+        with document.file_upload.open('rb') as f:
+            return docx.Document(io.BytesIO(f.read())).paragraphs[0].text
+
+    def test_generates_per_case_documents_in_worker_processes(self):
+        others = [Case.objects.create(case_title=f'Matter {i}') for i in range(4)]
+        case_ids = [self.case.pk] + [case.pk for case in others] + [999999]
+        results = generate_batch(self.template, case_ids, self.attorney, workers=2)
+
+        self.assertEqual([result.case_id for result in results], case_ids)
+        self.assertEqual([result.ok for result in results], [True] * 5 + [False])
+        self.assertEqual(results[-1].error, "Case not found.")
+        self.assertIn('re: Smith v. Jones', self.document_text(Document.objects.get(case=self.case)))
+        self.assertIn('re: Matter 3', self.document_text(Document.objects.get(case=others[3])))
+        self.assertEqual(DocumentLog.objects.filter(action="Generated", user=self.attorney).count(), 5)
+
+    def test_view_renders_inside_the_request_process(self):
+        others = [Case.objects.create(case_title=f'Matter {i}') for i in range(4)]
+        for case in others:
+            CaseAssignment.objects.create(case=case, user=self.attorney)
+        self.client.login(username='attorney', password='password123')
+        with mock.patch.object(generation, 'ProcessPoolExecutor') as executor:
+            response = self.client.post(reverse('cases:batch-generate'), {
+                'template': f'docx:{self.template.pk}',
+                'case_ids': [self.case.pk] + [case.pk for case in others],
+            })
+        executor.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Document.objects.filter(case__in=others).count(), 4)
+
+    def test_view_only_generates_for_accessible_cases(self):
+        other = Case.objects.create(case_title='Not Assigned')
+        self.client.login(username='attorney', password='password123')
+        response = self.client.post(reverse('cases:batch-generate'), {
+            'template': f'docx:{self.template.pk}', 'case_ids': [self.case.pk, other.pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result.case_id for result in response.context['results']], [self.case.pk])
+        self.assertFalse(Document.objects.filter(case=other).exists())
+
+        self.client.login(username='client', password='password123')
+        response = self.client.get(reverse('cases:batch-generate'))
+        self.assertEqual(response.status_code, 302)
+
+
+class PdfRendererTest(TestCase):
+
+    @skipIf(utils.HTML is None, "WeasyPrint (or its system libraries) is not installed")
+    def test_renderer_is_reused_per_thread(self):
+        renderer = get_renderer()
+        self.assertIs(get_renderer(), renderer)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(get_renderer()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], renderer)
+
+        output, file_name = generate_document_from_template('<p>Retainer</p>', 'Retainer Agreement')
+        self.assertTrue(file_name.startswith('Retainer_Agreement_'))
+        with output:
+            self.assertTrue(output.read().startswith(b'%PDF'))
+
+    def test_html_fallback_keeps_the_document_styles(self):
+        with mock.patch.object(utils, 'HTML', None):
+            output, file_name = utils.generate_document_from_template('<p>Retainer</p>', 'Retainer')
+        self.assertTrue(file_name.endswith('.html'))
+        with output:
+            html = output.read().decode()
+        self.assertLess(html.index('<style>'), html.index('</head>'))
+        self.assertIn('font-family', html)
+
+
+class ContractPdfCacheTest(CaseTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.cache_ = pdf_cache.PdfCache(directory, max_bytes=10_000)
+        patcher = mock.patch.object(pdf_cache, 'contract_pdfs', self.cache_)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @skipIf(utils.HTML is None, "WeasyPrint (or its system libraries) is not installed")
+    def test_repeated_downloads_are_served_from_the_cache(self):
+        template = ContractTemplate.objects.create(name='Retainer', content='<p>Retainer terms</p>')
+        url = reverse('cases:template-download', kwargs={'pk': template.pk})
+        self.client.login(username='attorney', password='password123')
+        with mock.patch.object(utils, 'generate_document_from_template',
+                               wraps=utils.generate_document_from_template) as render:
+            first = b''.join(self.client.get(url).streaming_content)
+            second = b''.join(self.client.get(url).streaming_content)
+            self.assertEqual(render.call_count, 1)
+            self.assertEqual(first, second)
+
+            template.content = '<p>New terms</p>'
+            template.save()
+            self.client.get(url)
+            self.assertEqual(render.call_count, 2)
+
+    def test_evicts_least_recently_used_files(self):
+        for key in ('a' * 64, 'b' * 64, 'c' * 64):
+            self.cache_.put(key, io.BytesIO(b'x' * 4000))
+            time.sleep(0.01)
+            self.cache_.open('a' * 64).close()  # keeps 'a' recently used
+            time.sleep(0.01)
+
+        self.assertTrue(os.path.exists(self.cache_.path('a' * 64)))
+        self.assertFalse(os.path.exists(self.cache_.path('b' * 64)))
+        self.assertTrue(os.path.exists(self.cache_.path('c' * 64)))
+
+    def test_refuses_a_directory_others_can_write(self):
+        self.cache_.put('a' * 64, io.BytesIO(b'%PDF-1.7'))
+        os.chmod(self.cache_.directory, 0o777)
+        self.addCleanup(os.chmod, self.cache_.directory, 0o700)
+        with self.assertLogs('cases.pdf_cache', 'WARNING'):
+            self.assertIsNone(self.cache_.open('a' * 64))
+
+        # Nothing is written, and downloads still work, rendered without the cache
+        template = ContractTemplate.objects.create(name='Retainer', content='<p>Retainer terms</p>')
+        self.client.login(username='attorney', password='password123')
+        with mock.patch.object(pdf_cache, 'logger'):
+            self.cache_.put('b' * 64, io.BytesIO(b'%PDF-1.7'))
+            response = self.client.get(reverse('cases:template-download', kwargs={'pk': template.pk}))
+        self.assertFalse(os.path.exists(self.cache_.path('b' * 64)))
+        self.assertEqual(response.status_code, 200)
+
+
+class ContractRegistryTest(CaseTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, file_name, content, mtime=None):
+        path = os.path.join(self.directory, file_name)
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(content)
+        if mtime:
+            os.utime(path, (mtime, mtime))
+
+    def test_reads_files_once_unless_auto_reloading(self):
+        self.write('vehicle_PurchaseandSale_contract.html', '<p>{{ SELLER }} sells to {{BUYERS}}</p>', mtime=1000)
+        self.write('lease_contract_es.html', '<p>{{LESSOR}}</p>')
+        self.write('notes.html', '<p>Not a contract</p>')
+
+        registry = ContractRegistry(self.directory, auto_reload=False)
+        self.assertEqual(registry.choices(), [
+            ('lease_contract_es.html', 'Lease'),
+            ('vehicle_PurchaseandSale_contract.html', 'Vehicle Purchase And Sale'),
+        ])
+        vehicle = registry.get('vehicle_PurchaseandSale_contract.html')
+        self.assertEqual((vehicle.language, vehicle.placeholders), ('en', ['BUYERS', 'SELLER']))
+        self.assertEqual(registry.get('lease_contract_es.html').language, 'es')
+
+        self.write('vehicle_PurchaseandSale_contract.html', '<p>{{ SELLER }}</p>', mtime=2000)
+        self.assertEqual(registry.get('vehicle_PurchaseandSale_contract.html').placeholders, ['BUYERS', 'SELLER'])
+
+        reloading = ContractRegistry(self.directory, auto_reload=True)
+        lease = reloading.get('lease_contract_es.html')
+        self.assertEqual(reloading.get('vehicle_PurchaseandSale_contract.html').placeholders, ['SELLER'])
+        self.write('vehicle_PurchaseandSale_contract.html', '<p>{{ BUYERS }}</p>', mtime=3000)
+        self.assertEqual(reloading.get('vehicle_PurchaseandSale_contract.html').placeholders, ['BUYERS'])
+        self.assertIs(reloading.get('lease_contract_es.html'), lease)  # unchanged, not read again
+
+    def test_contract_template_view_serves_registered_files_only(self):
+        self.write('nda_contract.html', '<p>NDA</p>')
+        self.client.login(username='attorney', password='password123')
+        url = reverse('cases:contract-template')
+        with mock.patch.object(views, 'contract_templates', ContractRegistry(self.directory)):
+            self.assertEqual(self.client.get(url, {'file': 'nda_contract.html'}).content, b'<p>NDA</p>')
+            self.assertEqual(self.client.get(url, {'file': 'missing_contract.html'}).status_code, 404)
+            self.assertEqual(self.client.get(url, {'file': '../settings_contract.html'}).status_code, 400)
+
+
+class PlaceholderIndexTest(CaseTestMixin, TestCase):
+
+    def test_placeholders_are_extracted_on_save_and_resolved_for_a_case(self):
+        self.client_user.first_name, self.client_user.last_name = 'Jane', 'Smith'
+        self.client_user.save()
+        template = ContractTemplate.objects.create(
+            name='Lease', is_public=True,
+            content='<p>{{ LESSOR }} leases to {{client_name}} for {{RENT}}, re: {{ CASE_TITLE }}</p>',
+        )
+        self.assertEqual(template.placeholders, ['CASE_TITLE', 'LESSOR', 'RENT', 'client_name'])
+
+        self.client.login(username='attorney', password='password123')
+        url = reverse('cases:case-placeholders', kwargs={'case_pk': self.case.pk})
+        response = self.client.get(url, {'template': f'db-{template.pk}'})
+        self.assertEqual(response.json()['placeholders'], [
+            {'key': 'CASE_TITLE', 'value': 'Smith v. Jones'},
+            {'key': 'LESSOR', 'value': 'Jane Smith'},
+            {'key': 'RENT', 'value': None},
+            {'key': 'client_name', 'value': 'Jane Smith'},
+        ])
+
+        private = ContractTemplate.objects.create(name='Private', content='{{X}}', created_by=self.outsider)
+        self.assertEqual(self.client.get(url, {'template': f'db-{private.pk}'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'template': 'missing_contract.html'}).status_code, 404)
+
+
+def make_pdf(pages=2):
+    """A small PDF with an underscore field on each page."""
+    import fitz
+
+    with fitz.open() as doc:
+        for number in range(pages):
+            page = doc.new_page()
+            page.insert_text((100, 100), f"Name: ______________ (page {number + 1})")
+        return doc.tobytes()
+
+
+class PdfAnalysisTest(CaseTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        patcher = mock.patch.object(pdf_analysis, 'ANALYSIS_DIR', directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, pdf=None):
+        response = self.client.post(reverse('cases:api-convert-pdf'), {
+            'pdf_file': SimpleUploadedFile('form.pdf', pdf or make_pdf(), content_type='application/pdf'),
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_are_served_separately_and_inlined_on_save(self):
+        self.client.login(username='attorney', password='password123')
+        data = self.upload()
+        self.assertEqual(len(data['pages']), 2)
+        page = data['pages'][0]
+        self.assertNotIn('image', page)
+        self.assertEqual(page['fields'][0]['type'], 'text')
+
+        png = self.client.get(page['image_url'])
+        self.assertEqual(png['Content-Type'], 'image/png')
+        self.assertIn('immutable', png['Cache-Control'])
+        self.assertTrue(b''.join(png.streaming_content).startswith(b'\x89PNG'))
+        webp = self.client.get(page['image_url'], {'format': 'webp', 'dpi': '144'})
+        self.assertEqual(b''.join(webp.streaming_content)[8:12], b'WEBP')
+
+        response = self.client.post(reverse('cases:template-list-create'), {
+            'name': 'Form', 'upload_id': data['upload_id'],
+            'content': f'<div class="pdf-page"><img src="{page["image_url"]}?dpi=144&amp;format=webp" data-pdf-page="1"></div>',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('src="data:image/png;base64,', ContractTemplate.objects.get(name='Form').content)
+
+        # Uploads are private to the user who made them
+        self.client.login(username='outsider', password='password123')
+        self.assertEqual(self.client.get(page['image_url']).status_code, 404)
+
+    def test_uploads_are_not_read_from_a_directory_others_can_write(self):
+        self.client.login(username='attorney', password='password123')
+        page = self.upload()['pages'][0]
+        os.chmod(pdf_analysis.ANALYSIS_DIR, 0o777)
+        self.addCleanup(os.chmod, pdf_analysis.ANALYSIS_DIR, 0o700)
+        with self.assertLogs('cases.pdf_analysis', 'ERROR'):
+            response = self.client.get(page['image_url'])
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'error': 'Page images are unavailable right now.'})
+
+    def test_detects_fields_from_indexed_words(self):
+        with fitz.open() as doc:
+            page = doc.new_page()
+            for row in range(20):
+                y = 100 + row * 30
+                page.insert_text((80, y - 2), f"Field {row}:")
+                page.draw_line((150, y), (400, y))
+                page.draw_line((150, y), (400, y))  # duplicate stroke: still one field
+            # A line with text just above its input box is not a blank
+            page.insert_text((160, 712), "Not a field")
+            page.draw_line((150, 720), (400, 720))
+            fields = detect_fields(page)
+
+        self.assertEqual(len(fields), 20)
+        self.assertEqual([field['label'] for field in fields[:2]], ['Field 0', 'Field 1'])
+        self.assertTrue(all(field['type'] == 'text' for field in fields))
+
+    def test_pages_are_analysed_in_parallel_in_page_order(self):
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(make_pdf(pages=7))
+
+        pages = analyze_pdf(path, workers=3)
+        self.assertEqual([page['number'] for page in pages], list(range(1, 8)))
+        self.assertEqual(pages, analyze_pdf(path, workers=1))
+        self.assertEqual(pages[6]['fields'][0]['label'], 'Name')
+
+    def test_requests_share_one_analysis_pool(self):
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(make_pdf(pages=5))
+
+        pages = pdf_analysis.analyze_pdf(path, workers=2)
+        pool = pdf_analysis._analysis_pool()
+        with mock.patch.object(pdf_analysis, 'ProcessPoolExecutor') as executor:
+            self.assertEqual(pdf_analysis.analyze_pdf(path, workers=2), pages)
+        executor.assert_not_called()
+        self.assertIs(pdf_analysis._analysis_pool(), pool)
+
+    def test_repeat_uploads_reuse_the_analysis(self):
+        pdf = make_pdf()
+        self.client.login(username='attorney', password='password123')
+        first = self.upload(pdf)
+        self.assertEqual(self.client.get(first['pages'][0]['image_url']).status_code, 200)
+
+        with mock.patch.object(pdf_analysis, 'analyze_pdf') as analyze, \
+                mock.patch.object(pdf_analysis.fitz, 'open') as fitz_open:
+            second = self.upload(pdf)
+            image = self.client.get(second['pages'][0]['image_url'])
+        analyze.assert_not_called()
+        fitz_open.assert_not_called()  # the image rendered for the first upload is reused
+        self.assertNotEqual(second['upload_id'], first['upload_id'])
+        self.assertEqual(second['pages'][0]['fields'], first['pages'][0]['fields'])
+        self.assertEqual(image.status_code, 200)
+
+        # Another user's upload of the same PDF shares the cache, not the upload
+        self.client.login(username='outsider', password='password123')
+        self.assertEqual(self.client.get(second['pages'][0]['image_url']).status_code, 404)
@@ -11,6 +11,9 @@ app_name = 'cases'
 urlpatterns = [
     # --- Calendar API  ---
     path('api/calendar-events/', views.calendar_events_api, name='calendar-events-api'),
+    path('api/calendar.ics/', views.calendar_ics_feed, name='calendar-ics'),
+    path('api/cases/', views.case_list_api, name='case-list-api'),
+    path('api/availability/', views.availability_api, name='availability-api'),
     path('calendar/', views.calendar_view, name='calendar'),
 
     # User Management Paths
@@ -31,6 +34,7 @@ urlpatterns = [
 
     # --- NEW: Admin Template Management ---
     path('templates/generate/', views.generate_document_view, name='template-generation'),
+    path('templates/batch-generate/', views.batch_generate_view, name='batch-generate'),
     path('templates/upload/', views.template_upload_view, name='template-upload'),
     path('contract-template/', views.contract_template_view, name='contract-template'),
 
@@ -51,7 +55,8 @@ urlpatterns = [
     path('api/templates/', ContractTemplateListCreateView.as_view(), name='template-list-create'),
     path('api/templates/<int:pk>/', ContractTemplateRetrieveUpdateDestroyView.as_view(), name='template-detail' ),
     path('templates/', views.template_list, name='template-list'),
-    path('api/convert-pdf/', views.convert_pdf_api_view, name='api-convert-pdf'),   
+    path('api/convert-pdf/', views.convert_pdf_api_view, name='api-convert-pdf'),
+    path('api/convert-pdf/<str:upload_id>/pages/<int:number>/', views.convert_pdf_page_view, name='api-convert-pdf-page'),
     path('api/templates/<int:pk>/download/', views.ContractTemplateDownloadView.as_view(), name='template-download'),
     path('api/contract-template/<int:pk>/content/', views.get_db_template_content, name='db-template-content'),
 
@@ -70,6 +75,7 @@ urlpatterns = [
 
     # --- Generate Document ---
     path('<int:case_pk>/generate-document/', views.generate_document_view, name='generate-document'),
+    path('<int:case_pk>/placeholders/', views.case_placeholders_api, name='case-placeholders'),
     path('<int:case_pk>/advance-stage/', views.advance_stage_view, name='advance-stage'),
 
     # --- E-Signature URLs ---
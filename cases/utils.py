@@ -1,42 +1,136 @@
-import io
-from io import BytesIO
-from django.template.loader import render_to_string
+import os
+import tempfile
+import threading
+from django.conf import settings
+from django.template.loader import get_template
 from datetime import datetime
 
-# Try to import weasyprint, handle error if not installed
+# Try to import weasyprint, handle error if not installed (or its system libraries are missing)
 try:
-    from weasyprint import HTML
-except ImportError:
-    HTML = None
+    from weasyprint import CSS, HTML
+    from weasyprint.text.fonts import FontConfiguration
+except (ImportError, OSError):
+    CSS = HTML = FontConfiguration = None
+
+WRAPPER_TEMPLATE = 'document_processor_temp.html'
+
+# Generated files larger than this are spooled to a temporary file on disk
+SPOOL_MAX_MEMORY = getattr(settings, 'DOCUMENT_SPOOL_MAX_MEMORY', 1024 * 1024)
+
+# Shared by every generated document, so it is parsed once per renderer
+# rather than once per PDF. :where() keeps its specificity at zero, so
+# styles inside a template's own content still win.
+DOCUMENT_STYLESHEET = """
+:where(body) {
+    font-family: 'Arial', sans-serif;
+    margin: 2cm;
+    line-height: 1.5;
+}
+"""
+
+
+class PdfRenderer:
+    """
+    Renders template HTML to PDF, keeping WeasyPrint's start-up work alive
+    between documents: the compiled wrapper template, the parsed shared
+    stylesheet and a ``FontConfiguration`` (with the fonts it has loaded).
+
+    Not thread-safe; use ``get_renderer()`` for one per thread and process.
+    """
+
+    def __init__(self, wrapper_template=WRAPPER_TEMPLATE, stylesheet=DOCUMENT_STYLESHEET):
+        self.wrapper = get_template(wrapper_template)
+        self.stylesheet = stylesheet
+        self.font_config = self.stylesheets = None
+        if HTML:
+            self.font_config = FontConfiguration()
+            self.stylesheets = [CSS(string=stylesheet, font_config=self.font_config)]
+
+    def render_html(self, template_content, context_data=None):
+        return self.wrapper.render({'template_content': template_content, **(context_data or {})})
+
+    def standalone_html(self, html_string):
+        """``html_string`` with the shared stylesheet inlined, for serving it as HTML."""
+        style = f'<style>{self.stylesheet}</style>\n'
+        head_end = html_string.lower().find('</head>')
+        if head_end == -1:
+            return style + html_string
+        return html_string[:head_end] + style + html_string[head_end:]
+
+    def write_pdf(self, html_string, target=None):
+        """PDF bytes of ``html_string`` (or writes them to ``target``)."""
+        return HTML(string=html_string).write_pdf(
+            target, stylesheets=self.stylesheets, font_config=self.font_config,
+        )
+
+    def warm_up(self):
+        """Renders a throwaway page so fonts are loaded before the first real document."""
+        if HTML:
+            self.write_pdf(self.render_html('<p>Warm-up</p>'))
+
+
+_renderers = threading.local()
+
+
+def get_renderer():
+    """The PdfRenderer of the current thread (a new one after a fork)."""
+    renderer = getattr(_renderers, 'renderer', None)
+    if renderer is None or _renderers.pid != os.getpid():
+        renderer = _renderers.renderer = PdfRenderer()
+        _renderers.pid = os.getpid()
+    return renderer
+
+
+def private_directory(path):
+    """
+    Creates ``path`` (mode 0700) if it is missing and returns it. Raises
+    PermissionError if another user owns it or others can write to it, so
+    nothing read back from it can have been planted.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if (hasattr(os, 'getuid') and st.st_uid != os.getuid()) or st.st_mode & 0o022:
+        raise PermissionError(f"{path} must belong to this process and not be writable by others")
+    return path
+
+
+def private_path(name):
+    """Default location of a private working directory (see PRIVATE_ROOT)."""
+    return os.path.join(getattr(settings, 'PRIVATE_ROOT', os.path.join(settings.BASE_DIR, 'var')), name)
+
+
+def spooled_file():
+    """A temporary file kept in memory up to SPOOL_MAX_MEMORY bytes, then on disk."""
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+
+
+def document_file_name(template_name, ext):
+    return f"{template_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.{ext}"
+
 
-# UPDATE THIS LINE to include context_data=None
 def generate_document_from_template(template_content, template_name, context_data=None):
     """
-    Generates a PDF from HTML content using WeasyPrint.
+    Generates a PDF from HTML content using WeasyPrint. Returns a spooled
+    temporary file (positioned at the start) and the file name.
     """
-    # Default to empty dict if nothing passed
-    if context_data is None:
-        context_data = {}
-        
+    renderer = get_renderer()
+
     # 1. Render the HTML with context
-    # If you don't have a wrapper template, just use the content directly
     try:
-        html_string = render_to_string('document_processor_temp.html', {'template_content': template_content, **context_data})
+        html_string = renderer.render_html(template_content, context_data)
     except Exception:
-        # Fallback if the wrapper template doesn't exist or fails
+        # Fallback if the wrapper template fails to render
         html_string = template_content
 
     # 2. Convert to PDF
+    output = spooled_file()
     if HTML:
-        pdf_bytes = HTML(string=html_string).write_pdf()
-        buffer = BytesIO(pdf_bytes)
+        renderer.write_pdf(html_string, output)
         ext = "pdf"
     else:
         # Fallback if WeasyPrint isn't installed: return text/html
-        buffer = BytesIO(html_string.encode('utf-8'))
+        output.write(renderer.standalone_html(html_string).encode('utf-8'))
         ext = "html"
+    output.seek(0)
 
-    # 3. Prepare filename
-    output_filename = f"{template_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.{ext}"
-    
-    return buffer, output_filename
\ No newline at end of file
+    return output, document_file_name(template_name, ext)
@@ -3,27 +3,30 @@ from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import condition, require_POST
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
 from django.urls import reverse
 from django.utils import timezone
-from django.db import models
+from django.utils.dateparse import parse_datetime
 from django import forms
 from .forms import CaseForm
-import io
-import base64
-import re
-import fitz
 from django.core.mail import send_mail
-from django.db.models import Q
+from django.db.models import Q, Prefetch
 from django.conf import settings
 from io import BytesIO
-from docx import Document as DocxDocument
-from rest_framework import generics, status
+from rest_framework import exceptions, generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from users.models import UserProfile
-from .utils import generate_document_from_template
+from .utils import spooled_file
+from .template_cache import render_template
+from .pdf_cache import cached_contract_pdf
+from . import pdf_analysis
+from .contract_registry import CONTRACT_FILE_RE, contract_templates
+from .generation import docx_file_name, generate_batch
+from .placeholders import case_document_context, case_placeholder_map, resolve_placeholders
 from communication.models import Message
 from communication.forms import NewMessageForm
 from django.urls import reverse_lazy
@@ -31,11 +34,6 @@ from django.views.generic.edit import UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 
-
-# --- WeasyPrint Imports ---
-from weasyprint import HTML, CSS
-from django.template.loader import render_to_string
-
 # We need to import the admin test function from our 'users' app
 
 # --- Model Imports ---
@@ -43,9 +41,10 @@ from .models import (
     Case, CaseAssignment, Document, DocumentLog,
     CaseWorkflow, CaseStage, Template, 
     SignatureRequest, CaseStageLog, Meeting, DocumentDueDate, ContractTemplate, ConsultationRequest,   
+    CalendarFeedToken,
 )
-from django.db.models import Sum, Count, Avg, F, Count
 from users.models import Role
+from users.roles import has_role
 from .serializers import ContractTemplateSerializer
 
 # --- Form Imports ---
@@ -56,15 +55,23 @@ from .forms import (
 )
 
 from users.views import is_admin
-from .decorators import user_is_assigned_to_case
+from .decorators import user_is_assigned_to_case, load_case
+from .access import accessible_case_ids, can_access_case, colleague_ids
+from .stats import get_dashboard_stats
+from .availability import earliest_common_slot
+from .events import calendar_etag, calendar_events_json
+from .ical import build_feed, feed_etag, feed_last_modified
+from .pagination import CASE_SORT_LABELS, PAGE_SIZES, paginate_cases
+from search.models import SearchDocument
+from search.query import matching_ids
 
 # --- Django's File handling utilities ---
-from django.core.files.base import ContentFile
+from django.core.files.base import File
+from django.core.exceptions import ValidationError
 from django.conf import settings # <-- Import settings
-from django.http import HttpResponse, JsonResponse, FileResponse
+from django.http import Http404, HttpResponse, JsonResponse, FileResponse
 from django.views.decorators.csrf import csrf_exempt
-from datetime import datetime
-import os
+from datetime import datetime, timedelta
 import json
 
 
@@ -138,58 +145,34 @@ def case_reassign_management(request, case_pk=None):
     
     return render(request, 'users/client_reassignment.html', context)
 
-# --- HELPER FUNCTION FOR DOCX ---
-def docx_find_and_replace(doc, context):
-    """
-    Finds and replaces text in a .docx file, preserving formatting.
-    Placeholders must be in the format {{key_name}}.
-    """
-    # Combine paragraphs from the main body and all table cells
-    all_paragraphs = list(doc.paragraphs)
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                all_paragraphs.extend(cell.paragraphs)
-    
-    for p in all_paragraphs:
-        for key, value in context.items():
-            placeholder = f"{{{{{key}}}}}" # Creates {{key_name}}
-            
-            # We must iterate over 'runs' to preserve formatting (bold, etc.)
-            # A simple p.text.replace() would wipe all formatting.
-            if placeholder in p.text:
-                for run in p.runs:
-                    if placeholder in run.text:
-                        run.text = run.text.replace(placeholder, str(value))
-    return doc
-
 # --- View 1: Case List (Admin) ---
 
 @login_required
 def case_dashboard_view(request):
     # 1. Determine User Roles
-    is_admin_user = request.user.roles.filter(name='Admin').exists()
-    is_attorney = request.user.roles.filter(name='Attorney').exists()
+    is_admin_user = has_role(request.user, 'Admin')
+    is_attorney = has_role(request.user, 'Attorney')
     
     # 2. Security Check
     if not (is_admin_user or is_attorney):
         return redirect('users:dashboard')
 
-    # 3. Get Cases (Active only for dashboard)
-    cases_list = Case.objects.filter(is_archived=False).select_related('current_stage').prefetch_related('assignments__user').order_by('-date_filed')
+    # 3. Get Cases (Active only for dashboard), one keyset page at a time
+    cases_list = Case.objects.filter(is_archived=False).select_related('current_stage').prefetch_related('assignments__user')
     
     # Filter cases: Admins see all, Attorneys see assigned only
     if not is_admin_user:
-        cases_list = cases_list.filter(assignments__user=request.user)
+        cases_list = cases_list.filter(pk__in=accessible_case_ids(request.user))
+    page = paginate_cases(cases_list, request.GET)
 
     # --- CHART DATA CALCULATION ---
-    stage_data = cases_list.values('current_stage__name').annotate(count=Count('id'))
-    stage_labels = [item['current_stage__name'] if item['current_stage__name'] else 'New' for item in stage_data]
-    stage_counts = [item['count'] for item in stage_data]
+    # Pre-aggregated counters (see cases/stats.py): firm-wide for admins
+    stats = get_dashboard_stats(None if is_admin_user else request.user)
+    stage_labels = [label for label, _ in stats['stages']]
+    stage_counts = [count for _, count in stats['stages']]
 
-    active_count = cases_list.count()
-    # Check if SignatureRequest exists to avoid errors if not imported
-    pending_count = SignatureRequest.objects.filter(status='pending').count() if 'SignatureRequest' in globals() else 0
+    active_count = stats['active_cases']
+    pending_count = stats['pending_signatures']
 
     # 4. Fetch Consultation Requests (UPDATED)
     # Now fetching both 'Pending' AND 'Scheduled' so they don't disappear after scheduling
@@ -209,7 +192,9 @@ def case_dashboard_view(request):
     recent_activity = CaseStageLog.objects.all().select_related('case', 'stage').order_by('-timestamp_entered')[:5]
 
     context = {
-        'cases': cases_list,
+        'cases': page,
+        'page': page,
+        **case_sort_context(),
         'active_case_count': active_count,
         'pending_signature_count': pending_count,
         'is_admin_user': is_admin_user,
@@ -227,8 +212,8 @@ def case_dashboard_view(request):
 #@user_passes_test(is_admin) //we want attorneys to also have access to this
 def case_create_view(request):
     # --- Permission Check: Only Admins and Attorneys can create cases ---
-    is_admin = request.user.roles.filter(name='Admin').exists()
-    is_attorney = request.user.roles.filter(name='Attorney').exists()
+    is_admin = has_role(request.user, 'Admin')
+    is_attorney = has_role(request.user, 'Attorney')
     
     if not (is_admin or is_attorney):
         messages.error(request, "Only admins and attorneys can create cases.")
@@ -295,10 +280,18 @@ def case_delete_view(request, pk):
     return redirect('cases:case-dashboard')
 
 # --- View 3: Case Detail (SECURED) ---
+# Everything the detail page renders, loaded up front so the page costs the
+# same handful of queries no matter how big the team or document list is.
+CASE_DETAIL_PREFETCH = (
+    'workflow__stages',
+    Prefetch('assignments', queryset=CaseAssignment.objects.select_related('user').prefetch_related('user__roles').order_by('pk')),
+    Prefetch('documents', queryset=Document.objects.select_related('uploaded_by').order_by('-id')),
+    Prefetch('meetings', queryset=Meeting.objects.order_by('scheduled_time')),
+)
+
 @login_required
-@user_is_assigned_to_case
-def case_detail_view(request, pk):
-    case = get_object_or_404(Case, pk=pk)
+@load_case(select_related=('workflow', 'current_stage'), prefetch_related=CASE_DETAIL_PREFETCH)
+def case_detail_view(request, pk, case):
     next_stage = None
     
     if request.method == 'POST':
@@ -319,19 +312,20 @@ def case_detail_view(request, pk):
         
     
     # --- GET Request Logic ---
-    documents = case.documents.all().order_by('-id')
+    # All of these come from the prefetch plan above (no extra queries)
+    documents = case.documents.all()
     assignments = case.assignments.all()
     upload_form = DocumentUploadForm()
     
     # 1. FETCH MEETINGS (The Fix)
-    meetings = Meeting.objects.filter(case=case).order_by('scheduled_time')
+    meetings = case.meetings.all()
     
     # Get all stages for the case's workflow
     all_stages = None
     if case.workflow and case.current_stage: 
         all_stages = case.workflow.stages.all()
         current_order = case.current_stage.order
-        next_stage = all_stages.filter(order=current_order + 1).first()
+        next_stage = next((stage for stage in all_stages if stage.order == current_order + 1), None)
 
     context = {
         'case': case,
@@ -345,7 +339,7 @@ def case_detail_view(request, pk):
 
     messages_thread = Message.objects.filter(case=case).filter(
     Q(sender=request.user) | Q(recipient=request.user)
-    ).order_by("sent_at")
+    ).select_related("sender").order_by("sent_at")
 
     message_form = NewMessageForm()  # empty form for the input
 
@@ -359,13 +353,10 @@ def case_detail_view(request, pk):
 @login_required
 def document_view_and_log(request, doc_pk):
     doc = get_object_or_404(Document, pk=doc_pk)
-    case = doc.case # Get the case this document belongs to
 
     # --- Security Check ---
-    is_admin = request.user.roles.filter(name='Admin').exists()
-    is_assigned = CaseAssignment.objects.filter(case=case, user=request.user).exists()
-    
-    if not (is_admin or is_assigned):
+    # Admin or assigned to the document's case (cached, no Case fetch needed)
+    if not can_access_case(request.user, doc.case_id):
         # If not an admin and not assigned, forbid access
         messages.error(request, "You do not have permission to view that document.")
         return redirect('users:dashboard') # Send to their dashboard
@@ -385,8 +376,8 @@ def document_view_and_log(request, doc_pk):
 #@user_passes_test(is_admin) //we also want attorneys to access this
 def workflow_list_view(request):
     # --- Permission Check: Only Admins and Attorneys can manage workflows ---
-    is_admin = request.user.roles.filter(name='Admin').exists()
-    is_attorney = request.user.roles.filter(name='Attorney').exists()
+    is_admin = has_role(request.user, 'Admin')
+    is_attorney = has_role(request.user, 'Attorney')
     
     if not (is_admin or is_attorney):
         messages.error(request, "Only admins and attorneys can manage workflows.")
@@ -463,13 +454,11 @@ def stage_create_view(request, workflow_pk):
 
 # --- View 9: Advance Case Stage (NEW) ---
 @login_required
-@user_is_assigned_to_case
-def advance_stage_view(request, case_pk):
-    case = get_object_or_404(Case, pk=case_pk)
-    
+@load_case(select_related=('workflow', 'current_stage'))
+def advance_stage_view(request, case_pk, case):
     # --- Security: Only Attorneys or Admins can advance a stage ---
-    is_admin = request.user.roles.filter(name='Admin').exists()
-    is_attorney = request.user.roles.filter(name='Attorney').exists()
+    is_admin = has_role(request.user, 'Admin')
+    is_attorney = has_role(request.user, 'Attorney')
     
     if not (is_admin or is_attorney):
         messages.error(request, "Only attorneys can advance a case stage.")
@@ -520,27 +509,9 @@ def advance_stage_view(request, case_pk):
 def template_generation_view(request):
     templates = Template.objects.all().order_by('name')
 
-    # Discover any contract templates placed under the project's
-    # `templates/cases/` directory that end with `_contract.html`.
-    contract_files = []
-    templates_dir = os.path.join(settings.BASE_DIR, 'templates', 'cases')
-    if os.path.isdir(templates_dir):
-        for fn in sorted(os.listdir(templates_dir)):
-            # include both English and Spanish variants (e.g. _contract.html and _contract_es.html)
-            if fn.endswith('_contract.html') or fn.endswith('_contract_es.html'):
-                contract_files.append(fn)
-
-    # Build prettier labels server-side to avoid using template filters
-    contract_choices = []
-    for fn in contract_files:
-        # remove suffix and replace underscores with spaces
-        label = fn.replace('_contract_es.html', '').replace('_contract.html', '').replace('_', ' ')
-        # Format camelCase words by inserting spaces before uppercase letters
-        # and also insert space before "and" when preceded by lowercase letter
-        label = re.sub(r'([a-z])([A-Z])', r'\1 \2', label)
-        label = re.sub(r'([a-z])(and)', r'\1 \2', label)
-        label = label.title()
-        contract_choices.append((fn, label))
+    # Contract templates under `templates/cases/` (see cases/contract_registry.py)
+    contract_files = contract_templates.file_names()
+    contract_choices = contract_templates.choices()
 
     context = {
         'templates': templates,
@@ -570,32 +541,15 @@ def contract_template_view(request):
     # Allow both English and Spanish contract filenames. Accepted patterns:
     # - something_contract.html
     # - something_contract_es.html
-    import re
-    if not re.search(r'_contract(_es)?\.html$', file_name, re.IGNORECASE):
+    if not CONTRACT_FILE_RE.search(file_name):
         return JsonResponse({'error': 'Not a contract template.'}, status=400)
 
-    templates_dir = os.path.join(settings.BASE_DIR, 'templates', 'cases')
-    file_path = os.path.join(templates_dir, file_name)
-    # Ensure the resolved path is actually inside the templates_dir
-    try:
-        real_templates_dir = os.path.realpath(templates_dir)
-        real_file_path = os.path.realpath(file_path)
-    except Exception:
-        return JsonResponse({'error': 'Invalid path resolution.'}, status=400)
-
-    if not real_file_path.startswith(real_templates_dir):
-        return JsonResponse({'error': 'Invalid file path.'}, status=400)
-
-    if not os.path.exists(real_file_path):
+    # Only files found in the templates directory are in the registry
+    contract = contract_templates.get(file_name)
+    if contract is None:
         return JsonResponse({'error': 'File not found.'}, status=404)
 
-    try:
-        with open(real_file_path, 'r', encoding='utf-8') as fh:
-            content = fh.read()
-    except Exception:
-        return JsonResponse({'error': 'Unable to read file.'}, status=500)
-
-    return HttpResponse(content, content_type='text/html')
+    return HttpResponse(contract.content, content_type='text/html')
 
 # --- View 11: Template Upload (Admin) ---
 @login_required
@@ -613,15 +567,9 @@ def template_upload_view(request):
             if uploaded_file and uploaded_file.name.lower().endswith('.pdf'):
                 try:
                     # --- THE CONVERSION MAGIC ---
-                    # Read the PDF stream from memory
-                    pdf_data = uploaded_file.read()
-                    
-                    # Open with PyMuPDF
-                    with fitz.open(stream=pdf_data, filetype="pdf") as doc:
-                        html_content = ""
-                        # Loop through every page and convert to HTML
-                        for page in doc:
-                            html_content += page.get_text("html")
+                    # Every page converted to HTML with PyMuPDF; a PDF
+                    # uploaded before is served from the analysis cache
+                    html_content = pdf_analysis.cached_pdf_html(uploaded_file.read())
                     
                     # 3. Save to your Database (ContractTemplate)
                     # This ensures it shows up in your "My Custom Templates" dropdown
@@ -661,8 +609,9 @@ def template_upload_view(request):
 def convert_pdf_api_view(request):
     """
     Smart Analyzer v5 (Native Scale):
-    - REMOVED ZOOM: Analyzes PDF at 100% (1:1) scale to match frontend perfectly.
-    - Keeps the improved 'Text Overlap' and 'Margin' filters.
+    - Analyzes the PDF at 100% (1:1) scale; fields are in percentages of the page.
+    - Stores the upload (see cases/pdf_analysis.py) and returns page sizes and
+      fields only; each page image is fetched from its `image_url`.
     """
     uploaded_file = request.FILES.get('pdf_file')
     
@@ -670,114 +619,55 @@ def convert_pdf_api_view(request):
         return JsonResponse({'error': 'Invalid file'}, status=400)
 
     try:
-        pdf_data = uploaded_file.read()
-        pages_data = []
-        
-        with fitz.open(stream=pdf_data, filetype="pdf") as doc:
-            for page_num, page in enumerate(doc):
-                # 1. RENDER PAGE AT NATIVE 1x SCALE (No Zoom)
-                # This ensures coordinates match the PDF's internal 'Point' system exactly
-                pix = page.get_pixmap() 
-                img_data = base64.b64encode(pix.tobytes("png")).decode("utf-8")
-                
-                # These dimensions are now the standard PDF points (e.g. 612x792 for Letter)
-                page_w = page.rect.width
-                page_h = page.rect.height
-                
-                # SETTINGS
-                MARGIN_X_PCT = 0.10   
-                TEXT_Y_OFFSET = 0     # With 1x scale, we likely don't need a manual offset anymore
-                
-                fields = []
-
-                def is_valid_field(rect):
-                    # Margin Check
-                    if rect.x0 < (page_w * MARGIN_X_PCT): return False
-                    if rect.x1 > (page_w * (1 - MARGIN_X_PCT)): return False
-                    
-                    # Text Overlap Check
-                    check_rect = fitz.Rect(rect.x0, rect.y0 - 2, rect.x1, rect.y0)
-                    text_inside = page.get_text("text", clip=check_rect).strip()
-                    if len(text_inside) > 0: 
-                        return False 
-                    return True
-
-                def add_field(rect, f_type):
-                    for existing in fields:
-                        if rect.intersects(existing['rect']): return
-
-                    # Label Guessing
-                    search_rect = fitz.Rect(rect.x0 - 150, rect.y0 - 10, rect.x0, rect.y1 + 5)
-                    text_nearby = page.get_text("text", clip=search_rect).strip()
-                    label = text_nearby.replace(':', '').replace('\n', ' ').strip()
-                    
-                    fields.append({
-                        # Coordinates are now purely 1:1 with the rendered image
-                        'left': (rect.x0 / page_w) * 100,
-                        'top': (rect.y0 / page_h) * 100,
-                        'width': (rect.width / page_w) * 100,
-                        'height': (rect.height / page_h) * 100,
-                        'type': f_type,
-                        'label': label,
-                        'rect': rect
-                    })
-
-                # A. Detect Drawings
-                for shape in page.get_drawings():
-                    rect = shape['rect']
-                    
-                    # TEXT INPUTS (Horizontal Lines)
-                    # Note: width > 25 is still safe at 1x scale
-                    if rect.width > 25 and rect.height < 5: 
-                        # Box sits ON the line
-                        input_rect = fitz.Rect(rect.x0, rect.y0 - 12, rect.x1, rect.y0)
-                        if is_valid_field(input_rect):
-                            add_field(input_rect, 'text')
-                    
-                    # CHECKBOXES (Squares)
-                    # Note: Adjusted min size slightly for 1x scale
-                    elif 8 < rect.width < 25 and 8 < rect.height < 25:
-                        ratio = rect.width / rect.height
-                        if 0.8 < ratio < 1.2:
-                             if is_valid_field(rect):
-                                add_field(rect, 'checkbox')
-
-                # B. Legacy "___"
-                for rect in page.search_for("___"):
-                    add_field(rect, 'text')
-                
-                # C. Checkbox Characters
-                for char in ["☐", "☑", "☒"]:
-                    for rect in page.search_for(char):
-                        add_field(rect, 'checkbox')
-
-                for f in fields:
-                    if 'rect' in f: del f['rect']
-
-                pages_data.append({
-                    'image': img_data,
-                    'width': page_w,
-                    'height': page_h,
-                    'fields': fields
-                })
-        
-        return JsonResponse({'pages': pages_data})
-        
+        upload_id, pages = pdf_analysis.store_upload(request.user, uploaded_file.read())
+    except pdf_analysis.StorageUnavailable:
+        return JsonResponse({'error': 'PDF analysis is unavailable right now.'}, status=503)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
+
+    for page in pages:
+        page['image_url'] = reverse('cases:api-convert-pdf-page', kwargs={'upload_id': upload_id, 'number': page['number']})
+    return JsonResponse({
+        'upload_id': upload_id,
+        'pages': pages,
+        'image_formats': list(pdf_analysis.IMAGE_FORMATS),
+    })
+
+
+# --- View: Page Image of an Analyzed PDF (?dpi=72&format=png|jpeg|webp) ---
+@login_required
+def convert_pdf_page_view(request, upload_id, number):
+    image_format = request.GET.get('format', 'png')
+    if image_format not in pdf_analysis.IMAGE_FORMATS:
+        image_format = 'png'
+    dpi = request.GET.get('dpi', '')
+    dpi = int(dpi) if dpi.isdigit() else pdf_analysis.DEFAULT_DPI
+
+    try:
+        path = pdf_analysis.page_image(upload_id, request.user, number, dpi, image_format)
+    except pdf_analysis.UploadNotFound:
+        raise Http404("No such page.")
+    except pdf_analysis.StorageUnavailable:
+        return JsonResponse({'error': 'Page images are unavailable right now.'}, status=503)
+
+    response = FileResponse(open(path, 'rb'), content_type=pdf_analysis.IMAGE_FORMATS[image_format])
+    # The image at a given URL never changes
+    patch_cache_control(response, private=True, max_age=pdf_analysis.ANALYSIS_TTL, immutable=True)
+    return response
+
+
 # --- STEP 19: DOCUMENT GENERATION VIEW (UPGRADED)
 # ---
 @login_required
-@user_is_assigned_to_case
-def generate_document_view(request, case_pk):
-    case = get_object_or_404(Case, pk=case_pk)
-
-    #Moving out of test block to test error
-    client_assignment = case.assignments.filter(user__roles__name='Client').first()
-    attorney_assignment = case.assignments.filter(user__roles__name='Attorney').first()
+@load_case(prefetch_related=(
+    Prefetch('assignments', queryset=CaseAssignment.objects.select_related('user').prefetch_related('user__roles').order_by('pk')),
+))
+def generate_document_view(request, case_pk, case):
+    # Assignments (with each user's roles) are prefetched by load_case
+    assignments = case.assignments.all()
 
     templates = Template.objects.filter(
-        models.Q(is_public=True) | models.Q(uploaded_by=request.user)
+        Q(is_public=True) | Q(uploaded_by=request.user)
     ).distinct()
 
     if request.method == 'POST':
@@ -788,50 +678,29 @@ def generate_document_view(request, case_pk):
             template = get_object_or_404(Template, pk=template_id)
 
             # --- 1. Build the Context ---
-            # This matches placeholders to real data
-            context = {}
-
-            # Find the client
-            if client_assignment:
-                context['client_name'] = client_assignment.user.get_full_name()
-                context['client_email'] = client_assignment.user.email
-
-            # Find the attorney
-            if attorney_assignment:
-                context['attorney_name'] = attorney_assignment.user.get_full_name()
-
-            context['case_title'] = case.case_title
-            context['case_description'] = case.description
+            # This matches placeholders to real data (client, attorney, case)
+            context = case_document_context(case, assignments)
 
             # You can add any other fields from your Template.context_fields here
             # For example, if you stored {"client_address": "..."} in the case model.
 
             # --- 2. Generate the .docx Document ---
             try:
-                # Open the template file (.docx)
-                doc = DocxDocument(template.template_file.open())
-
-                # Run our find-and-replace function
-                doc = docx_find_and_replace(doc, context)
-
-                # --- 3. Save the new file in memory ---
-                file_buffer = io.BytesIO()
-                doc.save(file_buffer)
-
                 # Create a new file name
-                file_name = f"Generated_{template.name.replace(' ', '_')}.docx"
-
-                # Get the file content from the buffer
-                file_content = file_buffer.getvalue()
-
-                # --- 4. Save the new Document to the Case ---
-                new_doc = Document.objects.create(
-                    case=case,
-                    title=f"Generated: {template.name}",
-                    uploaded_by=request.user,
-                    # Create a Django ContentFile from the buffer
-                    file_upload=ContentFile(file_content, name=file_name)
-                )
+                file_name = docx_file_name(template)
+
+                # Fill the placeholders into the cached compiled template (see cases/template_cache.py),
+                # writing to a spooled file so large documents don't sit in memory
+                with spooled_file() as output:
+                    render_template(template, context, output)
+
+                    # --- 4. Save the new Document to the Case ---
+                    new_doc = Document.objects.create(
+                        case=case,
+                        title=f"Generated: {template.name}",
+                        uploaded_by=request.user,
+                        file_upload=File(output, name=file_name)
+                    )
 
                 # 5. Log the creation
                 DocumentLog.objects.create(document=new_doc, user=request.user, action="Generated")
@@ -845,27 +714,12 @@ def generate_document_view(request, case_pk):
 
 # 1. FETCH DATABASE TEMPLATES (Add this block)
     db_templates = ContractTemplate.objects.filter(
-        models.Q(is_public=True) | models.Q(created_by=request.user)
+        Q(is_public=True) | Q(created_by=request.user)
     ).order_by('name')
 
-    # Discover any HTML contract templates placed under the project's
-    # `templates/cases/` directory that end with `_contract.html`.
-    templates_dir = os.path.join(settings.BASE_DIR, 'templates', 'cases')
-    contract_files = []
-    contract_choices = []
-    if os.path.isdir(templates_dir):
-        for fn in sorted(os.listdir(templates_dir)):
-            # include both English and Spanish variants (e.g. _contract.html and _contract_es.html)
-            if fn.endswith('_contract.html') or fn.endswith('_contract_es.html'):
-                contract_files.append(fn)
-                # Build the formatted label
-                label = fn.replace('_contract_es.html', '').replace('_contract.html', '').replace('_', ' ')
-                # Format camelCase words by inserting spaces before uppercase letters
-                # and also insert space before "and" when preceded by lowercase letter
-                label = re.sub(r'([a-z])([A-Z])', r'\1 \2', label)
-                label = re.sub(r'([a-z])(and)', r'\1 \2', label)
-                label = label.title()
-                contract_choices.append((fn, label))
+    # Contract templates under `templates/cases/` (see cases/contract_registry.py)
+    contract_files = contract_templates.file_names()
+    contract_choices = contract_templates.choices()
 
     context = {
         'case': case,
@@ -876,74 +730,58 @@ def generate_document_view(request, case_pk):
 
     'db_templates': db_templates,
     }
-    # Build a small, opinionated placeholder mapping so the frontend can autofill common keys
-    placeholder_map = {}
-    # Client and attorney
-    if client_assignment:
-        placeholder_map.update({
-            'CLIENT': client_assignment.user.get_full_name(),
-            'CLIENT_NAME': client_assignment.user.get_full_name(),
-            'CLIENT_EMAIL': client_assignment.user.email or ''
-        })
-    if attorney_assignment:
-        placeholder_map.update({
-            'ATTORNEY': attorney_assignment.user.get_full_name(),
-            'ATTORNEY_NAME': attorney_assignment.user.get_full_name()
-        })
-
-    # Case-related
-    placeholder_map.update({
-        'CASE_TITLE': case.case_title or '',
-        'CASE_DESCRIPTION': case.description or ''
-    })
-
-    # Date/time defaults
-    now = timezone.now()
-    try:
-        month_name = now.strftime('%B')
-    except Exception:
-        month_name = ''
-    placeholder_map.update({
-        'DAY': str(now.day),
-        'MONTH': month_name,
-        'YEAR': str(now.year),
-        'TIME': now.strftime('%H:%M')
-    })
-
-    # Helpful aliases for common roles found in templates
-    # Map a few role-like placeholders to the client (best-effort)
-    if client_assignment:
-        placeholder_map.setdefault('LESSOR', client_assignment.user.get_full_name())
-        placeholder_map.setdefault('LESSEE', client_assignment.user.get_full_name())
-        placeholder_map.setdefault('SELLER', client_assignment.user.get_full_name())
-        placeholder_map.setdefault('BUYERS', client_assignment.user.get_full_name())
-
+    # Placeholder values the frontend can autofill (see cases/placeholders.py)
+    placeholder_map = case_placeholder_map(case, assignments)
     context['placeholder_map_json'] = json.dumps(placeholder_map)
     # Provide case participants for role dropdowns (id + display name)
     participants = []
-    for a in case.assignments.select_related('user').all():
+    for a in assignments:
         participants.append({'id': a.user.pk, 'name': a.user.get_full_name() or a.user.username})
     context['participants_json'] = json.dumps(participants)
     return render(request, 'cases/generate_document.html', context)
 
+
+# --- View: Template Placeholders API (fields of a template, resolved for a case) ---
+@login_required
+@load_case(prefetch_related=(
+    Prefetch('assignments', queryset=CaseAssignment.objects.select_related('user').prefetch_related('user__roles').order_by('pk')),
+))
+def case_placeholders_api(request, case_pk, case):
+    """
+    The placeholders of a contract template with their values for this case.
+    ``template`` is ``db-<id>`` for a ContractTemplate or a contract file name.
+    """
+    template_ref = request.GET.get('template', '')
+    if template_ref.startswith('db-') and template_ref[3:].isdigit():
+        template = get_object_or_404(
+            ContractTemplate.objects.filter(Q(is_public=True) | Q(created_by=request.user)).only('placeholders'),
+            pk=template_ref[3:],
+        )
+        keys = template.placeholders
+    else:
+        contract = contract_templates.get(template_ref)
+        if contract is None:
+            return JsonResponse({'error': 'Template not found.'}, status=404)
+        keys = contract.placeholders
+
+    return JsonResponse({
+        'template': template_ref,
+        'placeholders': resolve_placeholders(keys, case, case.assignments.all()),
+    })
+
 # --- View 12: Signature Request Page (Attorney-facing) ---
 @login_required
 def signature_request_view(request, doc_pk):
     doc = get_object_or_404(Document, pk=doc_pk)
-    case = doc.case
 
     # --- Security & Permission Check ---
-    is_admin = request.user.roles.filter(name='Admin').exists()
-    is_assigned = CaseAssignment.objects.filter(case=case, user=request.user).exists()
-    
-    if not (is_admin or is_assigned):
+    if not can_access_case(request.user, doc.case_id):
         messages.error(request, "You do not have permission to access this.")
         return redirect('users:dashboard')
 
-    is_attorney = request.user.roles.filter(name='Attorney').exists()
-    if not (is_admin or is_attorney):
+    if not has_role(request.user, 'Admin', 'Attorney'):
         messages.error(request, "Only attorneys can send signature requests.")
-        return redirect('cases:case-detail', pk=case.pk)
+        return redirect('cases:case-detail', pk=doc.case_id)
 
     # --- Handle Form POST ---
     if request.method == 'POST':
@@ -969,9 +807,10 @@ def signature_request_view(request, doc_pk):
             # TODO: Email this link. For now, we'll show it to the attorney.
             messages.success(request, f"Signature request sent to {signer.username}.")
             messages.info(request, f"Signing Link (for demo): {sign_link}")
-            return redirect('cases:case-detail', pk=case.pk)
+            return redirect('cases:case-detail', pk=doc.case_id)
 
     # --- Handle GET ---
+    case = doc.case
     potential_signers = case.assignments.exclude(user=request.user)
     context = {
         'doc': doc,
@@ -1030,106 +869,25 @@ def signing_page_view(request, token):
     return render(request, 'cases/signing_page.html', context)
 
 # --- View 14: Calendar ---
+def _calendar_events_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    return calendar_etag(request.user, request.GET)
+
 @login_required
+@condition(etag_func=_calendar_events_etag)
 def calendar_events_api(request):
     """
     Returns calendar events as JSON for the logged-in user.
-    FullCalendar will request this and display the events.
+    FullCalendar will request this and display the events; only the
+    visible range (its ``start``/``end`` params) is loaded. Responds 304
+    when the user's calendar hasn't changed since the browser's copy.
     """
-    user = request.user
-    events = []
-    
-    # --- GET FILTER PARAMETERS ---
-    search_query = request.GET.get('q', '')  # Search by title
-    case_id = request.GET.get('case_id', '')  # Filter by case
-    meeting_type = request.GET.get('type', '')  # Filter by type
-    scope = request.GET.get('scope', '')  # Filter by participants (mine only)
-    
-    # Get all meetings the user is involved in (either as organizer or participant)
-    meetings = Meeting.objects.filter(
-        participants=user
-    ).select_related('case', 'organizer')
-    
-    # --- APPLY FILTERS ---
-    # Filter by case if case_id is provided
-    if case_id:
-        meetings = meetings.filter(case_id=case_id)
-    
-    # Filter by meeting type if type is provided
-    if meeting_type:
-        meetings = meetings.filter(meeting_type=meeting_type)
-    
-    # Filter by search query (searches title, description, and case title)
-    if search_query:
-        meetings = meetings.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(case__case_title__icontains=search_query)
-        )
-    
-    # If scope is 'mine', only show meetings organized by the current user
-    if scope == 'mine':
-        meetings = meetings.filter(organizer=user)
-    
-    # Get the values we need
-    meetings = meetings.values('id', 'title', 'scheduled_time', 'duration_minutes', 'meeting_type', 
-        'description', 'case__case_title', 'case__pk', 'organizer__username', 
-        'organizer__first_name', 'organizer__last_name')
-    
-    for meeting in meetings:
-        end_time = meeting['scheduled_time'] + timezone.timedelta(minutes=meeting['duration_minutes'])
-
-        # Get participant names for this meeting
-        meeting_obj = Meeting.objects.get(id=meeting['id'])
-        participants = [p.get_full_name() or p.username for p in meeting_obj.participants.all()]
-        
-        # Format organizer name
-        organizer_name = meeting['organizer__first_name'] or ''
-        if meeting['organizer__last_name']:
-            organizer_name = f"{organizer_name} {meeting['organizer__last_name']}".strip()
-        if not organizer_name:
-            organizer_name = meeting['organizer__username']
-
-        events.append({
-            'id': str(meeting['id']),
-            'title': f"📞 {meeting['title']}",
-            'start': meeting['scheduled_time'].isoformat(),
-            'end': end_time.isoformat(),
-            'type': 'meeting',
-            'backgroundColor': '#c4a24c',  # Your owl gold color
-            'borderColor': '#c4a24c',
-            'extendedProps': {
-                'meetingId': meeting['id'],
-                'caseTitle': meeting['case__case_title'],
-                'caseId': meeting['case__pk'],
-                'meetingType': meeting_obj.get_meeting_type_display(),
-                'description': meeting['description'] or 'No description provided',
-                'duration': meeting['duration_minutes'],
-                'organizer': organizer_name,
-                'participants': ', '.join(participants),
-                'scheduledTime': meeting['scheduled_time'].strftime('%B %d, %Y at %I:%M %p'),
-            }
-        })
-    
-    # Get all document due dates assigned to the user or linked to their cases
-    documents = DocumentDueDate.objects.filter(
-        case__assignments__user=user
-    ).select_related('case').values('id', 'document_name', 'due_date', 'is_completed', 'case__case_title').distinct()
-    
-    for doc in documents:
-        events.append({
-            'id': f'document-{doc["id"]}',
-            'title': f"📄 {doc['document_name']}",
-            'start': doc['due_date'].isoformat(),
-            'type': 'document',
-            'backgroundColor': '#ff6b6b' if not doc['is_completed'] else '#51cf66',
-            'borderColor': '#ff6b6b' if not doc['is_completed'] else '#51cf66',
-            'extendedProps': {
-                'caseTitle': doc['case__case_title'],
-            }
-        })
-    
-    return JsonResponse(events, safe=False)
+    payload = calendar_events_json(request.user, request.GET)
+    response = HttpResponse(payload, content_type='application/json')
+    # Let the browser keep its copy, but always revalidate it with the ETag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 # --- View 15: Meetings ---
 @login_required
@@ -1145,8 +903,8 @@ def create_meeting_view(request, case_pk=None):
     """
 
     # --- Permission Check: Only Admins and Attorneys can create meetings ---
-    is_admin = request.user.roles.filter(name='Admin').exists()
-    is_attorney = request.user.roles.filter(name='Attorney').exists()
+    is_admin = has_role(request.user, 'Admin')
+    is_attorney = has_role(request.user, 'Attorney')
     
     if not (is_admin or is_attorney):
         messages.error(request, "Only admins and attorneys can schedule meetings.")
@@ -1158,7 +916,7 @@ def create_meeting_view(request, case_pk=None):
         case = get_object_or_404(Case, pk=case_pk)
     
     if request.method == 'POST':
-        form = MeetingForm(request.POST)
+        form = MeetingForm(request.POST, user=request.user)
         if form.is_valid():
             meeting = form.save(commit=False)
             meeting.organizer = request.user
@@ -1174,7 +932,7 @@ def create_meeting_view(request, case_pk=None):
             else:
                 return redirect('cases:case-dashboard')
     else:
-        form = MeetingForm()
+        form = MeetingForm(user=request.user)
         
         # If we have a pre-selected case, set it and disable the dropdown
         if case:
@@ -1201,19 +959,19 @@ def edit_meeting_view(request, meeting_pk):
     meeting = get_object_or_404(Meeting, pk=meeting_pk)
 
     # --- Permission Check: Only Admins and the Organizer can edit ---
-    is_admin = request.user.roles.filter(name='Admin').exists()
+    is_admin = has_role(request.user, 'Admin')
     if not (is_admin or meeting.organizer == request.user):
         messages.error(request, "You do not have permission to edit this meeting.")
         return redirect('users:dashboard')
 
     if request.method == 'POST':
-        form = MeetingForm(request.POST, instance=meeting)
+        form = MeetingForm(request.POST, instance=meeting, user=request.user)
         if form.is_valid():
             form.save()
             messages.success(request, f"Meeting '{meeting.title}' updated successfully!")
             return redirect('cases:case-detail', pk=meeting.case.pk)
     else:
-        form = MeetingForm(instance=meeting)
+        form = MeetingForm(instance=meeting, user=request.user)
 
     context = {
         'form': form,
@@ -1221,22 +979,64 @@ def edit_meeting_view(request, meeting_pk):
     }
     return render(request, 'cases/edit_meeting.html', context)
 
+@login_required
 def calendar_view(request):
     user = request.user
     
     # Get cases the user is assigned to (or all cases if admin)
-    is_admin = request.user.roles.filter(name='Admin').exists()
+    is_admin = has_role(request.user, 'Admin')
     
     if is_admin:
         cases = Case.objects.all().order_by('case_title')
     else:
-        cases = Case.objects.filter(assignments__user=user).distinct().order_by('case_title')
+        cases = Case.objects.filter(pk__in=accessible_case_ids(user)).order_by('case_title')
     
+    # Secret link for calendar apps (Outlook, Google, Apple) to subscribe to
+    feed_token, _ = CalendarFeedToken.objects.get_or_create(user=user)
+
     context = {
-        'cases': cases
+        'cases': cases,
+        'ical_subscribe_url': f"{reverse('cases:calendar-ics')}?token={feed_token.token}",
     }
     return render(request, 'cases/calendar.html', context)
 
+
+# --- iCalendar subscription feed ---
+def _feed_user(request):
+    # Calendar apps have no session; the token in the URL identifies the user
+    if not hasattr(request, '_feed_user'):
+        token = request.GET.get('token', '')
+        try:
+            feed_token = CalendarFeedToken.objects.select_related('user').get(token=token, user__is_active=True)
+        except (CalendarFeedToken.DoesNotExist, ValidationError):
+            request._feed_user = None
+        else:
+            request._feed_user = feed_token.user
+    return request._feed_user
+
+def _feed_etag(request):
+    user = _feed_user(request)
+    return feed_etag(user) if user else None
+
+def _feed_last_modified(request):
+    user = _feed_user(request)
+    return feed_last_modified(user) if user else None
+
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
+def calendar_ics_feed(request):
+    """Meetings and document deadlines as an iCalendar feed (token auth)."""
+    user = _feed_user(request)
+    if user is None:
+        return HttpResponse("Unknown calendar feed.", status=404, content_type='text/plain')
+
+    feed, built_at = build_feed(user)
+    response = HttpResponse(feed, content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="owlery.ics"'
+    if not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(built_at.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 # --- List and Create Templates (GET /api/templates/, POST /api/templates/) ---
 class ContractTemplateListCreateView(generics.ListCreateAPIView):
     queryset = ContractTemplate.objects.all().order_by('-updated_at')
@@ -1245,7 +1045,19 @@ class ContractTemplateListCreateView(generics.ListCreateAPIView):
 
     def perform_create(self, serializer):
         # Set the 'created_by' field automatically to the logged-in user
-        serializer.save(created_by=self.request.user)
+        extra = {}
+        upload_id = self.request.data.get('upload_id')
+        if upload_id:
+            # Made in the smart template editor: inline the page images it links to
+            try:
+                extra['content'] = pdf_analysis.embed_page_images(
+                    serializer.validated_data.get('content'), upload_id, self.request.user,
+                )
+            except pdf_analysis.UploadNotFound:
+                raise exceptions.ValidationError({'upload_id': "This upload has expired; please upload the PDF again."})
+            except pdf_analysis.StorageUnavailable:
+                raise exceptions.ValidationError({'upload_id': "Uploaded PDFs are unavailable right now; please try again later."})
+        serializer.save(created_by=self.request.user, **extra)
     
     # Optionally filter to only show public templates and the user's own templates
     def get_queryset(self):
@@ -1258,7 +1070,7 @@ class ContractTemplateListCreateView(generics.ListCreateAPIView):
         # 2. Default filtering for standard users (Public OR User's own)
         if user.is_authenticated:
             return ContractTemplate.objects.filter(
-                models.Q(is_public=True) | models.Q(created_by=user)
+                Q(is_public=True) | Q(created_by=user)
             ).order_by('-updated_at')
         
         # 3. For anonymous users (only public templates)
@@ -1290,13 +1102,8 @@ class ContractTemplateDownloadView(APIView):
         # 2. Define an empty context (since this is a blank template download)
         context = {}
 
-        # 3. Generate the PDF using your helper function
-        # (Ensure generate_document_from_template is imported!)
-        file_buffer, filename = generate_document_from_template(
-            template.content, 
-            template.name,
-            context_data=context
-        )
+        # 3. Generate the PDF (or reuse the one rendered for the same content)
+        file_buffer, filename = cached_contract_pdf(template.content, template.name, context_data=context)
 
         # 4. Return the file as a PDF attachment
         response = FileResponse(file_buffer, as_attachment=True)
@@ -1348,8 +1155,8 @@ def user_profile_view(request, pk):
     related_people = []
     related_title = ""
     
-    is_attorney_profile = profile_user.roles.filter(name='Attorney').exists()
-    is_client_profile = profile_user.roles.filter(name='Client').exists()
+    is_attorney_profile = has_role(profile_user, 'Attorney')
+    is_client_profile = has_role(profile_user, 'Client')
 
     # Get the IDs of cases this user is part of
     case_ids = assignments.values_list('case_id', flat=True)
@@ -1389,12 +1196,7 @@ def user_management_view(request):
     # 2. Search Filter (checks username, first name, last name, email)
     search_query = request.GET.get('q', '')
     if search_query:
-        users = users.filter(
-            Q(username__icontains=search_query) |
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query)
-        )
+        users = users.filter(pk__in=matching_ids(search_query, SearchDocument.Kind.USER))
 
     # 3. Role Filter (checks the Role model relation)
     role_filter = request.GET.get('role', '')
@@ -1552,28 +1354,39 @@ def consultation_detail_view(request, pk):
 @login_required
 def case_directory_view(request):
     # 1. Check Permissions
-    is_admin = request.user.roles.filter(name='Admin').exists()
-    is_attorney = request.user.roles.filter(name='Attorney').exists()
+    is_admin = has_role(request.user, 'Admin')
+    is_attorney = has_role(request.user, 'Attorney')
     
     if not (is_admin or is_attorney):
         messages.error(request, "Access denied.")
         return redirect('users:dashboard')
 
-    # 2. Fetch ALL Cases
-    cases = Case.objects.all().select_related('current_stage').prefetch_related('assignments__user').order_by('-date_filed')
-    
-    # 3. Filter for Attorneys (See only assigned cases)
-    if not is_admin:
-        cases = cases.filter(assignments__user=request.user)
+    cases, search_query = _directory_cases(request)
+    page = paginate_cases(cases, request.GET)
 
-    # --- 4. NEW: Search Functionality ---
+    context = {
+        'cases': page,
+        'page': page,
+        **case_sort_context(),
+        'search_query': search_query, # Pass this back to keep the text in the box
+    }
+    return render(request, 'cases/case_directory.html', context)
+
+
+def _directory_cases(request):
+    """The cases the user may browse, filtered by the ``q`` search box."""
+    # 1. Fetch ALL Cases (one page of them is loaded by the paginator)
+    cases = Case.objects.all().select_related('current_stage').prefetch_related('assignments__user__roles')
+
+    # 2. Filter for Attorneys (See only assigned cases)
+    if not has_role(request.user, 'Admin'):
+        cases = cases.filter(pk__in=accessible_case_ids(request.user))
+
+    # --- 3. Search Functionality ---
     search_query = request.GET.get('q', '')
     if search_query:
-        # Create a query that looks in Title or Assigned User Names
-        query = Q(case_title__icontains=search_query) | \
-                Q(assignments__user__first_name__icontains=search_query) | \
-                Q(assignments__user__last_name__icontains=search_query) | \
-                Q(assignments__user__username__icontains=search_query)
+        # Title, description, notes and team names, via the search index
+        query = Q(pk__in=matching_ids(search_query, SearchDocument.Kind.CASE))
         
         # Add special handling for Status keywords
         if search_query.lower() == 'active':
@@ -1581,14 +1394,156 @@ def case_directory_view(request):
         elif search_query.lower() == 'archived':
             query |= Q(is_archived=True)
             
-        cases = cases.filter(query).distinct()
+        cases = cases.filter(query)
+
+    return cases, search_query
+
+
+def case_sort_context():
+    return {
+        'sort_options': list(CASE_SORT_LABELS.items()),
+        'page_sizes': PAGE_SIZES,
+    }
+
+
+
+# --- View: Batch Document Generation ---
+def _batch_templates(user):
+    """The .docx and contract templates a user may generate from."""
+    return (
+        Template.objects.filter(Q(is_public=True) | Q(uploaded_by=user)).order_by('name'),
+        ContractTemplate.objects.filter(Q(is_public=True) | Q(created_by=user)).order_by('name'),
+    )
+
+
+@login_required
+def batch_generate_view(request):
+    """Generates one template for many cases at once and reports per-case results."""
+    if not has_role(request.user, 'Admin', 'Attorney'):
+        messages.error(request, "Only admins and attorneys can generate documents.")
+        return redirect('users:dashboard')
+
+    cases = Case.objects.filter(is_archived=False).order_by('case_title')
+    if not has_role(request.user, 'Admin'):
+        cases = cases.filter(pk__in=accessible_case_ids(request.user))
+    docx_templates, contract_templates = _batch_templates(request.user)
+
+    results = None
+    selected_ids = set()
+    selected_template = request.POST.get('template', '')
+    if request.method == 'POST':
+        kind, _, pk = selected_template.partition(':')
+        queryset = {'docx': docx_templates, 'contract': contract_templates}.get(kind)
+        template = queryset.filter(pk=pk).first() if queryset is not None and pk.isdigit() else None
+        selected_ids = {int(pk) for pk in request.POST.getlist('case_ids') if pk.isdigit()}
+        allowed_ids = list(cases.filter(pk__in=selected_ids).values_list('pk', flat=True))
+        if template is None:
+            messages.error(request, "Please select a template.")
+        elif not allowed_ids:
+            messages.error(request, "Please select at least one case.")
+        else:
+            results = generate_batch(template, allowed_ids, request.user)
+            succeeded = sum(1 for result in results if result.ok)
+            if succeeded:
+                messages.success(request, f"Generated '{template.name}' for {succeeded} case(s).")
+            if succeeded < len(results):
+                messages.warning(request, f"{len(results) - succeeded} case(s) failed; see the results below.")
 
     context = {
         'cases': cases,
-        'search_query': search_query, # Pass this back to keep the text in the box
+        'selected_ids': selected_ids,
+        'template_groups': [
+            ('Word templates', [(f'docx:{t.pk}', t.name) for t in docx_templates]),
+            ('Contract templates', [(f'contract:{t.pk}', t.name) for t in contract_templates]),
+        ],
+        'selected_template': selected_template,
+        'results': results,
     }
-    return render(request, 'cases/case_directory.html', context)
+    return render(request, 'cases/batch_generate.html', context)
+
+
+# --- View: Case List API (JSON version of the case directory) ---
+@login_required
+def case_list_api(request):
+    """
+    One keyset page of the case directory as JSON. Accepts the same ``q``,
+    ``sort``, ``page_size`` and ``cursor`` parameters as the HTML page, plus
+    ``status=active|archived``.
+    """
+    if not has_role(request.user, 'Admin', 'Attorney'):
+        return JsonResponse({'error': 'Access denied.'}, status=403)
+
+    cases, _ = _directory_cases(request)
+    status_filter = request.GET.get('status')
+    if status_filter in ('active', 'archived'):
+        cases = cases.filter(is_archived=(status_filter == 'archived'))
+    page = paginate_cases(cases, request.GET)
+
+    results = [{
+        'id': case.pk,
+        'title': case.case_title,
+        'is_archived': case.is_archived,
+        'stage': case.current_stage.name if case.current_stage else None,
+        'date_filed': case.date_filed.isoformat(),
+        'team': [assignment.user.get_full_name() or assignment.user.username for assignment in case.assignments.all()],
+        'url': reverse('cases:case-detail', kwargs={'pk': case.pk}),
+    } for case in page]
+
+    return JsonResponse({
+        'results': results,
+        'sort': page.sort,
+        'page_size': page.page_size,
+        'next': page.next_cursor,
+        'previous': page.prev_cursor,
+    })
+
+
 
+# --- View: Availability API (earliest common free slot) ---
+@login_required
+def availability_api(request):
+    """
+    Earliest slot when all the given people are free, as JSON. People come
+    from ``participants`` (repeated user ids) and/or the team of ``case_id``;
+    ``duration`` is in minutes and ``after`` an ISO datetime (default: now).
+    """
+    if not has_role(request.user, 'Admin', 'Attorney'):
+        return JsonResponse({'error': 'Access denied.'}, status=403)
+
+    user_ids = {int(value) for value in request.GET.getlist('participants') if value.isdigit()}
+    if user_ids and not has_role(request.user, 'Admin'):
+        # Only people the caller shares a case with: schedules are private otherwise
+        if not user_ids <= colleague_ids(request.user):
+            return JsonResponse({'error': 'Access denied.'}, status=403)
+    case_id = request.GET.get('case_id', '')
+    if case_id.isdigit():
+        if not can_access_case(request.user, int(case_id)):
+            return JsonResponse({'error': 'Access denied.'}, status=403)
+        user_ids.update(CaseAssignment.objects.filter(case_id=case_id).values_list('user_id', flat=True))
+    if not user_ids:
+        return JsonResponse({'error': 'No participants given.'}, status=400)
+
+    try:
+        duration = int(request.GET.get('duration', 60))
+    except ValueError:
+        duration = 0
+    if not 0 < duration <= 24 * 60:
+        return JsonResponse({'error': 'Invalid duration.'}, status=400)
+
+    try:
+        after = parse_datetime(request.GET.get('after', ''))
+    except ValueError:
+        after = None
+    if after is not None and timezone.is_naive(after):
+        after = timezone.make_aware(after)
+
+    slot = earliest_common_slot(sorted(user_ids), timedelta(minutes=duration), after=after)
+    return JsonResponse({
+        'participants': sorted(user_ids),
+        'duration': duration,
+        'start': timezone.localtime(slot[0]).isoformat() if slot else None,
+        'end': timezone.localtime(slot[1]).isoformat() if slot else None,
+    })
 
 class CaseUpdateView(LoginRequiredMixin, UpdateView):
     model = Case
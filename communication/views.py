@@ -2,7 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db.models import Q, Prefetch
 from django.conf import settings
 from .models import Message
 from .forms import NewMessageForm
@@ -11,16 +11,17 @@ from cases.models import Case
 from users.models import Role
 from django.utils import timezone
 from django.utils.http import url_has_allowed_host_and_scheme
-from cases.decorators import user_is_assigned_to_case
+from cases.decorators import load_case
 from django.core.mail import send_mail
 from django.shortcuts import render, redirect
 
 # --- View 1: Case Messaging Thread ---
 
 @login_required
-@user_is_assigned_to_case
-def case_messaging_view(request, case_pk):
-    case = get_object_or_404(Case, pk=case_pk)
+@load_case(prefetch_related=(
+    Prefetch('assignments', queryset=CaseAssignment.objects.select_related('user').order_by('pk')),
+))
+def case_messaging_view(request, case_pk, case):
 
     if request.method == "POST":
         form = NewMessageForm(request.POST)
@@ -30,8 +31,9 @@ def case_messaging_view(request, case_pk):
             msg.sender = request.user
             msg.sent_at = timezone.now()
 
-            other_users = case.assignments.exclude(user=request.user)
-            msg.recipient = other_users.first().user if other_users.exists() else request.user
+            # Assignments are prefetched by load_case
+            other_users = [a for a in case.assignments.all() if a.user_id != request.user.pk]
+            msg.recipient = other_users[0].user if other_users else request.user
 
             msg.save()
             messages.success(request, "Message sent.")
@@ -50,7 +52,7 @@ def case_messaging_view(request, case_pk):
     form = NewMessageForm()
     messages_thread = Message.objects.filter(case=case).filter(
         Q(sender=request.user) | Q(recipient=request.user)
-    ).order_by("sent_at")
+    ).select_related("sender").order_by("sent_at")
 
     return render(request, "communication/case_messaging.html", {
         "case": case,
@@ -63,6 +63,7 @@ INSTALLED_APPS = [
     'users',
     'cases',
     'communication',
+    'search',
 ]
 
 MIDDLEWARE = [
@@ -72,6 +73,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "users.middleware.UserRolesMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -109,6 +111,23 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Cached role lookups are invalidated by bumping a version in this cache, so
+# in production every worker must share it (e.g. set CACHE_BACKEND to
+# django.core.cache.backends.redis.RedisCache and CACHE_LOCATION to the Redis URL).
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        "LOCATION": os.getenv('CACHE_LOCATION', 'owlery-default'),
+    }
+}
+
+# How long (seconds) a user's role set may live in the cache
+USER_ROLES_CACHE_TIMEOUT = 60 * 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -160,6 +179,12 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # The public URL prefix for those files
 MEDIA_URL = '/media/'
 
+# --- Private Working Files ---
+# Caches and analysed uploads (compiled templates, rendered PDFs, PDF page
+# images). Never served and never shared with other local users: the
+# directories are created with mode 0700 and refused if someone else owns them.
+PRIVATE_ROOT = os.getenv('PRIVATE_ROOT', os.path.join(BASE_DIR, 'var'))
+
 # URL to redirect to after a successful login
 LOGIN_REDIRECT_URL = '/users/dashboard/'
 
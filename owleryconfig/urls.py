@@ -47,6 +47,9 @@ urlpatterns = [
     # to the 'communication' app's urls.py file.
     path('messages/', include('communication.urls')),
 
+    # --- Full-text search (JSON) ---
+    path('search/', include('search.urls')),
+
 ]
 
 if settings.DEBUG:
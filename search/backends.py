@@ -0,0 +1,79 @@
+"""
+Database-specific full-text matching for SearchDocument.
+
+* SQLite: an FTS5 table (``search_searchdocument_fts``) over title/body,
+  kept in sync by triggers, ranked with bm25().
+* PostgreSQL: a generated ``search_vector`` tsvector column with a GIN
+  index, ranked with ts_rank().
+* Anything else (or SQLite built without FTS5): icontains per term.
+
+The index objects are created by migration 0002. User input is reduced to
+plain word terms before it reaches the query, and every term matches as a
+prefix, so "smi jon" finds "Smith v. Jones".
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import SearchDocument
+
+FTS_TABLE = 'search_searchdocument_fts'
+MAX_TERMS = 8
+
+_TERM_RE = re.compile(r'\w+')
+
+
+def search_terms(query):
+    """Lowercased word terms of a user query (punctuation is dropped)."""
+    return _TERM_RE.findall((query or '').lower())[:MAX_TERMS]
+
+
+def has_fts_table():
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def match(queryset, terms, ranked=True):
+    """
+    Filters a SearchDocument queryset to entries containing every term.
+    With ranked=True it is also ordered by relevance (best first); pass
+    ranked=False when the queryset is only used as a subquery.
+    """
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        queryset = queryset.extra(where=["search_vector @@ to_tsquery('english', %s)"], params=[tsquery])
+        if ranked:
+            queryset = queryset.extra(
+                select={'rank': "ts_rank(search_vector, to_tsquery('english', %s))"},
+                select_params=[tsquery],
+                order_by=['-rank'],
+            )
+        return queryset
+
+    if connection.vendor == 'sqlite' and has_fts_table():
+        fts_query = ' '.join(f'"{term}"*' for term in terms)
+        if not ranked:
+            return queryset.filter(id__in=RawSQL(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [fts_query]
+            ))
+        table = SearchDocument._meta.db_table
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[fts_query],
+            # bm25() is lower for better matches; titles weigh more than bodies
+            select={'rank': f'bm25({FTS_TABLE}, 10.0, 1.0)'},
+            order_by=['rank'],
+        )
+
+    for term in terms:
+        queryset = queryset.filter(Q(title__icontains=term) | Q(body__icontains=term))
+    return queryset.order_by('-updated_at') if ranked else queryset
+
+
+def optimize_index():
+    """Merges the FTS5 index segments after a bulk load (SQLite only)."""
+    if connection.vendor == 'sqlite' and has_fts_table():
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
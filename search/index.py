@@ -0,0 +1,151 @@
+"""
+Builds the SearchDocument rows for indexed models.
+
+Each indexed model has a builder that turns an instance into the fields of
+its search entry. ``index_instance`` / ``remove_instance`` are called from
+``search.signals``; ``rebuild_index`` recreates every entry from scratch
+(``python manage.py rebuild_search_index``).
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.urls import reverse
+from django.utils.html import strip_tags
+
+from cases.models import Case, ContractTemplate, Meeting
+from communication.models import Message
+
+from .backends import optimize_index
+from .models import SearchDocument
+
+Kind = SearchDocument.Kind
+Audience = SearchDocument.Audience
+
+# Long template bodies are cut; the start of a document is what people search for
+MAX_BODY_LENGTH = 20000
+
+
+def _display_name(user):
+    return user.get_full_name() or user.username
+
+
+def _case_fields(case):
+    if 'assignments' in getattr(case, '_prefetched_objects_cache', {}):
+        assignments = case.assignments.all()
+    else:
+        assignments = case.assignments.select_related('user')
+    team = [assignment.user for assignment in assignments]
+    people = ' '.join(f"{_display_name(user)} {user.username}" for user in team)
+    return {
+        'kind': Kind.CASE,
+        'audience': Audience.CASE,
+        'case_id': case.pk,
+        'title': case.case_title,
+        'body': ' '.join(filter(None, [case.description, case.notes, people])),
+        'url': reverse('cases:case-detail', kwargs={'pk': case.pk}),
+    }
+
+
+def _message_fields(message):
+    return {
+        'kind': Kind.MESSAGE,
+        # Only the sender and recipient see a message, as in the inbox
+        'audience': Audience.PARTICIPANTS,
+        'case_id': message.case_id,
+        'sender_id': message.sender_id,
+        'recipient_id': message.recipient_id,
+        'title': message.subject,
+        'body': message.body,
+        'url': reverse('communication:case-messaging', kwargs={'case_pk': message.case_id}),
+    }
+
+
+def _meeting_fields(meeting):
+    return {
+        'kind': Kind.MEETING,
+        'audience': Audience.CASE,
+        'case_id': meeting.case_id,
+        'title': meeting.title,
+        'body': meeting.description,
+        'url': reverse('cases:case-detail', kwargs={'pk': meeting.case_id}),
+    }
+
+
+def _template_fields(template):
+    return {
+        'kind': Kind.TEMPLATE,
+        'audience': Audience.EVERYONE if template.is_public else Audience.STAFF,
+        'case_id': None,
+        'title': template.name,
+        'body': strip_tags(template.content or ''),
+        'url': reverse('cases:template-list'),
+    }
+
+
+def _user_fields(user):
+    return {
+        'kind': Kind.USER,
+        'audience': Audience.STAFF,
+        'case_id': None,
+        'title': _display_name(user),
+        'body': ' '.join(filter(None, [user.username, user.first_name, user.last_name, user.email])),
+        'url': reverse('cases:user-profile', kwargs={'pk': user.pk}),
+    }
+
+
+# model -> (kind, builder)
+INDEXED_MODELS = {
+    Case: (Kind.CASE, _case_fields),
+    Message: (Kind.MESSAGE, _message_fields),
+    Meeting: (Kind.MEETING, _meeting_fields),
+    ContractTemplate: (Kind.TEMPLATE, _template_fields),
+    User: (Kind.USER, _user_fields),
+}
+
+
+def _fields_for(instance):
+    fields = INDEXED_MODELS[type(instance)][1](instance)
+    fields['title'] = (fields['title'] or '')[:255]
+    fields['body'] = (fields['body'] or '')[:MAX_BODY_LENGTH]
+    return fields
+
+
+def index_instance(instance):
+    """Creates or refreshes the search entry for an instance."""
+    fields = _fields_for(instance)
+    SearchDocument.objects.update_or_create(
+        kind=fields.pop('kind'), object_id=instance.pk, defaults=fields,
+    )
+
+
+def remove_instance(instance):
+    kind = INDEXED_MODELS[type(instance)][0]
+    SearchDocument.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def _querysets():
+    yield Case.objects.prefetch_related('assignments__user')
+    yield Message.objects.all()
+    yield Meeting.objects.all()
+    yield ContractTemplate.objects.all()
+    yield User.objects.all()
+
+
+def rebuild_index(batch_size=500):
+    """Recreates every search entry. Returns the number of entries written."""
+    total = 0
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        for queryset in _querysets():
+            batch = []
+            for instance in queryset.iterator(chunk_size=batch_size):
+                fields = _fields_for(instance)
+                batch.append(SearchDocument(object_id=instance.pk, **fields))
+                if len(batch) >= batch_size:
+                    SearchDocument.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+            SearchDocument.objects.bulk_create(batch)
+            total += len(batch)
+
+        optimize_index()
+    return total
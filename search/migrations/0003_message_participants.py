@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_message_participants(apps, schema_editor):
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+    Message = apps.get_model('communication', 'Message')
+    message = Message.objects.filter(pk=OuterRef('object_id'))
+    SearchDocument.objects.filter(kind='message').update(
+        audience='participants',
+        sender_id=Subquery(message.values('sender_id')[:1]),
+        recipient_id=Subquery(message.values('recipient_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_fulltext_index'),
+        ('communication', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchdocument',
+            name='recipient',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='searchdocument',
+            name='sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='searchdocument',
+            name='audience',
+            field=models.CharField(choices=[('case', 'Users assigned to the case'), ('participants', 'Sender and recipient'), ('staff', 'Admins and attorneys'), ('everyone', 'Every signed-in user')], max_length=20),
+        ),
+        migrations.RunPython(set_message_participants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+from django.contrib.auth.models import User
+from django.db import models
+
+from cases.models import Case
+
+
+# --- Search index entry ---
+class SearchDocument(models.Model):
+    """
+    One searchable object (a case, message, meeting, template or user),
+    flattened to a title and a body. The full-text index itself lives next
+    to this table and is kept in sync by the database (see migration 0002):
+    an FTS5 table on SQLite, a generated tsvector column with a GIN index
+    on PostgreSQL.
+    """
+    class Kind(models.TextChoices):
+        CASE = 'case', 'Case'
+        MESSAGE = 'message', 'Message'
+        MEETING = 'meeting', 'Meeting'
+        TEMPLATE = 'template', 'Contract Template'
+        USER = 'user', 'User'
+
+    # Who may see the entry in search results (admins see everything)
+    class Audience(models.TextChoices):
+        CASE = 'case', 'Users assigned to the case'
+        PARTICIPANTS = 'participants', 'Sender and recipient'
+        STAFF = 'staff', 'Admins and attorneys'
+        EVERYONE = 'everyone', 'Every signed-in user'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_id = models.PositiveBigIntegerField()
+    audience = models.CharField(max_length=20, choices=Audience.choices)
+    case = models.ForeignKey(Case, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    # Participants of a message, for Audience.PARTICIPANTS
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    url = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
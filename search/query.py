@@ -0,0 +1,49 @@
+"""
+Search entry points used by the views.
+
+``search`` returns the ranked entries a user is allowed to see;
+``matching_ids`` returns a subquery of matching object ids for views that
+already restrict their own queryset (case directory, user management).
+"""
+from django.db.models import Q
+
+from cases.access import accessible_case_ids
+from users.roles import has_role
+
+from .backends import match, search_terms
+from .models import SearchDocument
+
+Audience = SearchDocument.Audience
+
+
+def visible_to(queryset, user):
+    """Limits SearchDocument entries to the ones the user may see."""
+    if has_role(user, 'Admin'):
+        return queryset
+    visible = (
+        Q(audience=Audience.EVERYONE)
+        | Q(audience=Audience.CASE, case_id__in=accessible_case_ids(user))
+        | Q(audience=Audience.PARTICIPANTS) & (Q(sender=user) | Q(recipient=user))
+    )
+    if has_role(user, 'Attorney'):
+        visible |= Q(audience=Audience.STAFF)
+    return queryset.filter(visible)
+
+
+def search(user, query, kinds=None):
+    """Ranked, permission-filtered SearchDocument queryset for a user query."""
+    terms = search_terms(query)
+    if not terms:
+        return SearchDocument.objects.none()
+    queryset = SearchDocument.objects.all()
+    if kinds:
+        queryset = queryset.filter(kind__in=kinds)
+    return match(visible_to(queryset, user), terms)
+
+
+def matching_ids(query, kind):
+    """Subquery of the ids of objects of one kind that match the query."""
+    terms = search_terms(query)
+    if not terms:
+        return SearchDocument.objects.none().values('object_id')
+    return match(SearchDocument.objects.filter(kind=kind), terms, ranked=False).values('object_id')
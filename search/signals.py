@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from cases.models import Case, CaseAssignment, ContractTemplate, Meeting
+from communication.models import Message
+
+from .index import index_instance, remove_instance
+
+# Fields of a User that end up in search entries
+_USER_SEARCH_FIELDS = {'username', 'first_name', 'last_name', 'email'}
+
+
+# --- Keep the search index in sync ---
+
+@receiver(post_save, sender=Case)
+@receiver(post_save, sender=Message)
+@receiver(post_save, sender=Meeting)
+@receiver(post_save, sender=ContractTemplate)
+def index_on_save(sender, instance, **kwargs):
+    index_instance(instance)
+
+@receiver(post_delete, sender=Case)
+@receiver(post_delete, sender=Message)
+@receiver(post_delete, sender=Meeting)
+@receiver(post_delete, sender=ContractTemplate)
+@receiver(post_delete, sender=User)
+def remove_on_delete(sender, instance, **kwargs):
+    remove_instance(instance)
+
+@receiver(post_save, sender=User)
+def index_user_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not _USER_SEARCH_FIELDS & set(update_fields):
+        return
+    index_instance(instance)
+    if not created:
+        # Case entries include the names of the case team
+        for case in Case.objects.filter(assignments__user=instance).prefetch_related('assignments__user'):
+            index_instance(case)
+
+@receiver(post_save, sender=CaseAssignment)
+@receiver(post_delete, sender=CaseAssignment)
+def reindex_case_on_assignment_change(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Case) and origin.pk == instance.case_id:
+        return  # the case itself is being deleted
+    case = Case.objects.filter(pk=instance.case_id).first()
+    if case is not None:
+        index_instance(case)
@@ -0,0 +1,94 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from cases.models import Case, CaseAssignment, ContractTemplate
+from communication.models import Message
+from users.models import Role
+
+from .models import SearchDocument
+
+
+class SearchTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.attorney = User.objects.create_user(username='attorney', password='password123',
+                                                 first_name='Atticus', last_name='Finch')
+        self.client_user = User.objects.create_user(username='client', password='password123',
+                                                    first_name='Tom', last_name='Robinson')
+        Role.objects.get(name='Attorney').users.add(self.attorney)
+        Role.objects.get(name='Client').users.add(self.client_user)
+
+        self.case = Case.objects.create(case_title='State v. Robinson', description='Trial in Maycomb county')
+        CaseAssignment.objects.create(case=self.case, user=self.attorney)
+        self.other_case = Case.objects.create(case_title='Maycomb zoning appeal')
+        Message.objects.create(case=self.case, sender=self.attorney, recipient=self.client_user,
+                               subject='Jury selection', body='We start on Monday.')
+
+    def search(self, user, **params):
+        self.client.login(username=user.username, password='password123')
+        response = self.client.get(reverse('search:search'), params)
+        self.assertEqual(response.status_code, 200)
+        return [(row['kind'], row['title']) for row in response.json()['results']]
+
+    def test_results_are_ranked_and_permission_filtered(self):
+        # Prefix terms, across fields; the zoning case is not the attorney's
+        results = self.search(self.attorney, q='mayc')
+        self.assertEqual(results, [('case', 'State v. Robinson')])
+
+        # Staff see the user directory; clients don't
+        self.assertIn(('user', 'Tom Robinson'), self.search(self.attorney, q='robinson'))
+        self.assertEqual(self.search(self.client_user, q='robinson'), [])
+
+        # Title matches rank above body matches
+        CaseAssignment.objects.create(case=self.other_case, user=self.attorney)
+        self.assertEqual(self.search(self.attorney, q='maycomb'),
+                         [('case', 'Maycomb zoning appeal'), ('case', 'State v. Robinson')])
+
+        # Clients see entries for their own cases
+        CaseAssignment.objects.create(case=self.case, user=self.client_user)
+        self.assertEqual(self.search(self.client_user, q='jury', kind='message'),
+                         [('message', 'Jury selection')])
+
+    def test_index_follows_changes_and_rebuilds(self):
+        self.case.case_title = 'State v. Ewell'
+        self.case.save()
+        self.attorney.last_name = 'Atticus-Finch'
+        self.attorney.save()
+        ContractTemplate.objects.create(name='Retainer agreement', content='<p>Fee schedule</p>', is_public=True)
+        self.other_case.delete()
+
+        expected = [('case', 'State v. Ewell')]
+        self.assertEqual(self.search(self.attorney, q='ewell'), expected)
+        self.assertEqual(self.search(self.attorney, q='robinson', kind='case'), [])
+        self.assertEqual(self.search(self.client_user, q='fee'), [('template', 'Retainer agreement')])
+        self.assertFalse(SearchDocument.objects.filter(kind='case', object_id=self.other_case.pk).exists())
+
+        count = SearchDocument.objects.count()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(SearchDocument.objects.count(), count)
+        self.assertEqual(self.search(self.attorney, q='ewell'), expected)
+
+    def test_directory_search_uses_index(self):
+        self.client.login(username='attorney', password='password123')
+        response = self.client.get(reverse('cases:case-directory'), {'q': 'finch'})
+        self.assertEqual([case.pk for case in response.context['cases']], [self.case.pk])
+
+    def test_messages_are_only_visible_to_their_participants(self):
+        # Everyone on the case, but the message is between the two attorneys
+        colleague = User.objects.create_user(username='colleague', password='password123')
+        Role.objects.get(name='Attorney').users.add(colleague)
+        for user in (colleague, self.client_user):
+            CaseAssignment.objects.create(case=self.case, user=user)
+        Message.objects.create(case=self.case, sender=self.attorney, recipient=colleague,
+                               subject='Strategy', body='Confidential: settle below the offer.')
+
+        self.assertEqual(self.search(self.client_user, q='confidential', kind='message'), [])
+        self.assertEqual(self.search(colleague, q='confidential'), [('message', 'Strategy')])
+        self.assertEqual(self.search(self.attorney, q='confidential'), [('message', 'Strategy')])
+
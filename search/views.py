@@ -0,0 +1,44 @@
+import time
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+
+from .models import SearchDocument
+from .query import search
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+
+
+# --- View 1: Search (JSON) ---
+@login_required
+def search_view(request):
+    """
+    Ranked full-text search over cases, messages, meetings, templates and
+    users, limited to what the user may see.
+
+    GET params: ``q`` (required), ``kind`` (comma-separated kinds), ``limit``.
+    """
+    query = request.GET.get('q', '').strip()
+    kinds = [kind for kind in request.GET.get('kind', '').split(',') if kind in SearchDocument.Kind.values]
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        limit = DEFAULT_LIMIT
+
+    started = time.perf_counter()
+    entries = search(request.user, query, kinds)[:limit]
+    results = [{
+        'kind': entry.kind,
+        'id': entry.object_id,
+        'title': entry.title,
+        'snippet': entry.body[:160],
+        'url': entry.url,
+        'case_id': entry.case_id,
+    } for entry in entries]
+
+    return JsonResponse({
+        'query': query,
+        'results': results,
+        'took_ms': round((time.perf_counter() - started) * 1000, 1),
+    })
@@ -0,0 +1,66 @@
+"""
+Per-user versioned cache keys.
+
+Every (namespace, user) pair has a version number stored in the cache.
+Values are cached under a key that includes that version, so invalidating
+is just a matter of bumping the version: entries written under an older
+version are never read again and expire on their own. This also means a
+reader that raced with a write can't put stale data back in front of
+everyone, because it writes under the version it started with.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(namespace, user_id):
+    return f'{namespace}:version:{user_id}'
+
+
+def get_version(namespace, user_id):
+    """Returns the current version for this user, creating one if needed."""
+    key = _version_key(namespace, user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed with a timestamp so an evicted version never reuses an old number
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(namespace, user_id):
+    """Moves the user to a new version, orphaning everything cached before."""
+    key = _version_key(namespace, user_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # No version stored yet (or it was evicted)
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def invalidate_users(namespace, user_ids):
+    """
+    Bumps the version for each user right away, and again once the current
+    transaction commits so anything another worker cached from the old,
+    still-visible rows in between is discarded too.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+
+    def _bump():
+        for user_id in user_ids:
+            bump_version(namespace, user_id)
+
+    _bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(_bump)
+
+
+def versioned_key(namespace, user_id, version, *parts):
+    """Builds the cache key for a value stored under a given version."""
+    return ':'.join([namespace, str(user_id), str(version), *map(str, parts)])
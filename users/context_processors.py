@@ -1,11 +1,14 @@
+from .roles import get_user_roles
+
+
 def user_roles_processor(request):
     """Adds the user's role names to the template context."""
-    roles = []
-    if request.user.is_authenticated:
-        # Get the names of all roles assigned to the user
-        roles = list(request.user.roles.values_list('name', flat=True))
+    # UserRolesMiddleware has usually resolved these already
+    roles = getattr(request, 'user_roles', None)
+    if roles is None:
+        roles = get_user_roles(request.user)
 
     return {
         'user_roles': roles,
         'is_admin_user': 'Admin' in roles # Add a simple boolean flag
-    }
\ No newline at end of file
+    }
@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import SetPasswordForm
 from .models import OnboardingKey, Role, UserProfile
+from .roles import invalidate_user_roles
 import uuid
 
 class AdminCreateKeyForm(forms.Form):
@@ -118,6 +119,7 @@ class UserCreationAdminForm(forms.ModelForm):
             user.save()
             # Save the many-to-many relationship for roles
             self.save_m2m()
+            invalidate_user_roles(user)
         return user
     
 # --- Admin User Edit Form ---
@@ -152,6 +154,7 @@ class UserEditAdminForm(forms.ModelForm):
             # Manually update the many-to-many relationship for roles
             user.roles.set(self.cleaned_data['roles'])
             self.save_m2m() # Although maybe redundant now
+            invalidate_user_roles(user)
         return user
     
 # --- Admin User Delete Form ---
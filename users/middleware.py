@@ -0,0 +1,19 @@
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_user_roles
+
+
+class UserRolesMiddleware:
+    """
+    Exposes ``request.user_roles``: a frozenset of the logged-in user's role
+    names. It is resolved lazily, at most once per request, so pages that
+    never check a role don't pay for the query.
+    Must be placed after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user_roles = SimpleLazyObject(lambda: get_user_roles(request.user))
+        return self.get_response(request)
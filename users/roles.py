@@ -0,0 +1,89 @@
+"""
+Role lookups shared by views, decorators and templates.
+
+A user's role names (plus an ``is_admin`` flag) are kept in the shared
+Django cache under a per-user version, and remembered on the user object
+for the rest of the request. In the steady state a role check costs no
+database query at all. The version is bumped by the signals in
+``users.signals`` and by the views/forms that change a user's roles.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import get_version, invalidate_users, versioned_key
+
+ROLE_CACHE_NAMESPACE = 'user-roles'
+ROLE_CACHE_TIMEOUT = getattr(settings, 'USER_ROLES_CACHE_TIMEOUT', 60 * 60)
+
+# Attribute used to remember the role info on a User instance
+_ROLE_CACHE_ATTR = '_role_info'
+
+_ANONYMOUS = {'roles': frozenset(), 'is_admin': False}
+
+
+def _build_role_info(user, role_names):
+    role_names = frozenset(role_names)
+    return {
+        'roles': role_names,
+        'is_admin': 'Admin' in role_names or user.is_superuser,
+    }
+
+
+def get_role_info(user):
+    """Returns ``{'roles': frozenset, 'is_admin': bool}`` for the user."""
+    if user is None or not user.is_authenticated:
+        return _ANONYMOUS
+
+    try:
+        return getattr(user, _ROLE_CACHE_ATTR)
+    except AttributeError:
+        pass
+
+    # Reuse a prefetch_related('roles') result if the caller already has one
+    prefetched = getattr(user, '_prefetched_objects_cache', {}).get('roles')
+    if prefetched is not None:
+        info = _build_role_info(user, (role.name for role in prefetched))
+    else:
+        version = get_version(ROLE_CACHE_NAMESPACE, user.pk)
+        key = versioned_key(ROLE_CACHE_NAMESPACE, user.pk, version)
+        info = cache.get(key)
+        if info is None:
+            info = _build_role_info(user, user.roles.values_list('name', flat=True))
+            cache.set(key, info, ROLE_CACHE_TIMEOUT)
+
+    setattr(user, _ROLE_CACHE_ATTR, info)
+    return info
+
+
+def get_user_roles(user):
+    """Returns a frozenset with the names of every role the user has."""
+    return get_role_info(user)['roles']
+
+
+def has_role(user, *names):
+    """True if the user has at least one of the given role names."""
+    roles = get_user_roles(user)
+    return any(name in roles for name in names)
+
+
+def is_admin_user(user):
+    """True for users with the Admin role and for superusers."""
+    return get_role_info(user)['is_admin']
+
+
+def invalidate_user_roles(*users):
+    """
+    Drops the cached roles for the given users (User objects or ids).
+    Call after changing a user's roles or superuser status.
+    """
+    user_ids = []
+    for user in users:
+        if hasattr(user, 'pk'):
+            try:
+                delattr(user, _ROLE_CACHE_ATTR)
+            except AttributeError:
+                pass
+            user_ids.append(user.pk)
+        else:
+            user_ids.append(user)
+    invalidate_users(ROLE_CACHE_NAMESPACE, user_ids)
@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_delete, m2m_changed
 from django.dispatch import receiver
-from .models import UserProfile
+from .models import UserProfile, Role
+from .roles import invalidate_user_roles
 
 User = get_user_model()
 
@@ -11,3 +12,38 @@ def create_or_update_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
     else:
         UserProfile.objects.get_or_create(user=instance)
+
+
+# --- Role cache invalidation ---
+
+@receiver(post_save, sender=User)
+def invalidate_roles_on_user_save(sender, instance, update_fields=None, **kwargs):
+    # The cached is_admin flag depends on is_superuser. Logins only touch
+    # last_login, so skip those.
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_user_roles(instance)
+
+@receiver(m2m_changed, sender=Role.users.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # user.roles.add()/remove()/set()/clear(): instance is the User
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_user_roles(instance)
+        return
+
+    # role.users.add()/remove()/clear(): instance is the Role
+    if action == 'pre_clear':
+        # pk_set is None for clear(), so remember who is about to be removed
+        instance._cleared_user_ids = list(instance.users.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        invalidate_user_roles(*getattr(instance, '_cleared_user_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_user_roles(*pk_set)
+
+@receiver(post_save, sender=Role)
+@receiver(pre_delete, sender=Role)
+def invalidate_roles_on_role_change(sender, instance, **kwargs):
+    # A renamed or deleted role changes the role names of all its members
+    if instance.pk:
+        invalidate_user_roles(*instance.users.values_list('pk', flat=True))
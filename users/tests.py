@@ -45,4 +45,95 @@ class HomepageViewTest(TestCase):
 
         # Check 2: Did it redirect to the dashboard URL?
         dashboard_url = reverse('users:dashboard')
-        self.assertRedirects(response, dashboard_url)
\ No newline at end of file
+        self.assertRedirects(response, dashboard_url)
+
+class RoleResolutionTest(TestCase):
+
+    def setUp(self):
+        from django.core.cache import cache
+        from users.models import Role
+        cache.clear()
+        self.user = User.objects.create_user(username='attorney1', password='password123')
+        Role.objects.get_or_create(name='Attorney')[0].users.add(self.user)
+
+    def test_roles_are_loaded_once_per_user_object(self):
+        """
+        Repeated role checks on the same user object share one query.
+        """
+        from users.roles import has_role
+        from users.views import is_admin
+
+        with self.assertNumQueries(1):
+            self.assertTrue(has_role(self.user, 'Attorney'))
+            self.assertFalse(has_role(self.user, 'Admin'))
+            self.assertTrue(has_role(self.user, 'Admin', 'Attorney'))
+            self.assertFalse(is_admin(self.user))
+
+    def test_context_processor_uses_request_roles(self):
+        """
+        The context processor reads the roles resolved by the middleware.
+        """
+        from django.test import RequestFactory
+        from users.context_processors import user_roles_processor
+        from users.middleware import UserRolesMiddleware
+
+        request = RequestFactory().get('/')
+        request.user = self.user
+        UserRolesMiddleware(lambda r: None)(request)
+
+        with self.assertNumQueries(1):
+            context = user_roles_processor(request)
+            self.assertIn('Attorney', request.user_roles)
+        self.assertIn('Attorney', context['user_roles'])
+        self.assertFalse(context['is_admin_user'])
+
+
+class RoleCacheTest(TestCase):
+
+    def setUp(self):
+        from django.core.cache import cache
+        from users.models import Role
+        cache.clear()
+        self.user = User.objects.create_user(username='client1', password='password123')
+        self.client_role = Role.objects.get(name='Client')
+        self.admin_role = Role.objects.get(name='Admin')
+        self.client_role.users.add(self.user)
+
+    def fresh_user(self):
+        # A new instance, like the one loaded for the next request
+        return User.objects.get(pk=self.user.pk)
+
+    def test_roles_are_served_from_cache_across_requests(self):
+        from users.roles import get_user_roles, is_admin_user
+
+        self.assertEqual(get_user_roles(self.fresh_user()), {'Client'})
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_roles(user), {'Client'})
+            self.assertFalse(is_admin_user(user))
+
+    def test_role_changes_invalidate_the_cache(self):
+        from users.roles import get_user_roles, is_admin_user
+
+        get_user_roles(self.fresh_user())
+
+        # Forward side: role.users.add()
+        self.admin_role.users.add(self.user)
+        self.assertTrue(is_admin_user(self.fresh_user()))
+
+        # Reverse side: user.roles.set()
+        self.fresh_user().roles.set([self.client_role])
+        self.assertEqual(get_user_roles(self.fresh_user()), {'Client'})
+
+        # role.users.clear()
+        self.client_role.users.clear()
+        self.assertEqual(get_user_roles(self.fresh_user()), frozenset())
+
+    def test_superuser_flag_change_invalidates_the_cache(self):
+        from users.roles import is_admin_user
+
+        self.assertFalse(is_admin_user(self.fresh_user()))
+        user = self.fresh_user()
+        user.is_superuser = True
+        user.save()
+        self.assertTrue(is_admin_user(self.fresh_user()))
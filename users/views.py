@@ -8,8 +8,12 @@ from django.contrib.auth.models import User
 from django.db import transaction
 from django.conf import settings
 from .models import OnboardingKey, UserProfile, Role
+from .roles import has_role, get_user_roles, is_admin_user, invalidate_user_roles
 from .forms import AdminCreateKeyForm, RegisterWithKeyForm, UserSetPasswordForm, ClientReassignmentForm, UserCreationAdminForm, UserEditAdminForm, AvatarUpdateForm
 from cases.models import Case, CaseAssignment, ConsultationRequest
+from cases.access import accessible_case_ids
+from search.models import SearchDocument
+from search.query import matching_ids
 from django.urls import reverse
 from django.core.mail import send_mail
 from django.db.models import Q
@@ -18,7 +22,7 @@ from django.template.loader import render_to_string
 
 # Helper to ensure only admins access this
 def is_admin(user):
-    return user.roles.filter(name='Admin').exists() or user.is_superuser
+    return is_admin_user(user)
 
 # --- NEW: Homepage View ---
 def homepage_view(request):
@@ -193,6 +197,7 @@ def set_password_view(request, key):
 
             # Assign the roles from the OnboardingKey
             user.roles.set(key_instance.roles.all())
+            invalidate_user_roles(user)
             
             # Mark the key as used
             key_instance.is_used = True
@@ -216,9 +221,9 @@ def dashboard_view(request):
     user = request.user
     
     # 1. Define ALL Roles (including Admin)
-    is_admin_role = user.roles.filter(name='Admin').exists() # <--- ADD THIS
-    is_attorney = user.roles.filter(name='Attorney').exists()
-    is_client = user.roles.filter(name='Client').exists()
+    is_admin_role = has_role(user, 'Admin') # <--- ADD THIS
+    is_attorney = has_role(user, 'Attorney')
+    is_client = has_role(user, 'Client')
 
     # 2. Redirect Admins and Attorneys to the main Case Dashboard
     if is_admin_role or is_attorney:
@@ -228,7 +233,7 @@ def dashboard_view(request):
     assigned_cases = Case.objects.none()
     if is_client:
         # Show cases where this user is assigned
-        assigned_cases = Case.objects.filter(assignments__user=user).order_by('-date_filed')
+        assigned_cases = Case.objects.filter(pk__in=accessible_case_ids(user)).order_by('-date_filed')
 
     # (Consultations logic isn't strictly needed here since Attorneys redirect away, 
     # but keeping it doesn't hurt if you change logic later)
@@ -257,12 +262,7 @@ def user_management_list_view(request):
     # 2. Search Filter (checks username, first name, last name, email)
     search_query = request.GET.get('q', '')
     if search_query:
-        users = users.filter(
-            Q(username__icontains=search_query) |
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query)
-        )
+        users = users.filter(pk__in=matching_ids(search_query, SearchDocument.Kind.USER))
 
     # 3. Role Filter (checks the Role model relation)
     role_filter = request.GET.get('role', '')
@@ -345,18 +345,18 @@ def client_reassignment_view(request):
 
                 with transaction.atomic():
                     updated_count = 0
-                    for case_id in case_ids_to_move:
-                        # Find the assignment linking the case to the FROM attorney
-                        assignment = CaseAssignment.objects.filter(
-                            case__pk=case_id,
-                            user=from_attorney
-                        ).first()
-
-                        if assignment:
-                            # Update the user field to the TO attorney
-                            assignment.user = to_attorney
-                            assignment.save()
-                            updated_count += 1
+                    # Find every assignment linking the chosen cases to the FROM attorney
+                    assignments = CaseAssignment.objects.filter(
+                        case__pk__in=case_ids_to_move,
+                        user=from_attorney
+                    )
+                    for assignment in assignments:
+                        # Update the user field to the TO attorney.
+                        # save() (not a bulk update) keeps the case access
+                        # index in sync through the CaseAssignment signals.
+                        assignment.user = to_attorney
+                        assignment.save()
+                        updated_count += 1
 
                 messages.success(request, f"Successfully reassigned {updated_count} case(s) from {from_attorney.username} to {to_attorney.username}.")
                 return redirect('user-list')
@@ -463,8 +463,8 @@ def profile_view(request, user_pk):
 
     viewer = request.user
 
-    viewer_roles = set(viewer.roles.values_list("name", flat=True))
-    profile_roles = set(profile_user.roles.values_list("name", flat=True))
+    viewer_roles = get_user_roles(viewer)
+    profile_roles = get_user_roles(profile_user)
 
     # --- Permission Logic ---
     can_view = False